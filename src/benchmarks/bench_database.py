@@ -0,0 +1,188 @@
+"""
+Write-path and query benchmarks for DatabaseManager
+
+Drives synthetic keystroke and mouse streams through the database at
+realistic rates in simulated time and reports insert throughput, per-batch
+write latency percentiles, query latency as the database grows, and the
+on-disk size. Run from the src directory:
+
+    python -m benchmarks.bench_database --minutes 30 --output bench.json
+"""
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from core.database import DatabaseManager
+
+START = datetime(2024, 1, 1, 9, 0)
+KEYS = 'etaoinshrdlucmfwypvbgkjqxz '
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def latency_summary(seconds):
+    return {
+        'count': len(seconds),
+        'p50_ms': percentile(seconds, 0.50) * 1000,
+        'p99_ms': percentile(seconds, 0.99) * 1000,
+        'max_ms': max(seconds) * 1000,
+        'mean_ms': statistics.fmean(seconds) * 1000,
+    }
+
+def synthetic_second(rng, session_id, second, mouse_rate, key_rate):
+    """Generate one simulated second of mouse and keystroke rows"""
+    base = START + timedelta(seconds=second)
+    mouse = []
+    x, y = rng.randrange(1920), rng.randrange(1080)
+    for i in range(mouse_rate):
+        x = min(max(x + rng.randint(-6, 6), 0), 1919)
+        y = min(max(y + rng.randint(-6, 6), 0), 1079)
+        mouse.append((session_id, base + timedelta(microseconds=i * 1_000_000 // mouse_rate),
+                      x, y, rng.uniform(0, 2000), rng.uniform(-500, 500),
+                      'left' if rng.random() < 0.001 else None))
+    keys = []
+    for i in range(key_rate):
+        key = rng.choice(KEYS)
+        keys.append((session_id, base + timedelta(microseconds=i * 1_000_000 // key_rate),
+                     key, key, rng.uniform(0.05, 0.2), rng.uniform(0.05, 0.4)))
+    return keys, mouse
+
+def file_size(db_path):
+    return sum(path.stat().st_size for path in
+               (Path(db_path), Path(f'{db_path}-wal'), Path(f'{db_path}-shm'))
+               if path.exists())
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+def bench_single_row(db, rng, rows):
+    """Per-call cost of the single-row API, for comparison with the bulk path"""
+    session_id = db.create_session(notes="single-row benchmark")
+    samples = []
+    for _ in range(rows):
+        x, y = rng.randrange(1920), rng.randrange(1080)
+        start = time.perf_counter()
+        db.add_mouse_movement(session_id, x, y, 1.0, 0.0)
+        samples.append(time.perf_counter() - start)
+    return {'rows': rows, 'rows_per_second': rows / sum(samples),
+            'latency': latency_summary(samples)}
+
+def bench_ingest(db, rng, args):
+    """Stream simulated time into the database one second per batch"""
+    session_id = db.create_session(notes="ingest benchmark")
+    total_seconds = int(args.minutes * 60)
+    checkpoint_every = max(1, int(args.checkpoint_minutes * 60))
+    batch_latencies = []
+    checkpoints = []
+    rows_written = 0
+    write_time = 0.0
+
+    for second in range(total_seconds):
+        keys, mouse = synthetic_second(rng, session_id, second, args.mouse_rate, args.key_rate)
+        start = time.perf_counter()
+        db.add_keystrokes_bulk(keys)
+        db.add_mouse_movements_bulk(mouse)
+        elapsed = time.perf_counter() - start
+        batch_latencies.append(elapsed)
+        write_time += elapsed
+        rows_written += len(keys) + len(mouse)
+
+        if (second + 1) % checkpoint_every == 0 or second + 1 == total_seconds:
+            checkpoints.append(bench_queries(db, session_id, second + 1, rows_written, args))
+
+    db.end_session(session_id)
+    return {
+        'session_id': session_id,
+        'simulated_seconds': total_seconds,
+        'rows': rows_written,
+        'rows_per_second': rows_written / write_time if write_time else None,
+        'batch_latency': latency_summary(batch_latencies),
+        'checkpoints': checkpoints,
+    }
+
+def bench_queries(db, session_id, simulated_seconds, rows, args):
+    """Query latencies and file size at the current database size"""
+    return {
+        'simulated_seconds': simulated_seconds,
+        'rows': rows,
+        'file_bytes': file_size(db.db_path),
+        'get_session_summary': time_call(lambda: db.get_session_summary(session_id),
+                                         args.query_repeat),
+        'get_session_rollup': time_call(lambda: db.get_session_rollup(session_id),
+                                        args.query_repeat),
+        'get_session_statistics': time_call(
+            lambda: db.get_session_statistics([session_id]), 1),
+        'load_mouse_array': time_call(lambda: db.load_mouse_array(session_id), 1),
+        'get_keystroke_data': time_call(lambda: db.get_keystroke_data(session_id), 1),
+    }
+
+def run(args):
+    rng = random.Random(args.seed)
+    results = {
+        'benchmark': 'bench_database',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': sys.version.split()[0],
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+        },
+        'parameters': {key: value for key, value in vars(args).items() if key != 'output'},
+        'storage': {},
+    }
+    for storage in args.storage:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / 'bench.db'
+            with DatabaseManager(db_path=db_path, compact_storage=storage == 'compact') as db:
+                results['storage'][storage] = {
+                    'single_row': bench_single_row(db, rng, args.single_rows),
+                    'ingest': bench_ingest(db, rng, args),
+                    'final_file_bytes': file_size(db_path),
+                }
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--minutes', type=float, default=10,
+                        help="simulated minutes of input to ingest")
+    parser.add_argument('--mouse-rate', type=int, default=1000,
+                        help="mouse events per simulated second")
+    parser.add_argument('--key-rate', type=int, default=5,
+                        help="keystrokes per simulated second")
+    parser.add_argument('--checkpoint-minutes', type=float, default=2,
+                        help="simulated minutes between query measurements")
+    parser.add_argument('--query-repeat', type=int, default=20,
+                        help="repetitions for cheap queries")
+    parser.add_argument('--single-rows', type=int, default=500,
+                        help="rows written through the single-row API")
+    parser.add_argument('--storage', nargs='+', choices=('legacy', 'compact'),
+                        default=['legacy', 'compact'])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write JSON results here instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = json.dumps(run(args), indent=2)
+    if args.output:
+        Path(args.output).write_text(results)
+    else:
+        print(results)
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,148 @@
- 
\ No newline at end of file
+import threading
+import time
+from datetime import datetime
+
+from core.compact import from_epoch_us, to_epoch_us
+
+def key_name(key):
+    """Text stored in key_pressed/key_released for a pynput key"""
+    char = getattr(key, 'char', None)
+    if char is not None:
+        return char
+    name = getattr(key, 'name', None)
+    if name is not None:
+        return f'Key.{name}'
+    vk = getattr(key, 'vk', None)
+    return f'<{vk}>' if vk is not None else str(key)
+
+class KeyboardCollector:
+    """Turn keyboard hook events into keystroke rows with minimal callback work
+
+    Times come from time.perf_counter_ns(), so press durations are immune to
+    wall-clock jumps; the wall-clock timestamp stored with each row is
+    derived from one anchor taken at construction. Pending presses sit in a
+    fixed-size ring indexed by a hash of the key, so pairing a release with
+    its press is a single slot lookup and auto-repeat presses are ignored.
+
+    Completed rows, (session_id, timestamp, key_pressed, key_released,
+    press_duration, inter_key_interval), collect in a local batch that is
+    handed to `sink(rows)` once `batch_size` rows are pending, on the first
+    keystroke after `flush_interval` seconds, or on flush(). The sink runs on
+    the hook thread and must not block; BackgroundWriter.add_keystrokes is
+    the intended one.
+    Every callback is timed and stats() reports count, mean and maximum
+    duration, plus how many exceeded `callback_budget_us`.
+    """
+
+    def __init__(self, sink, session_id, ring_size=64, batch_size=64, flush_interval=0.5,
+                 callback_budget_us=500, clock=time.perf_counter_ns):
+        self.sink = sink
+        self.session_id = session_id
+        self.ring_size = ring_size
+        self.batch_size = batch_size
+        self.flush_interval_ns = int(flush_interval * 1e9)
+        self.callback_budget_ns = int(callback_budget_us * 1000)
+        self.clock = clock
+
+        # Local wall-clock microseconds (as stored by the database) at clock() == 0
+        self._anchor_us = to_epoch_us(datetime.now()) - clock() // 1000
+        self._ring_keys = [None] * ring_size
+        self._ring_press_ns = [0] * ring_size
+        self._last_release_ns = None
+        self._batch = []
+        self._batch_started_ns = 0
+        self._lock = threading.Lock()
+        self._listener = None
+
+        # Statistics
+        self.callbacks = 0
+        self.callback_ns = 0
+        self.max_callback_ns = 0
+        self.over_budget = 0
+        self.keystrokes = 0
+        self.unmatched_releases = 0
+        self.evicted_presses = 0
+
+    def start(self):
+        """Start listening to the keyboard in pynput's hook thread"""
+        from pynput import keyboard
+        self._listener = keyboard.Listener(on_press=self.on_press, on_release=self.on_release)
+        self._listener.start()
+
+    def is_alive(self):
+        return self._listener is not None and self._listener.is_alive()
+
+    def stop(self):
+        """Stop listening and hand any pending rows to the sink"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        self.flush()
+
+    def _timed(self, started_ns):
+        elapsed = self.clock() - started_ns
+        self.callbacks += 1
+        self.callback_ns += elapsed
+        if elapsed > self.max_callback_ns:
+            self.max_callback_ns = elapsed
+        if elapsed > self.callback_budget_ns:
+            self.over_budget += 1
+
+    def on_press(self, key):
+        now = self.clock()
+        name = key_name(key)
+        slot = hash(name) % self.ring_size
+        if self._ring_keys[slot] != name:
+            if self._ring_keys[slot] is not None:
+                self.evicted_presses += 1
+            self._ring_keys[slot] = name
+            self._ring_press_ns[slot] = now
+        self._timed(now)
+
+    def on_release(self, key):
+        now = self.clock()
+        name = key_name(key)
+        slot = hash(name) % self.ring_size
+        if self._ring_keys[slot] != name:
+            self.unmatched_releases += 1
+            self._timed(now)
+            return
+        self._ring_keys[slot] = None
+        press_ns = self._ring_press_ns[slot]
+        interval = None
+        if self._last_release_ns is not None:
+            interval = (press_ns - self._last_release_ns) / 1e9
+        self._last_release_ns = now
+
+        row = (self.session_id, from_epoch_us(self._anchor_us + press_ns // 1000),
+               name, name, (now - press_ns) / 1e9, interval)
+        with self._lock:
+            if not self._batch:
+                self._batch_started_ns = now
+            self._batch.append(row)
+            full = (len(self._batch) >= self.batch_size
+                    or now - self._batch_started_ns >= self.flush_interval_ns)
+        self.keystrokes += 1
+        if full:
+            self.flush()
+        self._timed(now)
+
+    def flush(self):
+        """Hand pending rows to the sink now"""
+        with self._lock:
+            batch, self._batch = self._batch, []
+        if batch:
+            self.sink(batch)
+
+    def stats(self):
+        """Return keystroke counts and callback timing in microseconds"""
+        return {
+            'keystrokes': self.keystrokes,
+            'pending': len(self._batch),
+            'callbacks': self.callbacks,
+            'mean_callback_us': self.callback_ns / self.callbacks / 1000 if self.callbacks else None,
+            'max_callback_us': self.max_callback_ns / 1000,
+            'over_budget': self.over_budget,
+            'unmatched_releases': self.unmatched_releases,
+            'evicted_presses': self.evicted_presses,
+        }
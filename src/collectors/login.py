@@ -1 +1,41 @@
- 
\ No newline at end of file
+from datetime import datetime
+
+from core.login_policy import NO_PATTERN
+
+class LoginCollector:
+    """Assess and record login attempts
+
+    An attempt is checked for brute-force bursts and abnormal velocity per
+    user and per IP address, then against the user's hand-entered login
+    policy, if they have one, and against the profile learned from their
+    past successful logins. The first rule that fires gives the reason
+    stored with the attempt. The learned profile only starts flagging once
+    it has seen enough logins (see core.login_profile.LoginProfile).
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def assess(self, user_id, login_time, duration):
+        """Return (is_suspicious, reason) without recording anything"""
+        policy = self.db.get_login_policy(user_id)
+        profile = self.db.get_login_profile(user_id)
+        if policy is None and profile.total < profile.min_attempts:
+            return NO_PATTERN
+        if policy is not None:
+            is_suspicious, reason = policy.evaluate(login_time, duration)
+            if is_suspicious:
+                return is_suspicious, reason
+        return profile.evaluate(login_time, duration)
+
+    def record_attempt(self, user_id, success, duration, ip_address=None, device_info=None,
+                       attempt_time=None):
+        """Assess an attempt, store it and return (is_suspicious, reason)"""
+        attempt_time = attempt_time or datetime.now()
+        is_suspicious, reason = self.db.get_login_rates().evaluate(
+            user_id, ip_address, success, attempt_time)
+        if not is_suspicious:
+            is_suspicious, reason = self.assess(user_id, attempt_time, duration)
+        self.db.add_login_attempt(user_id, success, duration, ip_address, device_info,
+                                  is_suspicious, reason, attempt_time=attempt_time)
+        return is_suspicious, reason
@@ -1 +1,160 @@
- 
\ No newline at end of file
+import math
+import threading
+import time
+from datetime import datetime
+
+from core.compact import from_epoch_us, to_epoch_us
+
+class MouseCollector:
+    """Turn pointer hook events into a simplified, batched stream of mouse rows
+
+    Raw moves are thinned online with distance and angle thresholds. A move
+    is kept when it is at least `min_distance` pixels from the last kept
+    point and either turns by more than `max_angle` degrees or comes
+    `max_interval` seconds after the last kept point, so straight runs are
+    sampled at a bounded rate and curves keep their shape. Stroke starts
+    (the first move after a pause longer than `pause_threshold`), stroke ends
+    (the last move before such a pause or a click) and clicks are always
+    kept. Speed and acceleration are filled in between kept points of the
+    same stroke.
+
+    Rows, (session_id, timestamp, x_position, y_position, movement_speed,
+    acceleration, click_type), are handed to `sink(rows)` in batches of
+    `batch_size`, on the first row after `flush_interval` seconds, or on
+    flush(); BackgroundWriter.add_mouse_movements is the intended sink.
+    stats() reports raw events, stored rows and their ratio per session.
+    """
+
+    def __init__(self, sink, session_id, min_distance=3.0, max_angle=10.0, max_interval=0.02,
+                 pause_threshold=0.1, batch_size=256, flush_interval=0.5,
+                 clock=time.perf_counter_ns):
+        self.sink = sink
+        self.min_distance = min_distance
+        self.max_angle = math.radians(max_angle)
+        self.max_interval_ns = int(max_interval * 1e9)
+        self.pause_ns = int(pause_threshold * 1e9)
+        self.batch_size = batch_size
+        self.flush_interval_ns = int(flush_interval * 1e9)
+        self.clock = clock
+
+        # Local wall-clock microseconds (as stored by the database) at clock() == 0
+        self._anchor_us = to_epoch_us(datetime.now()) - clock() // 1000
+        self._batch = []
+        self._batch_started_ns = 0
+        self._lock = threading.Lock()
+        self._listener = None
+        self.sessions = {}
+        self.set_session(session_id)
+
+    def set_session(self, session_id):
+        """Flush and start counting rows for a new session"""
+        if self._batch:
+            self.flush()
+        self.session_id = session_id
+        self._counts = self.sessions.setdefault(session_id, {'raw_events': 0, 'rows': 0})
+        self._end_stroke()
+
+    def _end_stroke(self):
+        self._last_raw = None     # (ns, x, y) of the previous raw move
+        self._last_kept = None    # (ns, x, y) of the last stored point
+        self._last_speed = None
+        self._heading = None
+        self._held = None         # latest raw move not stored yet
+
+    def start(self):
+        """Start listening to the pointer in pynput's hook thread"""
+        from pynput import mouse
+        self._listener = mouse.Listener(on_move=self.on_move, on_click=self.on_click)
+        self._listener.start()
+
+    def is_alive(self):
+        return self._listener is not None and self._listener.is_alive()
+
+    def stop(self):
+        """Stop listening, close the current stroke and hand pending rows to the sink"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        if self._held is not None:
+            self._keep(*self._held)
+        self._end_stroke()
+        self.flush()
+
+    def _keep(self, now, x, y, click_type=None):
+        speed = acceleration = None
+        if self._last_kept is not None:
+            last_ns, last_x, last_y = self._last_kept
+            dt = (now - last_ns) / 1e9
+            if dt > 0:
+                speed = math.hypot(x - last_x, y - last_y) / dt
+                if self._last_speed is not None:
+                    acceleration = (speed - self._last_speed) / dt
+        self._last_kept = (now, x, y)
+        self._last_speed = speed
+        self._held = None
+
+        row = (self.session_id, from_epoch_us(self._anchor_us + now // 1000), x, y,
+               speed, acceleration, click_type)
+        self._counts['rows'] += 1
+        with self._lock:
+            if not self._batch:
+                self._batch_started_ns = now
+            self._batch.append(row)
+            full = (len(self._batch) >= self.batch_size
+                    or now - self._batch_started_ns >= self.flush_interval_ns)
+        if full:
+            self.flush()
+
+    def on_move(self, x, y):
+        now = self.clock()
+        self._counts['raw_events'] += 1
+        last_raw = self._last_raw
+        self._last_raw = (now, x, y)
+
+        if last_raw is None or now - last_raw[0] > self.pause_ns:
+            # Close the previous stroke at its true end, then start a new one
+            if self._held is not None:
+                self._keep(*self._held)
+            self._last_kept = self._last_speed = self._heading = None
+            self._keep(now, x, y)
+            return
+
+        last_ns, last_x, last_y = self._last_kept
+        dx, dy = x - last_x, y - last_y
+        if math.hypot(dx, dy) >= self.min_distance:
+            heading = math.atan2(dy, dx)
+            turned = False
+            if self._heading is not None:
+                turn = abs((heading - self._heading + math.pi) % (2 * math.pi) - math.pi)
+                turned = turn > self.max_angle
+            if turned or now - last_ns >= self.max_interval_ns:
+                self._heading = heading
+                self._keep(now, x, y)
+                return
+        self._held = (now, x, y)
+
+    def on_click(self, x, y, button, pressed):
+        if not pressed:
+            return
+        now = self.clock()
+        self._counts['raw_events'] += 1
+        if self._held is not None:
+            self._keep(*self._held)
+        self._keep(now, x, y, getattr(button, 'name', str(button)))
+        # A click ends the stroke
+        self._end_stroke()
+
+    def flush(self):
+        """Hand pending rows to the sink now"""
+        with self._lock:
+            batch, self._batch = self._batch, []
+        if batch:
+            self.sink(batch)
+
+    def stats(self):
+        """Return raw events, stored rows and reduction ratio per session"""
+        return {
+            session_id: dict(counts, reduction_ratio=(counts['raw_events'] / counts['rows']
+                                                      if counts['rows'] else None))
+            for session_id, counts in self.sessions.items()
+        }
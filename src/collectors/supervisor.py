@@ -0,0 +1,284 @@
+import math
+import multiprocessing
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from core.compact import from_epoch_us, to_epoch_us
+from .keyboard import KeyboardCollector
+from .mouse import MouseCollector
+
+KEYSTROKE = 0
+MOUSE = 1
+
+# kind, click code, x, y, timestamp (µs), press duration or speed,
+# inter-key interval or acceleration (NaN for None), UTF-8 key name
+KEY_BYTES = 32
+RECORD = struct.Struct(f'<BBxxiiqdd{KEY_BYTES}s')
+# write index, read index, dropped records, child heartbeat (time.time_ns)
+HEADER = struct.Struct('<qqqq')
+
+CLICK_NAMES = (None, 'left', 'right', 'middle')
+CLICK_CODES = {name: code for code, name in enumerate(CLICK_NAMES) if name}
+OTHER_CLICK = len(CLICK_NAMES)
+
+def _float(value):
+    return math.nan if value is None else value
+
+def _optional(value):
+    return None if math.isnan(value) else value
+
+def _key_bytes(name):
+    """UTF-8 key name, cut at a character boundary if it exceeds KEY_BYTES"""
+    data = name.encode()
+    if len(data) > KEY_BYTES:
+        data = data[:KEY_BYTES].decode(errors='ignore').encode()
+    return data
+
+class SharedRing:
+    """Single-producer, single-consumer ring of fixed-size records in shared memory
+
+    The child process appends packed records and then advances the write
+    index; the parent reads up to that index and advances the read index.
+    Nothing is pickled per event. When the ring is full new records are
+    dropped and counted rather than blocking the input hooks.
+    """
+
+    def __init__(self, capacity=65536, name=None):
+        self.capacity = capacity
+        size = HEADER.size + capacity * RECORD.size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            HEADER.pack_into(self.shm.buf, 0, 0, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self._push_lock = threading.Lock()
+
+    def _header(self):
+        return HEADER.unpack_from(self.shm.buf, 0)
+
+    def __len__(self):
+        write, read, _, _ = self._header()
+        return write - read
+
+    @property
+    def dropped(self):
+        return self._header()[2]
+
+    @property
+    def heartbeat_ns(self):
+        return self._header()[3]
+
+    def beat(self):
+        struct.pack_into('<q', self.shm.buf, 24, time.time_ns())
+
+    def push(self, records):
+        """Append packed record tuples; returns how many fitted"""
+        with self._push_lock:
+            buf = self.shm.buf
+            write, read, dropped, _ = self._header()
+            accepted = 0
+            for record in records:
+                if write - read >= self.capacity:
+                    read = self._header()[1]
+                    if write - read >= self.capacity:
+                        dropped += 1
+                        continue
+                RECORD.pack_into(buf, HEADER.size + (write % self.capacity) * RECORD.size,
+                                 *record)
+                write += 1
+                accepted += 1
+            # Publish the records before the index that makes them visible
+            struct.pack_into('<q', buf, 16, dropped)
+            struct.pack_into('<q', buf, 0, write)
+            return accepted
+
+    def pop(self, limit=None):
+        """Remove and return up to `limit` unpacked records"""
+        buf = self.shm.buf
+        write, read, _, _ = self._header()
+        if limit is not None:
+            write = min(write, read + limit)
+        records = [RECORD.unpack_from(buf, HEADER.size + (index % self.capacity) * RECORD.size)
+                   for index in range(read, write)]
+        struct.pack_into('<q', buf, 8, write)
+        return records
+
+    def push_keystrokes(self, rows):
+        self.push((KEYSTROKE, 0, 0, 0, to_epoch_us(timestamp), press_duration,
+                   _float(inter_key_interval), _key_bytes(key_pressed))
+                  for _, timestamp, key_pressed, _, press_duration, inter_key_interval in rows)
+
+    def push_mouse_movements(self, rows):
+        self.push((MOUSE, CLICK_CODES.get(click_type, OTHER_CLICK) if click_type else 0,
+                   x, y, to_epoch_us(timestamp), _float(speed), _float(acceleration), b'')
+                  for _, timestamp, x, y, speed, acceleration, click_type in rows)
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+def pynput_source(keyboard, mouse, stop_event, attempt):
+    """Start the real input hooks; returns what must stay alive (has is_alive())"""
+    keyboard.start()
+    mouse.start()
+    return [keyboard, mouse]
+
+def run_collectors(ring_name, capacity, stop_event, source, attempt, options,
+                   heartbeat_interval=0.1):
+    """Child process entry point: capture input into the shared ring until stopped
+
+    Exits with an error when a capture thread dies, so the supervisor can
+    restart it.
+    """
+    ring = SharedRing(capacity, name=ring_name)
+    keyboard = KeyboardCollector(ring.push_keystrokes, 0, **options.get('keyboard', {}))
+    mouse = MouseCollector(ring.push_mouse_movements, 0, **options.get('mouse', {}))
+    try:
+        threads = source(keyboard, mouse, stop_event, attempt)
+        ring.beat()
+        while not stop_event.wait(heartbeat_interval):
+            ring.beat()
+            keyboard.flush()
+            mouse.flush()
+            if not all(thread.is_alive() for thread in threads):
+                raise RuntimeError("Input listener stopped unexpectedly")
+    finally:
+        keyboard.stop()
+        mouse.stop()
+        ring.close()
+
+class CollectorSupervisor:
+    """Run keyboard and mouse capture in a child process and relay its events
+
+    The child writes fixed-size records into a SharedRing; a drain thread in
+    this process turns them back into keystroke and mouse rows for the
+    current session and hands them to `keystroke_sink(rows)` and
+    `mouse_sink(rows)` (BackgroundWriter.add_keystrokes and
+    add_mouse_movements). Capture therefore never competes with the GUI
+    thread or its GIL. If the child dies it is restarted after
+    `restart_delay` seconds, up to `max_restarts` times per start(); events
+    still in the ring survive the restart.
+    """
+
+    def __init__(self, keystroke_sink, mouse_sink, capacity=65536, drain_interval=0.05,
+                 max_restarts=5, restart_delay=0.5, source=pynput_source, options=None):
+        self.keystroke_sink = keystroke_sink
+        self.mouse_sink = mouse_sink
+        self.capacity = capacity
+        self.drain_interval = drain_interval
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self.source = source
+        self.options = options or {}
+        self._context = multiprocessing.get_context('spawn')
+        self._ring = None
+        self._process = None
+        self._stop_event = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self.session_id = None
+        self.restarts = 0
+        self.failed = False
+        self.received = 0
+        self.last_error = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, session_id):
+        """Start capturing into `session_id`"""
+        if self.is_running():
+            raise RuntimeError("Collectors are already running")
+        self.session_id = session_id
+        self.restarts = 0
+        self.failed = False
+        self._ring = SharedRing(self.capacity)
+        self._stopping.clear()
+        self._stop_event = self._context.Event()
+        self._spawn()
+        self._thread = threading.Thread(target=self._run, name='bbiometrics-collector-drain',
+                                        daemon=True)
+        self._thread.start()
+
+    def _spawn(self):
+        self._process = self._context.Process(
+            target=run_collectors, name='bbiometrics-collectors', daemon=True,
+            args=(self._ring.name, self.capacity, self._stop_event, self.source,
+                  self.restarts, self.options))
+        self._process.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.drain_interval):
+            self._drain()
+            process = self._process
+            if process.exitcode is None:
+                continue
+            self.last_error = f"Collector process exited with code {process.exitcode}"
+            if self.restarts >= self.max_restarts:
+                self.failed = True
+                break
+            if self._stopping.wait(self.restart_delay):
+                break
+            self.restarts += 1
+            self._spawn()
+        self._drain()
+
+    def _drain(self):
+        keystrokes, mouse = [], []
+        session_id = self.session_id
+        for kind, click, x, y, ts_us, a, b, key in self._ring.pop():
+            timestamp = from_epoch_us(ts_us)
+            if kind == KEYSTROKE:
+                key = key.rstrip(b'\0').decode(errors='replace')
+                keystrokes.append((session_id, timestamp, key, key, a, _optional(b)))
+            else:
+                click_type = None
+                if click:
+                    click_type = CLICK_NAMES[click] if click < OTHER_CLICK else 'other'
+                mouse.append((session_id, timestamp, x, y, _optional(a), _optional(b),
+                              click_type))
+        self.received += len(keystrokes) + len(mouse)
+        if keystrokes:
+            self.keystroke_sink(keystrokes)
+        if mouse:
+            self.mouse_sink(mouse)
+
+    def stop(self, timeout=2.0):
+        """Stop capture, relay the remaining events and release the ring"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._process.join(timeout)
+        if self._process.exitcode is None:
+            self._process.terminate()
+            self._process.join()
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self._ring.close()
+        self._ring.unlink()
+        self._ring = None
+
+    def health(self):
+        """Return process state, restart count, heartbeat age and ring usage"""
+        ring = self._ring
+        heartbeat_age = None
+        if ring is not None and ring.heartbeat_ns:
+            heartbeat_age = (time.time_ns() - ring.heartbeat_ns) / 1e9
+        return {
+            'running': self.is_running(),
+            'alive': self._process is not None and self._process.is_alive(),
+            'pid': self._process.pid if self._process is not None else None,
+            'failed': self.failed,
+            'restarts': self.restarts,
+            'heartbeat_age': heartbeat_age,
+            'pending': len(ring) if ring is not None else 0,
+            'dropped': ring.dropped if ring is not None else 0,
+            'received': self.received,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,167 @@
+from itertools import islice
+
+import numpy as np
+
+# Column layouts handed to the ml package. Timestamps are float seconds since
+# 1970-01-01 of the recorded wall-clock time; keys and clicks are integer
+# codes from event_codes (0 means no click). Names that have no stored code
+# yet get negative codes that are only valid within one name -> code map.
+KEYSTROKE_DTYPE = np.dtype([
+    ('session_id', 'i8'),
+    ('timestamp', 'f8'),
+    ('key_pressed', 'i4'),
+    ('key_released', 'i4'),
+    ('press_duration', 'f8'),
+    ('inter_key_interval', 'f8'),
+])
+
+MOUSE_DTYPE = np.dtype([
+    ('session_id', 'i8'),
+    ('timestamp', 'f8'),
+    ('x_position', 'i4'),
+    ('y_position', 'i4'),
+    ('movement_speed', 'f8'),
+    ('acceleration', 'f8'),
+    ('click_type', 'i4'),
+])
+
+# Exact seconds-since-epoch for the text timestamps of the legacy tables
+LEGACY_SECONDS_SQL = ("(CAST(strftime('%s', {0}) AS INTEGER) "
+                      "+ CAST(substr({0}, 20) AS REAL))")
+
+def _legacy_keystroke_sql(table):
+    return f'''
+        SELECT session_id, {LEGACY_SECONDS_SQL.format('timestamp')},
+               key_pressed, key_released, press_duration, inter_key_interval
+        FROM {table}
+        WHERE session_id = ?
+    '''
+
+def _legacy_mouse_sql(table):
+    return f'''
+        SELECT session_id, {LEGACY_SECONDS_SQL.format('timestamp')},
+               x_position, y_position, movement_speed, acceleration, click_type
+        FROM {table}
+        WHERE session_id = ?
+    '''
+
+def _source(db, kind):
+    """Return (table holding text-timestamped rows, compact table or None)"""
+    legacy_table = 'keystroke_dynamics' if kind == 'keystroke' else 'mouse_movements'
+    if db.compact_storage:
+        compact_table = 'keystroke_events' if kind == 'keystroke' else 'mouse_events'
+        return legacy_table + '_legacy', compact_table
+    return legacy_table, None
+
+def event_codes(conn):
+    """Return the stored event codes as a name -> code dict"""
+    return dict(conn.execute('SELECT name, code FROM event_codes'))
+
+def _converter(kind, codes):
+    """Row function turning key and click names into codes from `codes`
+
+    Legacy rows carry names; they are resolved here rather than by
+    registering them in event_codes, so loading data never writes to the
+    database. Unknown names are added to `codes` with negative codes.
+    """
+    next_code = [min(min(codes.values(), default=0), 0) - 1]
+
+    def code(name):
+        if name is None:
+            return 0
+        if not isinstance(name, str):
+            return name  # already a code (compact rows)
+        value = codes.get(name)
+        if value is None:
+            value = codes[name] = next_code[0]
+            next_code[0] -= 1
+        return value
+
+    if kind == 'keystroke':
+        return lambda row: row[:2] + (code(row[2]), code(row[3])) + row[4:]
+    return lambda row: row[:6] + (code(row[6]),)
+
+def _query(db, kind, session_id, codes):
+    """Return (sql, params, count_sql, convert) selecting one session's events in DTYPE order
+
+    `convert` maps the fetched rows onto the dtype, or is None when they
+    already match it.
+    """
+    conn = db._get_connection()
+    legacy_table, compact_table = _source(db, kind)
+    if kind == 'keystroke':
+        sql = _legacy_keystroke_sql(legacy_table)
+        compact_sql = '''
+            SELECT session_id, ts_us / 1e6, key_pressed, key_released,
+                   press_duration, inter_key_interval
+            FROM keystroke_events
+            WHERE session_id = ?
+        '''
+    else:
+        sql = _legacy_mouse_sql(legacy_table)
+        compact_sql = '''
+            SELECT session_id, ts_us / 1e6, x_position, y_position,
+                   movement_speed, acceleration, IFNULL(click_type, 0)
+            FROM mouse_events
+            WHERE session_id = ?
+        '''
+
+    convert = _converter(kind, codes)
+    if compact_table is None:
+        return (sql + ' ORDER BY 2', (session_id,),
+                f'SELECT COUNT(*) FROM {legacy_table} WHERE session_id = ?', convert)
+    has_legacy = conn.execute(f'SELECT EXISTS (SELECT 1 FROM {legacy_table} WHERE session_id = ?)',
+                              (session_id,)).fetchone()[0]
+    if not has_legacy:
+        return (compact_sql + ' ORDER BY 2', (session_id,),
+                f'SELECT COUNT(*) FROM {compact_table} WHERE session_id = ?', None)
+    return (f'{compact_sql} UNION ALL {sql} ORDER BY 2', (session_id, session_id),
+            f'''SELECT (SELECT COUNT(*) FROM {compact_table} WHERE session_id = ?1)
+                     + (SELECT COUNT(*) FROM {legacy_table} WHERE session_id = ?1)''',
+            convert)
+
+def _dtype(kind):
+    return KEYSTROKE_DTYPE if kind == 'keystroke' else MOUSE_DTYPE
+
+def _codes(db, codes):
+    return event_codes(db._get_connection()) if codes is None else codes
+
+def iter_arrays(db, kind, session_id, chunk_size=65536, codes=None):
+    """Yield a session's events as structured arrays of at most chunk_size rows
+
+    `codes` is the name -> code map to use (and extend); pass the same dict
+    to keep negative codes consistent across sessions.
+    """
+    sql, params, _, convert = _query(db, kind, session_id, _codes(db, codes))
+    cursor = db._get_connection().execute(sql, params)
+    if convert is not None:
+        cursor = map(convert, cursor)
+    dtype = _dtype(kind)
+    while True:
+        chunk = np.fromiter(islice(cursor, chunk_size), dtype)
+        if not len(chunk):
+            return
+        yield chunk
+
+def load_array(db, kind, session_id, codes=None):
+    """Load a whole session into one preallocated structured array"""
+    sql, params, count_sql, convert = _query(db, kind, session_id, _codes(db, codes))
+    conn = db._get_connection()
+    # Count and fetch from one snapshot so the preallocated size is exact
+    owns_transaction = not conn.in_transaction
+    if owns_transaction:
+        conn.execute('BEGIN')
+    try:
+        count = conn.execute(count_sql, (session_id,)).fetchone()[0]
+        rows = conn.execute(sql, params)
+        if convert is not None:
+            rows = map(convert, rows)
+        return np.fromiter(rows, _dtype(kind), count=count)
+    finally:
+        if owns_transaction:
+            conn.commit()
+
+def load_dataframe(db, kind, session_id):
+    """Load a whole session as a pandas DataFrame built from the structured array"""
+    import pandas as pd
+    return pd.DataFrame(load_array(db, kind, session_id))
@@ -0,0 +1,214 @@
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from .migrations import Backfill
+
+# Naive timestamps are stored as microseconds since this epoch, so the value
+# round-trips to exactly the wall-clock time the collectors recorded
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+# SQL expression turning a stored microsecond count back into the text
+# timestamps the legacy tables return (str(datetime) format)
+TIMESTAMP_SQL = ("strftime('%Y-%m-%d %H:%M:%S', {0} / 1000000, 'unixepoch') "
+                 "|| CASE WHEN {0} % 1000000 = 0 THEN '' "
+                 "ELSE printf('.%06d', {0} % 1000000) END")
+
+def to_epoch_us(timestamp):
+    """Convert a datetime, ISO string or microsecond count to integer microseconds"""
+    if isinstance(timestamp, int):
+        return timestamp
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return (timestamp - EPOCH) // ONE_MICROSECOND
+
+def from_epoch_us(ts_us):
+    """Convert integer microseconds back to a naive datetime"""
+    return EPOCH + timedelta(microseconds=ts_us)
+
+class CompactStorage:
+    """Narrow integer storage for the keystroke and mouse event tables
+
+    In compact mode `keystroke_events` and `mouse_events` hold the events in
+    WITHOUT ROWID tables clustered on (session_id, ts_us), with keys and click
+    types replaced by integer codes from `event_codes`. The original
+    `keystroke_dynamics` and `mouse_movements` names become views that decode
+    rows back to the legacy column shape, so every read API keeps working.
+    The legacy tables are renamed to `*_legacy` and drained into the compact
+    tables by resumable backfills; the views cover both while that runs.
+
+    A row whose timestamp is already taken within its session is bumped by a
+    microsecond until it is free, so (session_id, ts_us) stays a unique key;
+    every other row keeps its own time, including rows that arrive out of
+    order.
+    """
+
+    KEYSTROKE_BACKFILL = 'compact_keystrokes'
+    MOUSE_BACKFILL = 'compact_mouse'
+
+    def __init__(self, db):
+        self.db = db
+        self._codes = {}
+        self._last_ts = {}
+        self._lock = threading.Lock()
+
+    def is_enabled(self, conn):
+        row = conn.execute('''
+            SELECT type FROM sqlite_master WHERE name = 'keystroke_dynamics'
+        ''').fetchone()
+        return row is not None and row[0] == 'view'
+
+    def enable(self, conn):
+        """Switch the database to compact storage; existing rows move over in backfills"""
+        if self.is_enabled(conn):
+            return False
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('ALTER TABLE keystroke_dynamics RENAME TO keystroke_dynamics_legacy')
+            conn.execute('ALTER TABLE mouse_movements RENAME TO mouse_movements_legacy')
+            conn.execute(f'''
+                CREATE VIEW keystroke_dynamics AS
+                SELECT e.ts_us AS keystroke_id, e.session_id,
+                       {TIMESTAMP_SQL.format('e.ts_us')} AS timestamp,
+                       p.name AS key_pressed, r.name AS key_released,
+                       e.press_duration, e.inter_key_interval
+                FROM keystroke_events e
+                JOIN event_codes p ON p.code = e.key_pressed
+                JOIN event_codes r ON r.code = e.key_released
+                UNION ALL
+                SELECT * FROM keystroke_dynamics_legacy
+            ''')
+            conn.execute(f'''
+                CREATE VIEW mouse_movements AS
+                SELECT e.ts_us AS movement_id, e.session_id,
+                       {TIMESTAMP_SQL.format('e.ts_us')} AS timestamp,
+                       e.x_position, e.y_position, e.movement_speed,
+                       e.acceleration, c.name AS click_type
+                FROM mouse_events e
+                LEFT JOIN event_codes c ON c.code = e.click_type
+                UNION ALL
+                SELECT * FROM mouse_movements_legacy
+            ''')
+            for backfill in self.backfills():
+                conn.execute('''
+                    INSERT OR IGNORE INTO migration_backfills (name, last_key)
+                    VALUES (?, 0)
+                ''', (backfill.name,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return True
+
+    def backfills(self):
+        """Backfills that move legacy rows into the compact tables"""
+        return [
+            Backfill(self.KEYSTROKE_BACKFILL, 'keystroke_dynamics_legacy', 'keystroke_id',
+                     self._convert_keystrokes),
+            Backfill(self.MOUSE_BACKFILL, 'mouse_movements_legacy', 'movement_id',
+                     self._convert_mouse),
+        ]
+
+    def code_for(self, conn, name):
+        """Return the integer code for a key or click name, assigning one if needed"""
+        if name is None:
+            return None
+        code = self._codes.get(name)
+        if code is None:
+            conn.execute('INSERT OR IGNORE INTO event_codes (name) VALUES (?)', (name,))
+            code = conn.execute('SELECT code FROM event_codes WHERE name = ?',
+                                (name,)).fetchone()[0]
+            self._codes[name] = code
+        return code
+
+    @contextmanager
+    def _forget_codes_on_error(self):
+        # Codes assigned inside a failed transaction are rolled back with it
+        try:
+            yield
+        except Exception:
+            self._codes.clear()
+            raise
+
+    def _free_ts(self, conn, table, session_id, ts_us, batch):
+        """Return ts_us, or the next microsecond not yet taken in the session
+
+        `batch` holds the keys picked earlier in the same insert. Rows later
+        than anything stored for the session skip the lookup.
+        """
+        key = (table, session_id)
+        last = self._last_ts.get(key)
+        if last is None:
+            last = conn.execute(f'SELECT MAX(ts_us) FROM {table} WHERE session_id = ?',
+                                (session_id,)).fetchone()[0]
+            last = -1 if last is None else last
+        if ts_us <= last:
+            while ((session_id, ts_us) in batch or conn.execute(
+                    f'SELECT 1 FROM {table} WHERE session_id = ? AND ts_us = ?',
+                    (session_id, ts_us)).fetchone()):
+                ts_us += 1
+        batch.add((session_id, ts_us))
+        self._last_ts[key] = max(last, ts_us)
+        return ts_us
+
+    def insert_keystrokes(self, conn, rows):
+        """Insert legacy-shaped keystroke rows into keystroke_events"""
+        batch = set()
+        with self._lock, self._forget_codes_on_error():
+            conn.executemany('''
+                INSERT INTO keystroke_events (
+                    session_id, ts_us, key_pressed, key_released,
+                    press_duration, inter_key_interval
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(session_id,
+                   self._free_ts(conn, 'keystroke_events', session_id, to_epoch_us(timestamp),
+                                 batch),
+                   self.code_for(conn, key_pressed), self.code_for(conn, key_released),
+                   press_duration, inter_key_interval)
+                  for session_id, timestamp, key_pressed, key_released,
+                      press_duration, inter_key_interval in rows])
+
+    def insert_mouse_movements(self, conn, rows):
+        """Insert legacy-shaped mouse rows into mouse_events"""
+        batch = set()
+        with self._lock, self._forget_codes_on_error():
+            conn.executemany('''
+                INSERT INTO mouse_events (
+                    session_id, ts_us, x_position, y_position,
+                    movement_speed, acceleration, click_type
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(session_id,
+                   self._free_ts(conn, 'mouse_events', session_id, to_epoch_us(timestamp), batch),
+                   x_position, y_position, movement_speed, acceleration,
+                   self.code_for(conn, click_type))
+                  for session_id, timestamp, x_position, y_position,
+                      movement_speed, acceleration, click_type in rows])
+
+    def _convert_keystrokes(self, conn, lower, upper):
+        rows = conn.execute('''
+            SELECT session_id, timestamp, key_pressed, key_released,
+                   press_duration, inter_key_interval
+            FROM keystroke_dynamics_legacy
+            WHERE keystroke_id > ? AND keystroke_id <= ?
+            ORDER BY session_id, timestamp, keystroke_id
+        ''', (lower, upper)).fetchall()
+        self.insert_keystrokes(conn, rows)
+        conn.execute('''
+            DELETE FROM keystroke_dynamics_legacy
+            WHERE keystroke_id > ? AND keystroke_id <= ?
+        ''', (lower, upper))
+
+    def _convert_mouse(self, conn, lower, upper):
+        rows = conn.execute('''
+            SELECT session_id, timestamp, x_position, y_position,
+                   movement_speed, acceleration, click_type
+            FROM mouse_movements_legacy
+            WHERE movement_id > ? AND movement_id <= ?
+            ORDER BY session_id, timestamp, movement_id
+        ''', (lower, upper)).fetchall()
+        self.insert_mouse_movements(conn, rows)
+        conn.execute('''
+            DELETE FROM mouse_movements_legacy
+            WHERE movement_id > ? AND movement_id <= ?
+        ''', (lower, upper))
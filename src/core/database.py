@@ -1,23 +1,102 @@
 import sqlite3
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 import os
 from pathlib import Path
 
+from . import arrays, statistics, transfer
+from .compact import CompactStorage
+from .login_policy import NO_PATTERN, LoginPolicy
+from .login_profile import SLOT_COUNT, LoginProfile, profile_slots
+from .login_rate import LoginRateTracker
+from .migrations import MIGRATIONS, MigrationRunner
+
 class DatabaseManager:
-    def __init__(self):
-        # Create data directory if it doesn't exist
-        self.data_dir = Path(__file__).parent.parent.parent / 'data'
-        self.data_dir.mkdir(exist_ok=True)
+    def __init__(self, db_path=None, synchronous='NORMAL', cache_size=-16000,
+                 mmap_size=64 * 1024 * 1024, busy_timeout=5000, compact_storage=False):
+        if db_path is None:
+            # Create data directory if it doesn't exist
+            self.data_dir = Path(__file__).parent.parent.parent / 'data'
+            self.data_dir.mkdir(exist_ok=True)
+            
+            # Database file path
+            self.db_path = self.data_dir / 'bbiometrics.db'
+        else:
+            self.db_path = Path(db_path)
+            self.data_dir = self.db_path.parent
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Connection tuning, applied to every pooled connection
+        self.synchronous = synchronous
+        self.cache_size = cache_size  # negative values are KiB, positive are pages
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout  # in milliseconds
+        
+        # One long-lived connection per thread; WAL lets readers run
+        # alongside the writer without "database is locked" stalls
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         
-        # Database file path
-        self.db_path = self.data_dir / 'bbiometrics.db'
+        # Compiled login policies by user; None caches "no pattern"
+        self._login_policies = {}
+        # Learned login profiles by user, kept current by add_login_attempt
+        self._login_profiles = {}
+        # Sliding-window login counters; replace before first use to retune
+        self.login_rates = LoginRateTracker()
+        self._login_rates_loaded = False
         
         # Initialize database
         self.init_database()
+        
+        # Compact storage is sticky: once a database is converted it stays compact
+        self.compact = CompactStorage(self)
+        conn = self._get_connection()
+        if compact_storage:
+            self.compact.enable(conn)
+        self.compact_storage = self.compact.is_enabled(conn)
+        if self.compact_storage:
+            for backfill in self.compact.backfills():
+                self.migrations.add_backfill(backfill)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    
+    def _get_connection(self):
+        """Return the calling thread's pooled connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout / 1000,
+                                   check_same_thread=False)
+            # Lets retention free space in small steps; only takes effect on
+            # a brand-new file (see RetentionEngine.enable_incremental_vacuum)
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            conn.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+            conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+            conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close(self):
+        """Close every pooled connection; later calls transparently reopen"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
     
     def init_database(self):
         """Initialize the database with required tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
             # Create sessions table
@@ -103,21 +182,53 @@ class DatabaseManager:
             ''')
             
             conn.commit()
+        
+        # Bring existing databases up to the current schema version
+        self.migrate()
+    
+    def migrate(self):
+        """Apply pending schema upgrades, tracked in PRAGMA user_version
+        
+        Batched data backfills registered by the upgrades are not run here;
+        call run_backfills() or start_backfills() once the app is up.
+        """
+        self.migrations = MigrationRunner(self, MIGRATIONS)
+        return self.migrations.run()
     
-    def create_session(self, notes=None):
+    def run_backfills(self, time_budget=None):
+        """Advance pending data backfills; returns True when none remain"""
+        return self.migrations.run_backfills(time_budget)
+    
+    def start_backfills(self):
+        """Run pending data backfills on a background thread"""
+        return self.migrations.start_backfills()
+    
+    def create_session(self, notes=None, user_id=None):
         """Create a new session and return its ID"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO sessions (start_time, status, notes)
-                VALUES (?, ?, ?)
-            ''', (datetime.now(), 'active', notes))
+                INSERT INTO sessions (start_time, status, notes, user_id)
+                VALUES (?, ?, ?, ?)
+            ''', (datetime.now(), 'active', notes, user_id))
+            conn.commit()
+            return cursor.lastrowid
+    
+    def insert_session(self, start_time, end_time=None, status='completed', notes=None,
+                       user_id=None):
+        """Add a session recorded elsewhere, e.g. by an import, and return its new ID"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO sessions (start_time, end_time, status, notes, user_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (start_time, end_time, status, notes, user_id))
             conn.commit()
             return cursor.lastrowid
     
     def end_session(self, session_id):
         """End an existing session"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE sessions 
@@ -129,34 +240,62 @@ class DatabaseManager:
     def add_keystroke_data(self, session_id, key_pressed, key_released, 
                           press_duration, inter_key_interval=None):
         """Add keystroke dynamics data"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO keystroke_dynamics (
-                    session_id, timestamp, key_pressed, key_released,
-                    press_duration, inter_key_interval
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            ''', (session_id, datetime.now(), key_pressed, key_released,
-                 press_duration, inter_key_interval))
-            conn.commit()
+        self.add_keystrokes_bulk([(session_id, datetime.now(), key_pressed, key_released,
+                                   press_duration, inter_key_interval)])
     
     def add_mouse_movement(self, session_id, x_position, y_position,
                           movement_speed=None, acceleration=None, click_type=None):
         """Add mouse movement data"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO mouse_movements (
-                    session_id, timestamp, x_position, y_position,
-                    movement_speed, acceleration, click_type
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (session_id, datetime.now(), x_position, y_position,
-                 movement_speed, acceleration, click_type))
-            conn.commit()
+        self.add_mouse_movements_bulk([(session_id, datetime.now(), x_position, y_position,
+                                        movement_speed, acceleration, click_type)])
+    
+    def add_keystrokes_bulk(self, rows):
+        """Add many keystroke rows in one transaction
+        
+        Each row is (session_id, timestamp, key_pressed, key_released,
+        press_duration, inter_key_interval). Returns the number of rows written.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self._get_connection() as conn:
+            if self.compact_storage:
+                self.compact.insert_keystrokes(conn, rows)
+            else:
+                conn.executemany('''
+                    INSERT INTO keystroke_dynamics (
+                        session_id, timestamp, key_pressed, key_released,
+                        press_duration, inter_key_interval
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                ''', rows)
+            statistics.update_rollups(conn, keystroke_rows=rows)
+        return len(rows)
+    
+    def add_mouse_movements_bulk(self, rows):
+        """Add many mouse movement rows in one transaction
+        
+        Each row is (session_id, timestamp, x_position, y_position,
+        movement_speed, acceleration, click_type). Returns the number of rows written.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self._get_connection() as conn:
+            if self.compact_storage:
+                self.compact.insert_mouse_movements(conn, rows)
+            else:
+                conn.executemany('''
+                    INSERT INTO mouse_movements (
+                        session_id, timestamp, x_position, y_position,
+                        movement_speed, acceleration, click_type
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+            statistics.update_rollups(conn, mouse_rows=rows)
+        return len(rows)
     
     def add_behavioral_pattern(self, session_id, pattern_type, confidence_score, pattern_data):
         """Add analyzed behavioral pattern data"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO behavioral_patterns (
@@ -167,59 +306,89 @@ class DatabaseManager:
                  confidence_score, pattern_data))
             conn.commit()
     
+    def add_behavioral_patterns_bulk(self, rows, replace_sessions=(), replace_types=()):
+        """Add many behavioral pattern rows in one transaction
+        
+        Each row is (session_id, timestamp, pattern_type, confidence_score,
+        pattern_data). Rows of `replace_sessions` whose type is in
+        `replace_types` are deleted first, in the same transaction, so a
+        rescoring run replaces its earlier results. Returns the number of
+        rows written.
+        """
+        rows = list(rows)
+        with self._get_connection() as conn:
+            replace_types = list(replace_types)
+            if replace_types:
+                placeholders = ', '.join('?' for _ in replace_types)
+                conn.executemany(f'''
+                    DELETE FROM behavioral_patterns 
+                    WHERE session_id = ? AND pattern_type IN ({placeholders})
+                ''', [(session_id, *replace_types) for session_id in replace_sessions])
+            conn.executemany('''
+                INSERT INTO behavioral_patterns (
+                    session_id, timestamp, pattern_type,
+                    confidence_score, pattern_data
+                ) VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+        return len(rows)
+    
     def add_login_pattern(self, user_id, start_hour, end_hour, login_days, max_duration):
         """Add or update login pattern for a user"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             now = datetime.now()
             
-            # Check if pattern exists
+            # Insert, or update the existing pattern (user_id is unique)
             cursor.execute('''
-                SELECT pattern_id FROM login_patterns 
-                WHERE user_id = ?
-            ''', (user_id,))
-            
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Update existing pattern
-                cursor.execute('''
-                    UPDATE login_patterns 
-                    SET normal_login_start_hour = ?,
-                        normal_login_end_hour = ?,
-                        normal_login_days = ?,
-                        max_login_duration = ?,
-                        updated_at = ?
-                    WHERE user_id = ?
-                ''', (start_hour, end_hour, login_days, max_duration, now, user_id))
-            else:
-                # Create new pattern
-                cursor.execute('''
-                    INSERT INTO login_patterns (
-                        user_id, normal_login_start_hour, normal_login_end_hour,
-                        normal_login_days, max_login_duration, created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (user_id, start_hour, end_hour, login_days, max_duration, now, now))
+                INSERT INTO login_patterns (
+                    user_id, normal_login_start_hour, normal_login_end_hour,
+                    normal_login_days, max_login_duration, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    normal_login_start_hour = excluded.normal_login_start_hour,
+                    normal_login_end_hour = excluded.normal_login_end_hour,
+                    normal_login_days = excluded.normal_login_days,
+                    max_login_duration = excluded.max_login_duration,
+                    updated_at = excluded.updated_at
+            ''', (user_id, start_hour, end_hour, login_days, max_duration, now, now))
             
             conn.commit()
+        self._login_policies.pop(user_id, None)
     
     def add_login_attempt(self, user_id, success, duration, ip_address=None, 
-                         device_info=None, is_suspicious=False, reason=None):
-        """Record a login attempt"""
-        with sqlite3.connect(self.db_path) as conn:
+                         device_info=None, is_suspicious=False, reason=None,
+                         attempt_time=None):
+        """Record a login attempt
+        
+        Successful attempts also update the user's learned login profile in
+        the same transaction.
+        """
+        attempt_time = attempt_time or datetime.now()
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO login_attempts (
                     user_id, attempt_time, success, duration,
                     ip_address, device_info, is_suspicious, reason
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, datetime.now(), success, duration,
+            ''', (user_id, attempt_time, success, duration,
                  ip_address, device_info, is_suspicious, reason))
+            if success:
+                cursor.executemany('''
+                    INSERT INTO login_profile_counts (user_id, slot, count)
+                    VALUES (?, ?, 1)
+                    ON CONFLICT (user_id, slot) DO UPDATE SET count = count + 1
+                ''', [(user_id, slot) for slot in profile_slots(attempt_time, duration)])
             conn.commit()
+        profile = self._login_profiles.get(user_id)
+        if success and profile is not None:
+            profile.add(attempt_time, duration)
+        if self._login_rates_loaded:
+            self.login_rates.add(user_id, ip_address, success, attempt_time)
     
     def get_session_data(self, session_id):
         """Retrieve all data for a specific session"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
             # Get session info
@@ -245,16 +414,79 @@ class DatabaseManager:
                 'behavioral_patterns': patterns
             }
     
+    def get_session_user(self, session_id):
+        """Get the user a session was recorded for, or None"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT user_id FROM sessions WHERE session_id = ?', (session_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+    
+    def get_user_sessions(self, user_id):
+        """Get the IDs of all sessions recorded for a user, oldest first"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT session_id FROM sessions 
+                WHERE user_id = ?
+                ORDER BY session_id
+            ''', (user_id,))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def get_enrolled_users(self):
+        """Get every user ID that has recorded sessions"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT DISTINCT user_id FROM sessions 
+                WHERE user_id IS NOT NULL
+                ORDER BY user_id
+            ''')
+            return [row[0] for row in cursor.fetchall()]
+    
+    def get_user_activity(self, user_id):
+        """Get session and event counts plus the latest event time for a user
+        
+        Read from session_rollups, so the cost does not grow with history.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*), IFNULL(SUM(r.keystroke_count), 0),
+                       IFNULL(SUM(r.mouse_count), 0), MAX(r.last_event)
+                FROM sessions s
+                LEFT JOIN session_rollups r ON r.session_id = s.session_id
+                WHERE s.user_id = ?
+            ''', (user_id,))
+            sessions, keystrokes, mouse, last_event = cursor.fetchone()
+            return {
+                'session_count': sessions,
+                'keystroke_count': keystrokes,
+                'mouse_count': mouse,
+                'last_event': last_event
+            }
+    
+    def get_sessions_between(self, start, end):
+        """Get the IDs of sessions that overlap the time range [start, end]"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT session_id FROM sessions 
+                WHERE start_time <= ? AND (end_time IS NULL OR end_time >= ?)
+                ORDER BY session_id
+            ''', (end, start))
+            return [row[0] for row in cursor.fetchall()]
+    
     def get_active_sessions(self):
         """Get all active sessions"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM sessions WHERE status = "active"')
             return cursor.fetchall()
     
     def get_session_summary(self, session_id):
         """Get a summary of the session data"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
             # Get basic session info
@@ -287,9 +519,74 @@ class DatabaseManager:
                 'mouse_count': mouse_count
             }
     
+    def get_session_rollup(self, session_id):
+        """Get the incrementally maintained summary of a session in constant time"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM session_rollups 
+                WHERE session_id = ?
+            ''', (session_id,))
+            row = cursor.fetchone()
+            return statistics.rollup_to_stats(row) if row else None
+    
+    def get_session_statistics(self, session_ids):
+        """Compute exact counts, time span and percentiles for sessions in one query
+        
+        Returns a dict keyed by session ID. Durations, intervals and speeds
+        are summarised as mean, median (p50) and p90 where applicable.
+        """
+        session_ids = list(session_ids)
+        if not session_ids:
+            return {}
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(statistics.session_statistics_sql(len(session_ids)), session_ids)
+            results = {}
+            for row in cursor.fetchall():
+                stats = dict(zip(statistics.STATISTICS_COLUMNS, row))
+                stats['time_span'] = None
+                if stats['first_event'] and stats['last_event']:
+                    stats['time_span'] = (
+                        datetime.fromisoformat(stats['last_event'])
+                        - datetime.fromisoformat(stats['first_event'])).total_seconds()
+                results[stats['session_id']] = stats
+            return results
+    
+    def get_session_series(self, session_id, buckets=300):
+        """Average press duration and mouse speed over time, in at most `buckets` points
+        
+        The session's time span is cut into equal buckets and each series is
+        aggregated in SQL, so the result size does not depend on session
+        length. Points are (seconds from the first event, mean, count).
+        """
+        rollup = self.get_session_rollup(session_id)
+        if rollup is None or rollup['first_event'] is None:
+            return {'start': None, 'bucket_seconds': None, 'keystrokes': [], 'mouse': []}
+        start = rollup['first_event']
+        span = (datetime.fromisoformat(rollup['last_event'])
+                - datetime.fromisoformat(start)).total_seconds()
+        width = max(span / buckets, 1.0)
+        series = {}
+        with self._get_connection() as conn:
+            for name, table, column in (('keystrokes', 'keystroke_dynamics', 'press_duration'),
+                                        ('mouse', 'mouse_movements', 'movement_speed')):
+                cursor = conn.execute(f'''
+                    SELECT MIN(CAST((julianday(timestamp) - julianday(?)) * 86400 / ?
+                                    AS INTEGER), ?) AS bucket,
+                           AVG({column}), COUNT({column})
+                    FROM {table}
+                    WHERE session_id = ?
+                    GROUP BY bucket
+                    ORDER BY bucket
+                ''', (start, width, buckets - 1, session_id))
+                series[name] = [(bucket * width, mean, count)
+                                for bucket, mean, count in cursor.fetchall() if count]
+        return {'start': start, 'bucket_seconds': width, **series}
+    
     def get_keystroke_data(self, session_id):
         """Retrieve keystroke dynamics data for a session"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT * FROM keystroke_dynamics 
@@ -300,7 +597,7 @@ class DatabaseManager:
     
     def get_mouse_movements(self, session_id):
         """Retrieve mouse movement data for a session"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT * FROM mouse_movements 
@@ -309,9 +606,65 @@ class DatabaseManager:
             ''', (session_id,))
             return cursor.fetchall()
     
+    def _iter_rows(self, sql, params, chunk_size):
+        cursor = self._get_connection().execute(sql, params)
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    
+    def iter_keystroke_data(self, session_id, chunk_size=5000):
+        """Stream keystroke dynamics data for a session in lists of at most chunk_size rows"""
+        return self._iter_rows('''
+            SELECT * FROM keystroke_dynamics 
+            WHERE session_id = ?
+            ORDER BY timestamp
+        ''', (session_id,), chunk_size)
+    
+    def iter_mouse_movements(self, session_id, chunk_size=5000):
+        """Stream mouse movement data for a session in lists of at most chunk_size rows"""
+        return self._iter_rows('''
+            SELECT * FROM mouse_movements 
+            WHERE session_id = ?
+            ORDER BY timestamp
+        ''', (session_id,), chunk_size)
+    
+    def iter_keystroke_arrays(self, session_id, chunk_size=65536):
+        """Stream keystroke data as structured arrays (arrays.KEYSTROKE_DTYPE)"""
+        return arrays.iter_arrays(self, 'keystroke', session_id, chunk_size)
+    
+    def iter_mouse_arrays(self, session_id, chunk_size=65536):
+        """Stream mouse movements as structured arrays (arrays.MOUSE_DTYPE)"""
+        return arrays.iter_arrays(self, 'mouse', session_id, chunk_size)
+    
+    def export_sessions(self, path, session_ids=None, chunk_size=65536):
+        """Stream sessions (all by default) into a compressed .npz archive"""
+        return transfer.export_sessions(self, path, session_ids, chunk_size)
+    
+    def import_sessions(self, path, writer=None, batch_size=5000):
+        """Load an archive written by export_sessions as new sessions"""
+        return transfer.import_sessions(self, path, writer, batch_size)
+    
+    def load_keystroke_array(self, session_id):
+        """Load a session's keystroke data into one structured array"""
+        return arrays.load_array(self, 'keystroke', session_id)
+    
+    def load_mouse_array(self, session_id):
+        """Load a session's mouse movements into one structured array"""
+        return arrays.load_array(self, 'mouse', session_id)
+    
+    def load_keystroke_dataframe(self, session_id):
+        """Load a session's keystroke data as a pandas DataFrame"""
+        return arrays.load_dataframe(self, 'keystroke', session_id)
+    
+    def load_mouse_dataframe(self, session_id):
+        """Load a session's mouse movements as a pandas DataFrame"""
+        return arrays.load_dataframe(self, 'mouse', session_id)
+    
     def get_behavioral_patterns(self, session_id):
         """Retrieve behavioral patterns for a session"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT * FROM behavioral_patterns 
@@ -322,7 +675,7 @@ class DatabaseManager:
     
     def get_login_pattern(self, user_id):
         """Get login pattern for a user"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT * FROM login_patterns 
@@ -332,7 +685,7 @@ class DatabaseManager:
     
     def get_recent_login_attempts(self, user_id, limit=10):
         """Get recent login attempts for a user"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT * FROM login_attempts 
@@ -342,33 +695,88 @@ class DatabaseManager:
             ''', (user_id, limit))
             return cursor.fetchall()
     
+    def _load_login_policies(self, user_ids):
+        """Compile and cache the login policies of users not cached yet"""
+        missing = [user_id for user_id in set(user_ids) if user_id not in self._login_policies]
+        if not missing:
+            return
+        loaded = dict.fromkeys(missing)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                cursor.execute(f'''
+                    SELECT user_id, normal_login_start_hour, normal_login_end_hour,
+                           normal_login_days, max_login_duration
+                    FROM login_patterns 
+                    WHERE user_id IN ({', '.join('?' for _ in batch)})
+                ''', batch)
+                for row in cursor.fetchall():
+                    loaded[row[0]] = LoginPolicy(*row)
+        self._login_policies.update(loaded)
+    
+    def get_login_policy(self, user_id):
+        """Get the compiled login policy for a user, or None"""
+        self._load_login_policies([user_id])
+        return self._login_policies.get(user_id)
+    
+    def get_login_profile(self, user_id):
+        """Get the learned login profile of a user (empty if they have no history)"""
+        profile = self._login_profiles.get(user_id)
+        if profile is None:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT slot, count FROM login_profile_counts 
+                    WHERE user_id = ?
+                ''', (user_id,))
+                counts = [0] * SLOT_COUNT
+                for slot, count in cursor.fetchall():
+                    counts[slot] = count
+            profile = LoginProfile(user_id, counts)
+            self._login_profiles[user_id] = profile
+        return profile
+    
+    def get_login_rates(self):
+        """Get the login rate tracker, filling it from recent attempts on first use
+        
+        The rebuild is one range scan over idx_login_attempts_time covering
+        the tracker's window, not a query per user.
+        """
+        if not self._login_rates_loaded:
+            since = datetime.now() - timedelta(seconds=self.login_rates.window)
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT user_id, ip_address, success, attempt_time 
+                    FROM login_attempts 
+                    WHERE attempt_time >= ?
+                    ORDER BY attempt_time
+                ''', (since,))
+                self.login_rates.rebuild(cursor)
+            self._login_rates_loaded = True
+        return self.login_rates
+    
     def check_login_suspicious(self, user_id, login_time, duration):
         """Check if a login attempt is suspicious based on patterns"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Get user's login pattern
-            cursor.execute('''
-                SELECT * FROM login_patterns 
-                WHERE user_id = ?
-            ''', (user_id,))
-            pattern = cursor.fetchone()
-            
-            if not pattern:
-                return True, "No login pattern established"
-            
-            # Check if login time is within normal hours
-            login_hour = login_time.hour
-            if not (pattern[2] <= login_hour <= pattern[3]):
-                return True, "Login outside normal hours"
-            
-            # Check if login day is allowed
-            login_day = str(login_time.weekday())
-            if login_day not in pattern[4].split(','):
-                return True, "Login on non-allowed day"
-            
-            # Check if duration exceeds maximum
-            if duration > pattern[5]:
-                return True, "Login duration exceeds maximum"
-            
-            return False, None 
\ No newline at end of file
+        policy = self.get_login_policy(user_id)
+        if policy is None:
+            return NO_PATTERN
+        return policy.evaluate(login_time, duration)
+    
+    def check_logins_suspicious(self, attempts):
+        """Check many (user_id, login_time, duration) attempts at once
+        
+        Policies of all users involved are loaded in one query; returns a
+        list of (is_suspicious, reason) in input order.
+        """
+        attempts = list(attempts)
+        self._load_login_policies(attempt[0] for attempt in attempts)
+        policies = self._login_policies
+        results = []
+        for user_id, login_time, duration in attempts:
+            policy = policies.get(user_id)
+            results.append(NO_PATTERN if policy is None
+                           else policy.evaluate(login_time, duration))
+        return results 
\ No newline at end of file
@@ -0,0 +1,57 @@
+def hour_mask(start_hour, end_hour):
+    """24-bit mask of allowed hours; start > end wraps past midnight"""
+    if start_hour <= end_hour:
+        return ((1 << (end_hour + 1)) - 1) & ~((1 << start_hour) - 1)
+    return (((1 << 24) - 1) & ~((1 << start_hour) - 1)) | ((1 << (end_hour + 1)) - 1)
+
+def day_mask(login_days):
+    """7-bit weekday mask (Monday is bit 0) from a comma-separated day list"""
+    mask = 0
+    for day in str(login_days).split(','):
+        day = day.strip()
+        if day:
+            mask |= 1 << int(day)
+    return mask
+
+class LoginPolicy:
+    """A login_patterns row compiled for constant-time checks
+
+    Hours and weekdays are bitmasks, so evaluating an attempt is a few
+    integer operations with no parsing or database access. When the hour
+    window wraps past midnight (say 22 to 2), the early-morning hours belong
+    to the previous day's window, so they are checked against the previous
+    weekday.
+    """
+
+    __slots__ = ('user_id', 'start_hour', 'end_hour', 'hours', 'days', 'max_duration')
+
+    def __init__(self, user_id, start_hour, end_hour, login_days, max_duration):
+        self.user_id = user_id
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.hours = hour_mask(start_hour, end_hour)
+        self.days = day_mask(login_days)
+        self.max_duration = max_duration
+
+    @property
+    def wraps(self):
+        return self.start_hour > self.end_hour
+
+    def evaluate(self, login_time, duration):
+        """Return (is_suspicious, reason) for one attempt"""
+        hour = login_time.hour
+        if not self.hours >> hour & 1:
+            return True, "Login outside normal hours"
+
+        day = login_time.weekday()
+        if self.wraps and hour <= self.end_hour:
+            day = (day - 1) % 7
+        if not self.days >> day & 1:
+            return True, "Login on non-allowed day"
+
+        if duration > self.max_duration:
+            return True, "Login duration exceeds maximum"
+
+        return False, None
+
+NO_PATTERN = (True, "No login pattern established")
@@ -0,0 +1,65 @@
+from bisect import bisect_right
+
+HOURS_PER_WEEK = 7 * 24
+
+# Login durations are binned on a doubling scale from 0.25 s to about an hour
+DURATION_EDGES = tuple(0.25 * 2 ** k for k in range(15))
+DURATION_BINS = len(DURATION_EDGES) + 1
+
+# login_profile_counts slots: hours of the week first, then duration bins
+SLOT_COUNT = HOURS_PER_WEEK + DURATION_BINS
+
+def hour_of_week(login_time):
+    """0 for Monday 00:00-00:59 up to 167 for Sunday 23:00-23:59"""
+    return login_time.weekday() * 24 + login_time.hour
+
+def duration_bin(duration):
+    return bisect_right(DURATION_EDGES, duration)
+
+def profile_slots(login_time, duration):
+    """The two login_profile_counts slots one successful login increments"""
+    return hour_of_week(login_time), HOURS_PER_WEEK + duration_bin(duration)
+
+class LoginProfile:
+    """Fixed-size learned model of when and how long a user logs in
+
+    Holds a 168-bin hour-of-week histogram and a 16-bin duration histogram
+    of successful logins. Probabilities use add-`alpha` smoothing, so each
+    lookup is two list reads and a division however long the history is.
+    An attempt is suspicious when its hour-of-week or duration is less than
+    `min_ratio` times as likely as under a uniform spread, once at least
+    `min_attempts` logins have been learned.
+    """
+
+    __slots__ = ('user_id', 'counts', 'total', 'alpha', 'min_attempts', 'min_ratio')
+
+    def __init__(self, user_id, counts=None, alpha=0.02, min_attempts=20, min_ratio=0.25):
+        self.user_id = user_id
+        self.counts = list(counts) if counts is not None else [0] * SLOT_COUNT
+        self.total = sum(self.counts[:HOURS_PER_WEEK])
+        self.alpha = alpha
+        self.min_attempts = min_attempts
+        self.min_ratio = min_ratio
+
+    def add(self, login_time, duration):
+        for slot in profile_slots(login_time, duration):
+            self.counts[slot] += 1
+        self.total += 1
+
+    def time_probability(self, login_time):
+        return ((self.counts[hour_of_week(login_time)] + self.alpha)
+                / (self.total + HOURS_PER_WEEK * self.alpha))
+
+    def duration_probability(self, duration):
+        return ((self.counts[HOURS_PER_WEEK + duration_bin(duration)] + self.alpha)
+                / (self.total + DURATION_BINS * self.alpha))
+
+    def evaluate(self, login_time, duration):
+        """Return (is_suspicious, reason) for one attempt"""
+        if self.total < self.min_attempts:
+            return False, None
+        if self.time_probability(login_time) * HOURS_PER_WEEK < self.min_ratio:
+            return True, "Login at an unusual time of week"
+        if self.duration_probability(duration) * DURATION_BINS < self.min_ratio:
+            return True, "Unusual login duration"
+        return False, None
@@ -0,0 +1,116 @@
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from .compact import to_epoch_us
+
+def _seconds(timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return to_epoch_us(timestamp) / 1e6
+
+class SlidingWindowCounters:
+    """Attempt and failure counts per key over a sliding time window
+
+    Time is cut into `bucket_seconds` buckets and each key keeps at most
+    window / bucket_seconds of them plus running totals, so adding and
+    reading are O(1). Keys are kept in least-recently-active order; idle
+    keys are dropped once their buckets expire, and the least recently
+    active key is evicted when more than `max_keys` are live.
+    """
+
+    def __init__(self, window=300, bucket_seconds=10, max_keys=10000):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = max(1, int(round(window / bucket_seconds)))
+        self.max_keys = max_keys
+        self._keys = OrderedDict()  # key -> [deque of [bucket, attempts, failures], attempts, failures]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _expire(self, entry, bucket):
+        buckets = entry[0]
+        while buckets and buckets[0][0] <= bucket - self.bucket_count:
+            _, attempts, failures = buckets.popleft()
+            entry[1] -= attempts
+            entry[2] -= failures
+
+    def add(self, key, now, failed):
+        bucket = int(now // self.bucket_seconds)
+        entry = self._keys.get(key)
+        if entry is None:
+            entry = self._keys[key] = [deque(), 0, 0]
+        else:
+            self._keys.move_to_end(key)
+            self._expire(entry, bucket)
+        buckets = entry[0]
+        if buckets and buckets[-1][0] >= bucket:
+            buckets[-1][1] += 1
+            buckets[-1][2] += failed
+        else:
+            buckets.append([bucket, 1, int(failed)])
+        entry[1] += 1
+        entry[2] += failed
+
+        # Drop keys that have gone quiet, then enforce the key limit
+        while self._keys:
+            oldest_key, oldest = next(iter(self._keys.items()))
+            active = oldest[0] and oldest[0][-1][0] > bucket - self.bucket_count
+            if active and len(self._keys) <= self.max_keys:
+                break
+            del self._keys[oldest_key]
+
+    def counts(self, key, now):
+        """Return (attempts, failures) of a key within the window ending at `now`"""
+        entry = self._keys.get(key)
+        if entry is None:
+            return 0, 0
+        self._expire(entry, int(now // self.bucket_seconds))
+        return entry[1], entry[2]
+
+class LoginRateTracker:
+    """Brute-force and velocity detection over recent login attempts
+
+    Keeps sliding-window counters per user_id and per ip_address. An attempt
+    is suspicious when, counting itself, its user or IP exceeds the allowed
+    failures (a brute-force burst) or attempts (abnormal velocity) within
+    `window` seconds.
+    """
+
+    def __init__(self, window=300, bucket_seconds=10, max_keys=10000, max_user_failures=5,
+                 max_ip_failures=20, max_user_attempts=20, max_ip_attempts=60):
+        self.window = window
+        self.users = SlidingWindowCounters(window, bucket_seconds, max_keys)
+        self.ips = SlidingWindowCounters(window, bucket_seconds, max_keys)
+        self.max_user_failures = max_user_failures
+        self.max_ip_failures = max_ip_failures
+        self.max_user_attempts = max_user_attempts
+        self.max_ip_attempts = max_ip_attempts
+
+    def add(self, user_id, ip_address, success, attempt_time):
+        now = _seconds(attempt_time)
+        self.users.add(user_id, now, not success)
+        if ip_address is not None:
+            self.ips.add(ip_address, now, not success)
+
+    def rebuild(self, rows):
+        """Replay (user_id, ip_address, success, attempt_time) rows in time order"""
+        for user_id, ip_address, success, attempt_time in rows:
+            self.add(user_id, ip_address, success, attempt_time)
+
+    def evaluate(self, user_id, ip_address, success, attempt_time):
+        """Return (is_suspicious, reason) for an attempt about to be recorded"""
+        now = _seconds(attempt_time)
+        failed = int(not success)
+        attempts, failures = self.users.counts(user_id, now)
+        if failures + failed > self.max_user_failures:
+            return True, "Too many failed logins for this user"
+        if attempts + 1 > self.max_user_attempts:
+            return True, "Too many login attempts for this user"
+        if ip_address is not None:
+            attempts, failures = self.ips.counts(ip_address, now)
+            if failures + failed > self.max_ip_failures:
+                return True, "Too many failed logins from this address"
+            if attempts + 1 > self.max_ip_attempts:
+                return True, "Too many login attempts from this address"
+        return False, None
@@ -0,0 +1,419 @@
+import threading
+import time
+from datetime import datetime
+
+from .login_profile import profile_slots
+
+class Migration:
+    """One ordered schema upgrade
+
+    `upgrade(conn)` runs inside a single transaction together with the
+    PRAGMA user_version bump, so a step is either fully applied or not at all.
+    Steps must be idempotent (IF NOT EXISTS and friends) so that re-running
+    one against a partially upgraded copy is harmless. Long data rewrites
+    belong in `backfills`, which run later in small batches.
+    """
+
+    def __init__(self, version, description, upgrade, backfills=()):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+        self.backfills = list(backfills)
+
+class Backfill:
+    """Resumable batched data migration keyed on an increasing integer column
+
+    `process(conn, lower, upper)` handles the rows whose key lies in
+    (lower, upper]. Progress is stored in `migration_backfills` after every
+    batch, so an interrupted backfill resumes where it stopped.
+    """
+
+    def __init__(self, name, table, key_column, process, batch_size=5000):
+        self.name = name
+        self.table = table
+        self.key_column = key_column
+        self.process = process
+        self.batch_size = batch_size
+
+    def run_batch(self, conn, last_key):
+        """Process one batch after `last_key`; returns the new last key or None when done"""
+        row = conn.execute(f'''
+            SELECT MAX({self.key_column}) FROM (
+                SELECT {self.key_column} FROM {self.table}
+                WHERE {self.key_column} > ?
+                ORDER BY {self.key_column}
+                LIMIT ?
+            )
+        ''', (last_key, self.batch_size)).fetchone()
+        if row[0] is None:
+            return None
+        self.process(conn, last_key, row[0])
+        return row[0]
+
+class MigrationRunner:
+    """Apply schema migrations keyed on PRAGMA user_version and drive backfills"""
+
+    def __init__(self, db, migrations):
+        self.db = db
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+        self.backfills = {backfill.name: backfill
+                          for migration in self.migrations for backfill in migration.backfills}
+        self.timings = []  # (version, description, seconds) per applied step
+        self.backfill_timings = {}  # name -> (batches, seconds)
+        self.last_error = None  # last exception seen by the start_backfills thread
+
+    def current_version(self, conn):
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def run(self):
+        """Apply every pending schema step; returns the resulting schema version"""
+        conn = self.db._get_connection()
+        self._ensure_backfill_table(conn)
+        version = self.current_version(conn)
+
+        for migration in self.migrations:
+            if migration.version <= version:
+                continue
+            start = time.perf_counter()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                migration.upgrade(conn)
+                for backfill in migration.backfills:
+                    conn.execute('''
+                        INSERT OR IGNORE INTO migration_backfills (name, last_key)
+                        VALUES (?, 0)
+                    ''', (backfill.name,))
+                conn.execute(f'PRAGMA user_version = {int(migration.version)}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            version = migration.version
+            self.timings.append((migration.version, migration.description,
+                                 time.perf_counter() - start))
+
+        return version
+
+    def _ensure_backfill_table(self, conn):
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS migration_backfills (
+                    name TEXT PRIMARY KEY,
+                    last_key INTEGER NOT NULL,
+                    completed_at TIMESTAMP
+                )
+            ''')
+
+    def add_backfill(self, backfill):
+        """Register a backfill that is not tied to a schema version"""
+        self.backfills[backfill.name] = backfill
+
+    def pending_backfills(self, conn):
+        """Return (backfill, last_key) pairs for registered, unfinished backfills"""
+        rows = conn.execute('''
+            SELECT name, last_key FROM migration_backfills
+            WHERE completed_at IS NULL
+        ''').fetchall()
+        return [(self.backfills[name], last_key) for name, last_key in rows
+                if name in self.backfills]
+
+    def run_backfill(self, backfill, last_key=0, time_budget=None):
+        """Run batches of one backfill; returns True once it has completed
+
+        Every batch commits on its own, so live writers only ever wait for
+        one batch. With a `time_budget` (seconds) the call returns after the
+        first batch that crosses it, and the next call resumes from the
+        stored key.
+        """
+        conn = self.db._get_connection()
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        with conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO migration_backfills (name, last_key)
+                VALUES (?, ?)
+            ''', (backfill.name, last_key))
+
+        while True:
+            start = time.perf_counter()
+            with conn:
+                new_key = backfill.run_batch(conn, last_key)
+                if new_key is None:
+                    conn.execute('''
+                        UPDATE migration_backfills SET completed_at = ?
+                        WHERE name = ?
+                    ''', (datetime.now(), backfill.name))
+                else:
+                    conn.execute('''
+                        UPDATE migration_backfills SET last_key = ?
+                        WHERE name = ?
+                    ''', (new_key, backfill.name))
+            batches, seconds = self.backfill_timings.get(backfill.name, (0, 0.0))
+            self.backfill_timings[backfill.name] = (
+                batches + 1, seconds + time.perf_counter() - start)
+
+            if new_key is None:
+                return True
+            last_key = new_key
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+
+    def run_backfills(self, time_budget=None):
+        """Advance every pending backfill; returns True when none remain"""
+        conn = self.db._get_connection()
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        for backfill, last_key in self.pending_backfills(conn):
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            if not self.run_backfill(backfill, last_key, remaining):
+                return False
+        return True
+
+    def start_backfills(self, time_slice=0.1, pause=0.05, retry=1.0, max_retry=60.0):
+        """Run pending backfills on a daemon thread in short slices with pauses
+
+        A failing slice (e.g. a locked database) is rolled back, kept in
+        `last_error` and retried after `retry` seconds, doubling up to
+        `max_retry` while failures continue.
+        """
+        def worker():
+            delay = retry
+            while True:
+                try:
+                    if self.run_backfills(time_budget=time_slice):
+                        return
+                except Exception as e:
+                    self.last_error = e
+                    time.sleep(delay)
+                    delay = min(delay * 2, max_retry)
+                    continue
+                delay = retry
+                time.sleep(pause)
+
+        thread = threading.Thread(target=worker, name='bbiometrics-backfill', daemon=True)
+        thread.start()
+        return thread
+
+def add_lookup_indexes(conn):
+    """Indexes for the session, user and status access paths"""
+    # Keep only the newest pattern per user before enforcing uniqueness
+    conn.execute('''
+        DELETE FROM login_patterns
+        WHERE pattern_id NOT IN (
+            SELECT MAX(pattern_id) FROM login_patterns GROUP BY user_id
+        )
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_login_patterns_user
+        ON login_patterns (user_id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_keystroke_session_time
+        ON keystroke_dynamics (session_id, timestamp)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_mouse_session_time
+        ON mouse_movements (session_id, timestamp)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_patterns_session_time
+        ON behavioral_patterns (session_id, timestamp)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_login_attempts_user_time
+        ON login_attempts (user_id, attempt_time)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sessions_status
+        ON sessions (status)
+    ''')
+
+def add_compact_event_tables(conn):
+    """Narrow WITHOUT ROWID tables used when compact storage is enabled"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS event_codes (
+            code INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS keystroke_events (
+            session_id INTEGER NOT NULL,
+            ts_us INTEGER NOT NULL,  -- microseconds since 1970-01-01, wall clock
+            key_pressed INTEGER NOT NULL,  -- event_codes.code
+            key_released INTEGER NOT NULL,  -- event_codes.code
+            press_duration REAL NOT NULL,
+            inter_key_interval REAL,
+            PRIMARY KEY (session_id, ts_us)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mouse_events (
+            session_id INTEGER NOT NULL,
+            ts_us INTEGER NOT NULL,  -- microseconds since 1970-01-01, wall clock
+            x_position INTEGER NOT NULL,
+            y_position INTEGER NOT NULL,
+            movement_speed REAL,
+            acceleration REAL,
+            click_type INTEGER,  -- event_codes.code
+            PRIMARY KEY (session_id, ts_us)
+        ) WITHOUT ROWID
+    ''')
+
+def add_session_rollups(conn):
+    """Per-session running aggregates maintained on ingest"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS session_rollups (
+            session_id INTEGER PRIMARY KEY,
+            keystroke_count INTEGER NOT NULL,
+            press_duration_sum REAL NOT NULL,
+            press_duration_sumsq REAL NOT NULL,
+            interval_count INTEGER NOT NULL,
+            interval_sum REAL NOT NULL,
+            mouse_count INTEGER NOT NULL,
+            speed_count INTEGER NOT NULL,
+            speed_sum REAL NOT NULL,
+            speed_max REAL,
+            click_count INTEGER NOT NULL,
+            first_event TIMESTAMP,
+            last_event TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions (session_id)
+        )
+    ''')
+
+def rebuild_session_rollups(conn, lower, upper):
+    """Recompute the rollups of sessions in (lower, upper] from the raw events
+
+    Sessions whose raw events retention has started deleting keep their
+    rollup, which is then the only record of their totals.
+    """
+    conn.execute('''
+        INSERT OR REPLACE INTO session_rollups (
+            session_id, keystroke_count, press_duration_sum, press_duration_sumsq,
+            interval_count, interval_sum, mouse_count, speed_count, speed_sum,
+            speed_max, click_count, first_event, last_event
+        )
+        SELECT s.session_id,
+               IFNULL(k.n, 0), IFNULL(k.press_sum, 0), IFNULL(k.press_sumsq, 0),
+               IFNULL(k.interval_count, 0), IFNULL(k.interval_sum, 0),
+               IFNULL(m.n, 0), IFNULL(m.speed_count, 0), IFNULL(m.speed_sum, 0),
+               m.speed_max, IFNULL(m.click_count, 0),
+               MIN(IFNULL(k.first_event, m.first_event), IFNULL(m.first_event, k.first_event)),
+               MAX(IFNULL(k.last_event, m.last_event), IFNULL(m.last_event, k.last_event))
+        FROM sessions s
+        LEFT JOIN (
+            SELECT session_id, COUNT(*) AS n,
+                   SUM(press_duration) AS press_sum,
+                   SUM(press_duration * press_duration) AS press_sumsq,
+                   COUNT(inter_key_interval) AS interval_count,
+                   SUM(inter_key_interval) AS interval_sum,
+                   MIN(timestamp) AS first_event, MAX(timestamp) AS last_event
+            FROM keystroke_dynamics
+            WHERE session_id > ?1 AND session_id <= ?2
+            GROUP BY session_id
+        ) k ON k.session_id = s.session_id
+        LEFT JOIN (
+            SELECT session_id, COUNT(*) AS n,
+                   COUNT(movement_speed) AS speed_count,
+                   SUM(movement_speed) AS speed_sum,
+                   MAX(movement_speed) AS speed_max,
+                   COUNT(click_type) AS click_count,
+                   MIN(timestamp) AS first_event, MAX(timestamp) AS last_event
+            FROM mouse_movements
+            WHERE session_id > ?1 AND session_id <= ?2
+            GROUP BY session_id
+        ) m ON m.session_id = s.session_id
+        WHERE s.session_id > ?1 AND s.session_id <= ?2
+          AND NOT EXISTS (
+              SELECT 1 FROM session_retention r
+              WHERE r.session_id = s.session_id
+                AND (r.downsampled_at IS NOT NULL OR r.purged_at IS NOT NULL)
+          )
+    ''', (lower, upper))
+
+def add_retention_tables(conn):
+    """Downsampled summaries and bookkeeping for expired raw events"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mouse_aggregates (
+            session_id INTEGER NOT NULL,
+            bucket_start REAL NOT NULL,  -- seconds since 1970-01-01, wall clock
+            sample_count INTEGER NOT NULL,
+            mean_x REAL NOT NULL,
+            mean_y REAL NOT NULL,
+            mean_speed REAL,
+            max_speed REAL,
+            click_count INTEGER NOT NULL,
+            PRIMARY KEY (session_id, bucket_start)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS digraph_stats (
+            session_id INTEGER NOT NULL,
+            first_key TEXT NOT NULL,
+            second_key TEXT NOT NULL,
+            sample_count INTEGER NOT NULL,
+            mean_interval REAL,
+            mean_press_duration REAL NOT NULL,
+            PRIMARY KEY (session_id, first_key, second_key)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS session_retention (
+            session_id INTEGER PRIMARY KEY,
+            archived_at TIMESTAMP,
+            archive_path TEXT,
+            downsampled_at TIMESTAMP,
+            purged_at TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions (session_id)
+        )
+    ''')
+
+def add_session_user(conn):
+    """Record which enrolled user a session belongs to"""
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(sessions)')]
+    if 'user_id' not in columns:
+        conn.execute('ALTER TABLE sessions ADD COLUMN user_id TEXT')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sessions_user
+        ON sessions (user_id, session_id)
+    ''')
+
+def add_login_profiles(conn):
+    """Learned per-user login histograms, seeded from past successful attempts"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS login_profile_counts (
+            user_id TEXT NOT NULL,
+            slot INTEGER NOT NULL,  -- see core.login_profile
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, slot)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('DELETE FROM login_profile_counts')
+    counts = {}
+    for user_id, attempt_time, duration in conn.execute(
+            'SELECT user_id, attempt_time, duration FROM login_attempts WHERE success'):
+        for slot in profile_slots(datetime.fromisoformat(attempt_time), duration):
+            counts[user_id, slot] = counts.get((user_id, slot), 0) + 1
+    conn.executemany('INSERT INTO login_profile_counts VALUES (?, ?, ?)',
+                     [(user_id, slot, count) for (user_id, slot), count in counts.items()])
+
+def add_login_time_index(conn):
+    """Index for the time-range scan that rebuilds login rate counters"""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_login_attempts_time
+        ON login_attempts (attempt_time)
+    ''')
+
+# Ordered schema upgrades; append new steps with the next version number
+MIGRATIONS = [
+    Migration(1, "Add lookup indexes", add_lookup_indexes),
+    Migration(2, "Add compact event tables", add_compact_event_tables),
+    Migration(3, "Add session rollups", add_session_rollups, [
+        Backfill('session_rollups', 'sessions', 'session_id', rebuild_session_rollups,
+                 batch_size=50),
+    ]),
+    Migration(4, "Add retention tables", add_retention_tables),
+    Migration(5, "Add session user", add_session_user),
+    Migration(6, "Add login profiles", add_login_profiles),
+    Migration(7, "Add login time index", add_login_time_index),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
@@ -0,0 +1,235 @@
+import csv
+import gzip
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .arrays import LEGACY_SECONDS_SQL
+
+class RetentionPolicy:
+    """How long raw events are kept and what replaces them afterwards
+
+    Completed sessions that ended more than `raw_days` days ago are archived
+    to gzip-compressed CSV files in `archive_dir` (skipped when it is None),
+    summarised into `mouse_aggregates` buckets of `mouse_interval` seconds and
+    per-digraph `digraph_stats`, and then have their raw events deleted
+    `batch_size` rows at a time.
+    """
+
+    def __init__(self, raw_days=30, mouse_interval=1.0, archive_dir=None,
+                 batch_size=2000, vacuum_pages=256):
+        self.raw_days = raw_days
+        self.mouse_interval = mouse_interval
+        self.archive_dir = Path(archive_dir) if archive_dir is not None else None
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+
+class RetentionEngine:
+    """Apply a RetentionPolicy in small steps suited to idle-time scheduling
+
+    Each call to step() performs one bounded unit of work (archive one
+    session, downsample one session, or delete one batch of raw rows) in its
+    own short transaction, so the live writer never waits long. Freed pages
+    are returned to the filesystem with PRAGMA incremental_vacuum.
+    """
+
+    def __init__(self, db, policy=None):
+        self.db = db
+        self.policy = policy or RetentionPolicy()
+        self.deleted_rows = 0
+        self.archived_sessions = 0
+        self.downsampled_sessions = 0
+        self.vacuumed_pages = 0
+        self.last_error = None
+        self._stopping = threading.Event()
+
+    def _raw_tables(self):
+        """(physical table, per-session key column) pairs holding raw events"""
+        if self.db.compact_storage:
+            return [('keystroke_events', 'ts_us'), ('keystroke_dynamics_legacy', 'keystroke_id'),
+                    ('mouse_events', 'ts_us'), ('mouse_movements_legacy', 'movement_id')]
+        return [('keystroke_dynamics', 'keystroke_id'), ('mouse_movements', 'movement_id')]
+
+    def _next_session(self, conn):
+        """Return (session_id, archived_at, downsampled_at) of the next expired session"""
+        cutoff = datetime.now() - timedelta(days=self.policy.raw_days)
+        return conn.execute('''
+            SELECT s.session_id, r.archived_at, r.downsampled_at
+            FROM sessions s
+            LEFT JOIN session_retention r ON r.session_id = s.session_id
+            WHERE s.status = 'completed' AND s.end_time < ?
+              AND r.purged_at IS NULL
+            ORDER BY s.session_id
+            LIMIT 1
+        ''', (cutoff,)).fetchone()
+
+    def _mark(self, conn, session_id, column, value=None):
+        conn.execute('INSERT OR IGNORE INTO session_retention (session_id) VALUES (?)',
+                     (session_id,))
+        conn.execute(f'UPDATE session_retention SET {column} = ? WHERE session_id = ?',
+                     (value if value is not None else datetime.now(), session_id))
+
+    def step(self):
+        """Do one bounded unit of retention work; returns False when nothing is left"""
+        conn = self.db._get_connection()
+        session = self._next_session(conn)
+        if session is None:
+            return False
+        session_id, archived_at, downsampled_at = session
+
+        if archived_at is None:
+            archive_path = self.archive_session(session_id)
+            with conn:
+                self._mark(conn, session_id, 'archived_at')
+                if archive_path is not None:
+                    self._mark(conn, session_id, 'archive_path', str(archive_path))
+            return True
+
+        if downsampled_at is None:
+            with conn:
+                self.downsample_session(conn, session_id)
+                self._mark(conn, session_id, 'downsampled_at')
+            self.downsampled_sessions += 1
+            return True
+
+        for table, key_column in self._raw_tables():
+            with conn:
+                deleted = conn.execute(f'''
+                    DELETE FROM {table}
+                    WHERE session_id = ?1 AND {key_column} IN (
+                        SELECT {key_column} FROM {table} WHERE session_id = ?1 LIMIT ?2
+                    )
+                ''', (session_id, self.policy.batch_size)).rowcount
+            if deleted:
+                self.deleted_rows += deleted
+                self.vacuum(conn)
+                return True
+
+        with conn:
+            self._mark(conn, session_id, 'purged_at')
+        self.vacuum(conn)
+        return True
+
+    def vacuum(self, conn):
+        """Return up to vacuum_pages free pages to the filesystem; returns pages freed
+
+        incremental_vacuum frees one page per step of its statement, so the
+        pragma is stepped to completion and repeated until the freelist has
+        shrunk by vacuum_pages or stops shrinking.
+        """
+        def free_pages():
+            return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+        start = free_pages()
+        target = max(start - int(self.policy.vacuum_pages), 0)
+        remaining = start
+        while remaining > target:
+            conn.execute(f'PRAGMA incremental_vacuum({remaining - target})').fetchall()
+            previous, remaining = remaining, free_pages()
+            if remaining >= previous:
+                break
+        self.vacuumed_pages += start - remaining
+        return start - remaining
+
+    def run(self, time_budget=None):
+        """Run steps until done or `time_budget` seconds pass; returns True when done"""
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        while deadline is None or time.perf_counter() < deadline:
+            if not self.step():
+                return True
+        return False
+
+    def start(self, interval=3600, time_slice=0.1, pause=0.05, idle=None, idle_poll=1.0):
+        """Run retention on a daemon thread until stop() is called
+
+        Work is done in `time_slice`-second runs separated by `pause`
+        seconds. When `idle` is given (e.g. BackgroundWriter.is_idle) a run
+        only starts while it returns True; otherwise the thread checks again
+        after `idle_poll` seconds, so retention stays out of the way of live
+        recording. Once nothing is left the thread checks again every
+        `interval` seconds for sessions that have expired since.
+        """
+        def worker():
+            while not self._stopping.is_set():
+                if idle is not None and not idle():
+                    self._stopping.wait(idle_poll)
+                    continue
+                try:
+                    done = self.run(time_budget=time_slice)
+                except Exception as e:
+                    self.last_error = e
+                    done = True
+                self._stopping.wait(interval if done else pause)
+
+        self._stopping.clear()
+        thread = threading.Thread(target=worker, name='bbiometrics-retention', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Ask the thread started by start() to finish after its current slice"""
+        self._stopping.set()
+
+    def archive_session(self, session_id):
+        """Stream a session's raw events into gzip CSV files; returns the file prefix"""
+        if self.policy.archive_dir is None:
+            return None
+        self.policy.archive_dir.mkdir(parents=True, exist_ok=True)
+        prefix = self.policy.archive_dir / f'session_{session_id}'
+        for name, chunks, header in (
+                ('keystrokes', self.db.iter_keystroke_data(session_id),
+                 ('keystroke_id', 'session_id', 'timestamp', 'key_pressed', 'key_released',
+                  'press_duration', 'inter_key_interval')),
+                ('mouse', self.db.iter_mouse_movements(session_id),
+                 ('movement_id', 'session_id', 'timestamp', 'x_position', 'y_position',
+                  'movement_speed', 'acceleration', 'click_type'))):
+            with gzip.open(f'{prefix}_{name}.csv.gz', 'wt', newline='') as archive:
+                writer = csv.writer(archive)
+                writer.writerow(header)
+                for chunk in chunks:
+                    writer.writerows(chunk)
+        self.archived_sessions += 1
+        return prefix
+
+    def downsample_session(self, conn, session_id):
+        """Summarise a session into mouse_aggregates and digraph_stats"""
+        seconds = LEGACY_SECONDS_SQL.format('timestamp')
+        conn.execute(f'''
+            INSERT OR REPLACE INTO mouse_aggregates (
+                session_id, bucket_start, sample_count, mean_x, mean_y,
+                mean_speed, max_speed, click_count
+            )
+            SELECT session_id, bucket * ?2, COUNT(*), AVG(x_position), AVG(y_position),
+                   AVG(movement_speed), MAX(movement_speed), COUNT(click_type)
+            FROM (
+                SELECT session_id, x_position, y_position, movement_speed, click_type,
+                       CAST({seconds} / ?2 AS INTEGER) AS bucket
+                FROM mouse_movements
+                WHERE session_id = ?1
+            )
+            GROUP BY bucket
+        ''', (session_id, self.policy.mouse_interval))
+        conn.execute('''
+            INSERT OR REPLACE INTO digraph_stats (
+                session_id, first_key, second_key, sample_count,
+                mean_interval, mean_press_duration
+            )
+            SELECT ?1, previous_key, key_pressed, COUNT(*),
+                   AVG(inter_key_interval), AVG(press_duration)
+            FROM (
+                SELECT key_pressed, press_duration, inter_key_interval,
+                       LAG(key_pressed) OVER (ORDER BY timestamp) AS previous_key
+                FROM keystroke_dynamics
+                WHERE session_id = ?1
+            )
+            WHERE previous_key IS NOT NULL
+            GROUP BY previous_key, key_pressed
+        ''', (session_id,))
+
+    def enable_incremental_vacuum(self):
+        """Convert an existing database to incremental auto-vacuum (rewrites the file once)"""
+        conn = self.db._get_connection()
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
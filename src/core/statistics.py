@@ -0,0 +1,178 @@
+import math
+
+# Running per-session aggregates; every column can be merged by addition or
+# MIN/MAX, so ingest batches fold into a rollup with a single upsert
+UPSERT_ROLLUP_SQL = '''
+    INSERT INTO session_rollups (
+        session_id, keystroke_count, press_duration_sum, press_duration_sumsq,
+        interval_count, interval_sum, mouse_count, speed_count, speed_sum,
+        speed_max, click_count, first_event, last_event
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (session_id) DO UPDATE SET
+        keystroke_count = keystroke_count + excluded.keystroke_count,
+        press_duration_sum = press_duration_sum + excluded.press_duration_sum,
+        press_duration_sumsq = press_duration_sumsq + excluded.press_duration_sumsq,
+        interval_count = interval_count + excluded.interval_count,
+        interval_sum = interval_sum + excluded.interval_sum,
+        mouse_count = mouse_count + excluded.mouse_count,
+        speed_count = speed_count + excluded.speed_count,
+        speed_sum = speed_sum + excluded.speed_sum,
+        speed_max = MAX(IFNULL(speed_max, excluded.speed_max),
+                        IFNULL(excluded.speed_max, speed_max)),
+        click_count = click_count + excluded.click_count,
+        first_event = MIN(IFNULL(first_event, excluded.first_event),
+                          IFNULL(excluded.first_event, first_event)),
+        last_event = MAX(IFNULL(last_event, excluded.last_event),
+                         IFNULL(excluded.last_event, last_event))
+'''
+
+ROLLUP_COLUMNS = (
+    'session_id', 'keystroke_count', 'press_duration_sum', 'press_duration_sumsq',
+    'interval_count', 'interval_sum', 'mouse_count', 'speed_count', 'speed_sum',
+    'speed_max', 'click_count', 'first_event', 'last_event',
+)
+
+def _empty_rollup(session_id):
+    return [session_id, 0, 0.0, 0.0, 0, 0.0, 0, 0, 0.0, None, 0, None, None]
+
+def _rollup_for(rollups, session_id):
+    rollup = rollups.get(session_id)
+    if rollup is None:
+        rollup = rollups[session_id] = _empty_rollup(session_id)
+    return rollup
+
+def _track_time(rollup, timestamp):
+    timestamp = str(timestamp)
+    if rollup[11] is None or timestamp < rollup[11]:
+        rollup[11] = timestamp
+    if rollup[12] is None or timestamp > rollup[12]:
+        rollup[12] = timestamp
+
+def update_rollups(conn, keystroke_rows=(), mouse_rows=()):
+    """Fold freshly ingested rows into session_rollups, one upsert per session"""
+    rollups = {}
+    for session_id, timestamp, _, _, press_duration, inter_key_interval in keystroke_rows:
+        rollup = _rollup_for(rollups, session_id)
+        rollup[1] += 1
+        rollup[2] += press_duration
+        rollup[3] += press_duration * press_duration
+        if inter_key_interval is not None:
+            rollup[4] += 1
+            rollup[5] += inter_key_interval
+        _track_time(rollup, timestamp)
+    for session_id, timestamp, _, _, movement_speed, _, click_type in mouse_rows:
+        rollup = _rollup_for(rollups, session_id)
+        rollup[6] += 1
+        if movement_speed is not None:
+            rollup[7] += 1
+            rollup[8] += movement_speed
+            if rollup[9] is None or movement_speed > rollup[9]:
+                rollup[9] = movement_speed
+        if click_type is not None:
+            rollup[10] += 1
+        _track_time(rollup, timestamp)
+    if rollups:
+        conn.executemany(UPSERT_ROLLUP_SQL, list(rollups.values()))
+
+def rollup_to_stats(row):
+    """Turn a session_rollups row into the summary the dashboard shows"""
+    rollup = dict(zip(ROLLUP_COLUMNS, row))
+    keystrokes = rollup['keystroke_count']
+    mean_press = rollup['press_duration_sum'] / keystrokes if keystrokes else None
+    std_press = None
+    if keystrokes:
+        variance = rollup['press_duration_sumsq'] / keystrokes - mean_press * mean_press
+        std_press = math.sqrt(max(variance, 0.0))
+    return {
+        'session_id': rollup['session_id'],
+        'keystroke_count': keystrokes,
+        'mouse_count': rollup['mouse_count'],
+        'click_count': rollup['click_count'],
+        'first_event': rollup['first_event'],
+        'last_event': rollup['last_event'],
+        'mean_press_duration': mean_press,
+        'std_press_duration': std_press,
+        'mean_inter_key_interval': (rollup['interval_sum'] / rollup['interval_count']
+                                    if rollup['interval_count'] else None),
+        'mean_mouse_speed': (rollup['speed_sum'] / rollup['speed_count']
+                             if rollup['speed_count'] else None),
+        'max_mouse_speed': rollup['speed_max'],
+    }
+
+def _percentile_sql(column, rank, count, fraction):
+    """Nearest-rank percentile picked out of a ROW_NUMBER() window"""
+    return (f"MAX(CASE WHEN {rank} = CAST({fraction} * ({count} - 1) AS INTEGER) + 1 "
+            f"THEN {column} END)")
+
+def session_statistics_sql(session_count):
+    """One statement computing exact statistics for `session_count` sessions"""
+    targets = ', '.join('(?)' for _ in range(session_count))
+    return f'''
+        WITH target (session_id) AS (VALUES {targets}),
+        ks AS (
+            SELECT session_id, timestamp, press_duration, inter_key_interval,
+                   ROW_NUMBER() OVER (PARTITION BY session_id
+                                      ORDER BY press_duration) AS press_rank,
+                   ROW_NUMBER() OVER (PARTITION BY session_id
+                                      ORDER BY inter_key_interval NULLS LAST) AS interval_rank,
+                   COUNT(*) OVER (PARTITION BY session_id) AS n,
+                   COUNT(inter_key_interval) OVER (PARTITION BY session_id) AS n_interval
+            FROM keystroke_dynamics
+            WHERE session_id IN (SELECT session_id FROM target)
+        ),
+        ks_stats AS (
+            SELECT session_id,
+                   COUNT(*) AS keystroke_count,
+                   MIN(timestamp) AS first_key,
+                   MAX(timestamp) AS last_key,
+                   AVG(press_duration) AS mean_press,
+                   {_percentile_sql('press_duration', 'press_rank', 'n', 0.5)} AS p50_press,
+                   {_percentile_sql('press_duration', 'press_rank', 'n', 0.9)} AS p90_press,
+                   AVG(inter_key_interval) AS mean_interval,
+                   {_percentile_sql('inter_key_interval', 'interval_rank', 'n_interval', 0.5)}
+                       AS p50_interval
+            FROM ks
+            GROUP BY session_id
+        ),
+        ms AS (
+            SELECT session_id, timestamp, movement_speed, click_type,
+                   ROW_NUMBER() OVER (PARTITION BY session_id
+                                      ORDER BY movement_speed NULLS LAST) AS speed_rank,
+                   COUNT(movement_speed) OVER (PARTITION BY session_id) AS n_speed
+            FROM mouse_movements
+            WHERE session_id IN (SELECT session_id FROM target)
+        ),
+        ms_stats AS (
+            SELECT session_id,
+                   COUNT(*) AS mouse_count,
+                   COUNT(click_type) AS click_count,
+                   MIN(timestamp) AS first_move,
+                   MAX(timestamp) AS last_move,
+                   AVG(movement_speed) AS mean_speed,
+                   {_percentile_sql('movement_speed', 'speed_rank', 'n_speed', 0.5)}
+                       AS p50_speed,
+                   {_percentile_sql('movement_speed', 'speed_rank', 'n_speed', 0.9)}
+                       AS p90_speed
+            FROM ms
+            GROUP BY session_id
+        )
+        SELECT t.session_id, s.start_time, s.end_time, s.status,
+               IFNULL(k.keystroke_count, 0), IFNULL(m.mouse_count, 0),
+               IFNULL(m.click_count, 0),
+               MIN(IFNULL(k.first_key, m.first_move), IFNULL(m.first_move, k.first_key)),
+               MAX(IFNULL(k.last_key, m.last_move), IFNULL(m.last_move, k.last_key)),
+               k.mean_press, k.p50_press, k.p90_press, k.mean_interval, k.p50_interval,
+               m.mean_speed, m.p50_speed, m.p90_speed
+        FROM target t
+        LEFT JOIN sessions s ON s.session_id = t.session_id
+        LEFT JOIN ks_stats k ON k.session_id = t.session_id
+        LEFT JOIN ms_stats m ON m.session_id = t.session_id
+    '''
+
+STATISTICS_COLUMNS = (
+    'session_id', 'start_time', 'end_time', 'status',
+    'keystroke_count', 'mouse_count', 'click_count', 'first_event', 'last_event',
+    'mean_press_duration', 'p50_press_duration', 'p90_press_duration',
+    'mean_inter_key_interval', 'p50_inter_key_interval',
+    'mean_mouse_speed', 'p50_mouse_speed', 'p90_mouse_speed',
+)
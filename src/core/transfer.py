@@ -0,0 +1,130 @@
+import json
+import math
+import zipfile
+
+import numpy as np
+
+from . import arrays
+from .compact import from_epoch_us
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+KINDS = ('keystroke', 'mouse')
+
+def _member(kind, session_id, index):
+    return f'{kind}/{session_id}/{index:06d}.npy'
+
+def _optional(value):
+    return None if math.isnan(value) else float(value)
+
+def _session_rows(conn, session_ids):
+    columns = 'session_id, start_time, end_time, status, notes, user_id'
+    if session_ids is None:
+        return conn.execute(f'SELECT {columns} FROM sessions ORDER BY session_id').fetchall()
+    rows = []
+    for start in range(0, len(session_ids), 500):
+        batch = session_ids[start:start + 500]
+        rows.extend(conn.execute(f'''
+            SELECT {columns} FROM sessions
+            WHERE session_id IN ({", ".join("?" * len(batch))})
+        ''', batch).fetchall())
+    return sorted(rows)
+
+def export_sessions(db, path, session_ids=None, chunk_size=65536):
+    """Stream sessions into a compressed .npz archive; returns row counts
+
+    Each session's keystrokes and mouse movements are read with
+    iter_keystroke_arrays / iter_mouse_arrays and every chunk is written as
+    its own deflated .npy member, so memory use is bounded by `chunk_size`
+    however large the history is. Session metadata and the key and click
+    names behind the integer codes go into manifest.json. The archive opens
+    with numpy.load and with import_sessions. Derived behavioral patterns
+    are not exported; replay recomputes them.
+    """
+    conn = db._get_connection()
+    sessions = _session_rows(conn, None if session_ids is None else list(session_ids))
+    manifest = {'format_version': FORMAT_VERSION, 'sessions': [], 'codes': {}}
+    totals = {'sessions': 0, 'keystroke': 0, 'mouse': 0}
+    codes = arrays.event_codes(conn)
+
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for session_id, start_time, end_time, status, notes, user_id in sessions:
+            entry = {'session_id': session_id, 'start_time': start_time, 'end_time': end_time,
+                     'status': status, 'notes': notes, 'user_id': user_id}
+            for kind in KINDS:
+                chunks = rows = 0
+                for chunk in arrays.iter_arrays(db, kind, session_id, chunk_size, codes):
+                    with archive.open(_member(kind, session_id, chunks), 'w',
+                                      force_zip64=True) as member:
+                        np.lib.format.write_array(member, chunk, allow_pickle=False)
+                    chunks += 1
+                    rows += len(chunk)
+                entry[f'{kind}_chunks'] = chunks
+                entry[f'{kind}_rows'] = rows
+                totals[kind] += rows
+            manifest['sessions'].append(entry)
+            totals['sessions'] += 1
+        # Written after the events so it covers any codes registered meanwhile,
+        # plus the negative codes given to names that have none stored
+        manifest['codes'] = dict(conn.execute('SELECT code, name FROM event_codes'))
+        manifest['codes'].update((code, name) for name, code in codes.items() if code < 0)
+        archive.writestr(MANIFEST, json.dumps(manifest, default=str))
+    return totals
+
+def read_manifest(path):
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read(MANIFEST))
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format: {manifest.get('format_version')}")
+    return manifest
+
+def iter_session_arrays(archive, entry, kind):
+    """Yield the structured-array chunks of one exported session"""
+    for index in range(entry[f'{kind}_chunks']):
+        with archive.open(_member(kind, entry['session_id'], index)) as member:
+            yield np.lib.format.read_array(member, allow_pickle=False)
+
+def _batches(rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+def import_sessions(db, path, writer=None, batch_size=5000):
+    """Load an archive written by export_sessions; returns row counts and new IDs
+
+    Every session is recreated under a new session_id (returned as
+    'session_ids', old -> new) and its events are inserted through
+    insert_session, add_keystrokes_bulk and add_mouse_movements_bulk in
+    transactions of at most `batch_size` rows, so rollups and compact
+    storage are maintained exactly as for live ingest. With a
+    BackgroundWriter every write is submitted to it and awaited, keeping it
+    the only writer; live events interleave between the short batches.
+    """
+    def write(method_name, *args):
+        if writer is None:
+            return getattr(db, method_name)(*args)
+        return writer.submit(method_name, *args).result()
+
+    manifest = read_manifest(path)
+    names = {int(code): name for code, name in manifest['codes'].items()}
+    totals = {'sessions': 0, 'keystroke': 0, 'mouse': 0, 'session_ids': {}}
+
+    with zipfile.ZipFile(path) as archive:
+        for entry in manifest['sessions']:
+            session_id = write('insert_session', entry['start_time'], entry['end_time'],
+                               entry['status'], entry['notes'], entry['user_id'])
+            totals['session_ids'][entry['session_id']] = session_id
+
+            for chunk in iter_session_arrays(archive, entry, 'keystroke'):
+                rows = [(session_id, from_epoch_us(round(timestamp * 1e6)), names[pressed],
+                         names[released], float(duration), _optional(interval))
+                        for _, timestamp, pressed, released, duration, interval in chunk.tolist()]
+                for batch in _batches(rows, batch_size):
+                    totals['keystroke'] += write('add_keystrokes_bulk', batch)
+            for chunk in iter_session_arrays(archive, entry, 'mouse'):
+                rows = [(session_id, from_epoch_us(round(timestamp * 1e6)), x, y,
+                         _optional(speed), _optional(acceleration), names.get(click))
+                        for _, timestamp, x, y, speed, acceleration, click in chunk.tolist()]
+                for batch in _batches(rows, batch_size):
+                    totals['mouse'] += write('add_mouse_movements_bulk', batch)
+            totals['sessions'] += 1
+    return totals
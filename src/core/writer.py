@@ -0,0 +1,283 @@
+import atexit
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+
+# Queue item kinds
+KEYSTROKE = 0
+MOUSE = 1
+CALL = 2
+
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'coalesce')
+
+class BackgroundWriter:
+    """Single writer thread that owns every SQLite write
+
+    Producers such as input listener callbacks only append to a bounded
+    in-memory queue, which is a constant-time, lock-free operation. The writer
+    thread drains the queue in order, grouping consecutive keystroke and mouse
+    rows into bulk inserts and running any other DatabaseManager write method
+    submitted through submit().
+
+    When `capacity` events are queued, `overflow` decides what happens:
+    'drop_newest' discards the incoming event, 'drop_oldest' discards the
+    oldest queued one (the incoming one while a submitted call heads the
+    queue), and 'coalesce' replaces the newest queued mouse sample
+    of the same session with the incoming one (plain moves only, clicks are
+    never coalesced) and otherwise drops the incoming event. Submitted calls
+    are never dropped. A batch that fails to write is counted as dropped and
+    kept in `last_error`; the thread keeps running.
+    """
+
+    def __init__(self, db, capacity=50000, overflow='drop_newest', batch_size=1000,
+                 flush_interval=0.5):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        self.db = db
+        self.capacity = capacity
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        # Makes submit()'s stop check and append atomic with shutdown()
+        self._submit_lock = threading.Lock()
+        self._last_activity = time.monotonic()
+
+        # Counters; producer-side counters are updated without a lock
+        self.enqueued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.written = 0
+        self.batches = 0
+        self.last_batch_latency = 0.0
+        self.max_batch_latency = 0.0
+        self.last_error = None
+
+        self._thread = threading.Thread(target=self._run, name='bbiometrics-writer',
+                                        daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        return False
+
+    def add_keystroke(self, session_id, key_pressed, key_released, press_duration,
+                      inter_key_interval=None, timestamp=None):
+        """Queue a keystroke row; returns False if it was dropped"""
+        return self._enqueue((KEYSTROKE, (
+            session_id, timestamp or datetime.now(), key_pressed, key_released,
+            press_duration, inter_key_interval)))
+
+    def add_mouse_movement(self, session_id, x_position, y_position, movement_speed=None,
+                           acceleration=None, click_type=None, timestamp=None):
+        """Queue a mouse movement row; returns False if it was dropped"""
+        return self._enqueue((MOUSE, (
+            session_id, timestamp or datetime.now(), x_position, y_position,
+            movement_speed, acceleration, click_type)))
+
+    def add_keystrokes(self, rows):
+        """Queue ready-made keystroke rows; returns how many were accepted"""
+        return sum(self._enqueue((KEYSTROKE, row)) for row in rows)
+
+    def add_mouse_movements(self, rows):
+        """Queue ready-made mouse movement rows; returns how many were accepted"""
+        return sum(self._enqueue((MOUSE, row)) for row in rows)
+
+    def submit(self, method_name, *args, **kwargs):
+        """Queue a call to a DatabaseManager method and return a Future for its result"""
+        future = Future()
+        with self._submit_lock:
+            if self._stopped:
+                raise RuntimeError("BackgroundWriter has been shut down")
+            self._last_activity = time.monotonic()
+            self._queue.append((CALL, (future, method_name, args, kwargs)))
+        self._wakeup.set()
+        return future
+
+    def end_session(self, session_id):
+        """End a session once every event queued before it has been written"""
+        return self.submit('end_session', session_id)
+
+    def _enqueue(self, item):
+        if self._stopped:
+            self.dropped += 1
+            return False
+
+        queue = self._queue
+        if len(queue) >= self.capacity:
+            if self.overflow == 'drop_oldest':
+                if not self._drop_oldest_event():
+                    self.dropped += 1
+                    return False
+            elif self.overflow == 'coalesce' and self._coalesce(item):
+                return True
+            else:
+                self.dropped += 1
+                return False
+
+        queue.append(item)
+        self.enqueued += 1
+        self._last_activity = time.monotonic()
+        if len(queue) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _drop_oldest_event(self):
+        """Discard the oldest queued event; False when the head is a submitted call
+
+        Calls are never dropped, so with a call at the head the incoming
+        event is dropped instead.
+        """
+        queue = self._queue
+        try:
+            if queue[0][0] == CALL:
+                return False
+            item = queue.popleft()
+        except IndexError:
+            return True
+        if item[0] == CALL:
+            # The writer took the event we peeked at; put the call back
+            queue.appendleft(item)
+            return False
+        self.dropped += 1
+        return True
+
+    def _coalesce(self, item):
+        """Replace the queued tail with `item` if both are plain moves of one session"""
+        kind, row = item
+        if kind != MOUSE or row[6] is not None:
+            return False
+        try:
+            tail_kind, tail_row = self._queue[-1]
+        except IndexError:
+            return False
+        if tail_kind != MOUSE or tail_row[6] is not None or tail_row[0] != row[0]:
+            return False
+        self._queue[-1] = item
+        self.coalesced += 1
+        return True
+
+    def _run(self):
+        while True:
+            stopped = self._stopped
+            if not stopped:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+            try:
+                self._drain()
+            except Exception as e:
+                # Keep the thread alive; later calls must still get answers
+                self.last_error = e
+            if stopped:
+                return
+
+    def _drain(self):
+        """Write everything queued so far, preserving submission order"""
+        queue = self._queue
+        keystrokes = []
+        mouse = []
+        for _ in range(len(queue)):
+            kind, payload = queue.popleft()
+            if kind == KEYSTROKE:
+                keystrokes.append(payload)
+            elif kind == MOUSE:
+                mouse.append(payload)
+            else:
+                self._write_batches(keystrokes, mouse)
+                keystrokes, mouse = [], []
+                self._call(*payload)
+            if len(keystrokes) + len(mouse) >= self.batch_size:
+                self._write_batches(keystrokes, mouse)
+                keystrokes, mouse = [], []
+        self._write_batches(keystrokes, mouse)
+
+    def _write_batches(self, keystrokes, mouse):
+        if not keystrokes and not mouse:
+            return
+        start = time.perf_counter()
+        try:
+            written = self.db.add_keystrokes_bulk(keystrokes)
+            written += self.db.add_mouse_movements_bulk(mouse)
+        except Exception as e:
+            self.last_error = e
+            self.dropped += len(keystrokes) + len(mouse)
+            return
+        latency = time.perf_counter() - start
+        self.written += written
+        self.batches += 1
+        self.last_batch_latency = latency
+        self.max_batch_latency = max(self.max_batch_latency, latency)
+
+    def _call(self, future, method_name, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        if method_name is None:
+            # Barrier queued by flush()
+            future.set_result(None)
+            return
+        try:
+            result = getattr(self.db, method_name)(*args, **kwargs)
+        except Exception as e:
+            self.last_error = e
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def is_idle(self, quiet=2.0):
+        """True when nothing is queued and nothing was queued for `quiet` seconds"""
+        return not self._queue and time.monotonic() - self._last_activity >= quiet
+
+    def flush(self, timeout=None):
+        """Block until everything queued before this call has been written"""
+        self.submit(None).result(timeout)
+
+    def shutdown(self, drain=True):
+        """Stop the writer thread, writing out the queue first unless drain is False"""
+        if self._stopped:
+            return
+        if not drain:
+            while self._queue:
+                kind, payload = self._queue.popleft()
+                if kind == CALL:
+                    payload[0].cancel()
+                self.dropped += 1
+        with self._submit_lock:
+            self._stopped = True
+        self._wakeup.set()
+        self._thread.join()
+        # Events appended by producers that raced the final drain are dropped
+        while self._queue:
+            kind, payload = self._queue.popleft()
+            if kind == CALL:
+                payload[0].cancel()
+            self.dropped += 1
+        atexit.unregister(self.shutdown)
+
+    close = shutdown
+
+    def stats(self):
+        """Return queue depth and enqueued/dropped/coalesced/written counters"""
+        return {
+            'pending': len(self._queue),
+            'capacity': self.capacity,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'written': self.written,
+            'batches': self.batches,
+            'last_batch_latency': self.last_batch_latency,
+            'max_batch_latency': self.max_batch_latency,
+        }
@@ -1,8 +1,11 @@
+import multiprocessing
 import sys
 from PyQt6.QtWidgets import QApplication
 from ui.main_window import MainWindow
 
 def main():
+    # The input collectors run in a spawned child process
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
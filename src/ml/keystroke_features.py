@@ -0,0 +1,128 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+STAT_NAMES = ('mean', 'std', 'p10', 'p50', 'p90')
+SERIES_NAMES = ('dwell', 'flight', 'digraph', 'trigraph')
+
+def window_stats(windows):
+    """NaN-aware mean, std and 10/50/90th percentiles along the last axis
+
+    Fully vectorized: NaNs are sorted to the end and the quantile index is
+    picked per row, so no Python loop runs over windows.
+    """
+    valid = ~np.isnan(windows)
+    counts = valid.sum(axis=-1)
+    safe_counts = np.maximum(counts, 1)
+    filled = np.where(valid, windows, 0.0)
+    mean = filled.sum(axis=-1) / safe_counts
+    variance = np.where(valid, (windows - mean[..., None]) ** 2, 0.0).sum(axis=-1) / safe_counts
+    ordered = np.sort(np.where(valid, windows, np.inf), axis=-1)
+
+    stats = [mean, np.sqrt(variance)]
+    for q in (0.1, 0.5, 0.9):
+        index = np.floor(q * (safe_counts - 1)).astype(np.intp)
+        stats.append(np.take_along_axis(ordered, index[..., None], axis=-1)[..., 0])
+    stats = np.stack(stats, axis=-1)
+    stats[counts == 0] = np.nan
+    return stats
+
+class KeystrokeFeatureExtractor:
+    """Turn keystroke arrays into fixed-width sliding-window timing features
+
+    Input is a structured array in core.arrays.KEYSTROKE_DTYPE layout, sorted
+    by session and time. For every window of `window` consecutive keystrokes
+    (advancing by `step`) it computes mean/std/p10/p50/p90 of:
+
+    - dwell: how long each key was held (press_duration)
+    - flight: release-to-press gap (inter_key_interval)
+    - digraph: press-to-press latency between consecutive keys
+    - trigraph: press-to-press latency spanning three keys
+
+    plus the typing rate and the fraction of pauses. Gaps longer than
+    `pause_threshold` seconds are treated as pauses rather than typing
+    rhythm, and windows never span two sessions.
+    """
+
+    FEATURE_NAMES = tuple(f'{series}_{stat}' for series in SERIES_NAMES
+                          for stat in STAT_NAMES) + ('typing_rate', 'pause_fraction')
+
+    def __init__(self, window=50, step=10, pause_threshold=2.0):
+        if window < 3:
+            raise ValueError("window must cover at least 3 keystrokes")
+        self.window = window
+        self.step = step
+        self.pause_threshold = pause_threshold
+
+    @property
+    def n_features(self):
+        return len(self.FEATURE_NAMES)
+
+    def _series(self, keys):
+        """Per-keystroke timing series aligned with `keys`"""
+        times = keys['timestamp']
+        sessions = keys['session_id']
+        digraph = np.full(len(keys), np.nan)
+        trigraph = np.full(len(keys), np.nan)
+        digraph[1:] = np.diff(times)
+        trigraph[2:] = times[2:] - times[:-2]
+        digraph[1:][sessions[1:] != sessions[:-1]] = np.nan
+        trigraph[2:][sessions[2:] != sessions[:-2]] = np.nan
+
+        paused = digraph > self.pause_threshold
+        flight = np.where(keys['inter_key_interval'] > self.pause_threshold, np.nan,
+                          keys['inter_key_interval'])
+        digraph = np.where(paused, np.nan, digraph)
+        trigraph = np.where(trigraph > 2 * self.pause_threshold, np.nan, trigraph)
+        return keys['press_duration'].astype(np.float64), flight, digraph, trigraph, paused
+
+    def _extract(self, keys, starts):
+        """Features for windows beginning at the given row offsets"""
+        window = self.window
+        dwell, flight, digraph, trigraph, paused = self._series(keys)
+        features = [window_stats(sliding_window_view(series, window)[starts])
+                    for series in (dwell, flight, digraph, trigraph)]
+
+        times = keys['timestamp']
+        ends = starts + window - 1
+        elapsed = times[ends] - times[starts]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.where(elapsed > 0, (window - 1) / elapsed, np.nan)
+        # The first digraph of a window reaches back before it, so skip it
+        pauses = sliding_window_view(paused, window)[starts][:, 1:].mean(axis=1)
+        features.append(np.stack([rate, pauses], axis=1))
+        return np.concatenate(features, axis=1), times[ends]
+
+    def _starts(self, keys, first, last):
+        """Window offsets in [first, last] whose rows all belong to one session"""
+        starts = np.arange(first, last + 1, self.step, dtype=np.intp)
+        sessions = keys['session_id']
+        return starts[sessions[starts] == sessions[starts + self.window - 1]]
+
+    def extract(self, keys):
+        """Return (feature matrix, window end timestamps) for one array of keystrokes"""
+        if len(keys) < self.window:
+            return np.empty((0, self.n_features)), np.empty(0)
+        return self._extract(keys, self._starts(keys, 0, len(keys) - self.window))
+
+    def extract_chunks(self, chunks):
+        """Yield (features, end timestamps) per chunk of a chunked keystroke stream
+
+        Windows straddling chunk boundaries are produced exactly once, with
+        the same values extract() gives for the concatenated stream.
+        """
+        window, step = self.window, self.step
+        buffer = None
+        offset = 0      # stream position of buffer[0]
+        next_start = 0  # stream position of the next window to emit
+        for chunk in chunks:
+            buffer = chunk if buffer is None else np.concatenate([buffer, chunk])
+            last = offset + len(buffer) - window
+            if last >= next_start:
+                first = next_start - offset
+                starts = self._starts(buffer, first, last - offset)
+                yield self._extract(buffer, starts)
+                next_start += ((last - next_start) // step + 1) * step
+            # Keep two rows of context for the digraph/trigraph of the next window
+            keep_from = max(next_start - offset - 2, 0)
+            buffer = buffer[keep_from:]
+            offset += keep_from
@@ -1 +1,316 @@
- 
\ No newline at end of file
+import json
+import math
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from core.arrays import KEYSTROKE_DTYPE, MOUSE_DTYPE
+from core.compact import to_epoch_us
+
+KEYSTROKE_FEATURES = ('dwell', 'flight', 'digraph')
+MOUSE_FEATURES = ('speed', 'acceleration')
+FEATURES = KEYSTROKE_FEATURES + MOUSE_FEATURES
+
+PATTERN_TYPE = 'continuous_auth'
+
+def _seconds(timestamp):
+    """Event time in epoch seconds from a datetime, a number or None (now)"""
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, datetime):
+        return to_epoch_us(timestamp) / 1e6
+    return float(timestamp)
+
+class RunningStats:
+    """Welford mean and variance over an unbounded stream"""
+
+    def __init__(self, count=0, mean=0.0, std=0.0):
+        self.count = count
+        self.mean = mean
+        self._m2 = std * std * count
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / self.count) if self.count else 0.0
+
+class RollingWindow:
+    """Fixed-size ring buffer keeping a running sum and sum of squares
+
+    add() overwrites the oldest value and adjusts both sums, so the window
+    mean and variance are available in constant time per event.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = [0.0] * size
+        self.count = 0
+        self.position = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def add(self, value):
+        if self.count == self.size:
+            old = self.values[self.position]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.values[self.position] = value
+        self.position = (self.position + 1) % self.size
+        self.total += value
+        self.total_sq += value * value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def std(self):
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        return math.sqrt(max(self.total_sq / self.count - mean * mean, 0.0))
+
+class UserState:
+    """Baseline statistics, recent windows and last reported score of one user"""
+
+    def __init__(self, window):
+        self.baseline = {name: RunningStats() for name in FEATURES}
+        self.windows = {name: RollingWindow(window) for name in FEATURES}
+        # Running sum of squared z-scores over the features that have one
+        self.z_squared = {}
+        self.z_sum = 0.0
+        # Latest confidence of each trained model, by modality
+        self.model_scores = {}
+        self.score = None
+        self.reported_score = None
+        self.reported_at = None
+
+class ContinuousMonitor:
+    """Streaming confidence scorer for continuous authentication
+
+    Events are fed one at a time through the same add_keystroke /
+    add_mouse_movement calls the write path uses. Each user has a learned
+    baseline (the first `enroll_events` samples of every feature, or one
+    installed with set_baseline) and a rolling window of the last `window`
+    samples. An event touches one window and one feature's z-score, so
+    scoring costs O(1) per event no matter how long the session runs.
+
+    The confidence is exp(-z²/2) averaged over the features, where z is
+    the distance of the window mean from the baseline mean in baseline
+    standard deviations. When a ModelStore is given, the user's trained
+    keystroke and mouse models are loaded lazily and scored every `step`
+    keystrokes of their extractor and at the end of every mouse stroke; their
+    confidences are averaged with the z-score one. A behavioral_patterns row is written only when the
+    score has moved by at least `min_change` since the last row and at least
+    `min_interval` seconds have passed. Rows go through `writer.submit` when
+    a BackgroundWriter is given, so scoring never blocks on SQLite.
+    """
+
+    def __init__(self, db, writer=None, models=None, window=100, enroll_events=500, min_samples=20,
+                 min_change=0.1, min_interval=5.0, pause_threshold=2.0,
+                 mouse_pause_threshold=0.1, max_stroke_points=2000):
+        self.db = db
+        self.writer = writer
+        self.models = models
+        self.window = window
+        self.enroll_events = enroll_events
+        self.min_samples = min_samples
+        self.min_change = min_change
+        self.min_interval = min_interval
+        self.pause_threshold = pause_threshold
+        self.mouse_pause_threshold = mouse_pause_threshold
+        self.max_stroke_points = max_stroke_points
+
+        self.users = {}
+        self._session_users = {}
+        self._last_key = {}    # session_id -> time of the previous keystroke
+        self._last_point = {}  # session_id -> (time, x, y, speed) of the previous sample
+        self._key_rings = {}   # session_id -> [keystroke ring, keystrokes seen]
+        self._strokes = {}     # session_id -> points of the current mouse stroke
+        self.events = 0
+        self.patterns_written = 0
+
+    def _user_for(self, session_id):
+        user_id = self._session_users.get(session_id)
+        if user_id is None:
+            user_id = self.db.get_session_user(session_id) or f'session-{session_id}'
+            self._session_users[session_id] = user_id
+        return user_id
+
+    def _state(self, user_id):
+        state = self.users.get(user_id)
+        if state is None:
+            state = self.users[user_id] = UserState(self.window)
+        return state
+
+    def set_baseline(self, user_id, baseline):
+        """Install a baseline as {feature: (mean, std, count)} and stop enrolling it"""
+        state = self._state(user_id)
+        for name, (mean, std, count) in baseline.items():
+            state.baseline[name] = RunningStats(max(count, self.enroll_events), mean, std)
+        state.z_squared.clear()
+        state.z_sum = 0.0
+
+    def add_keystroke(self, session_id, key_pressed, key_released, press_duration,
+                      inter_key_interval=None, timestamp=None):
+        """Score a keystroke; returns the user's current confidence or None"""
+        now = _seconds(timestamp)
+        state = self._state(self._user_for(session_id))
+        self._observe(state, 'dwell', press_duration)
+        if inter_key_interval is not None and inter_key_interval <= self.pause_threshold:
+            self._observe(state, 'flight', inter_key_interval)
+        previous = self._last_key.get(session_id)
+        if previous is not None and 0 < now - previous <= self.pause_threshold:
+            self._observe(state, 'digraph', now - previous)
+        self._last_key[session_id] = now
+        if self.models is not None:
+            self._score_keystroke(session_id, state, now, press_duration, inter_key_interval)
+        return self._update(session_id, state, now)
+
+    def add_mouse_movement(self, session_id, x_position, y_position, movement_speed=None,
+                           acceleration=None, click_type=None, timestamp=None):
+        """Score a mouse sample; returns the user's current confidence or None
+
+        Speed and acceleration are derived from the previous sample of the
+        same stroke when the caller has not computed them.
+        """
+        now = _seconds(timestamp)
+        state = self._state(self._user_for(session_id))
+        previous = self._last_point.get(session_id)
+        speed = movement_speed
+        if previous is not None:
+            last_time, last_x, last_y, last_speed = previous
+            dt = now - last_time
+            if 0 < dt <= self.mouse_pause_threshold:
+                if speed is None:
+                    speed = math.hypot(x_position - last_x, y_position - last_y) / dt
+                if acceleration is None and last_speed is not None:
+                    acceleration = (speed - last_speed) / dt
+            elif movement_speed is None:
+                speed = acceleration = None
+        if speed is not None:
+            self._observe(state, 'speed', speed)
+        if acceleration is not None:
+            self._observe(state, 'acceleration', acceleration)
+        # A click ends the stroke, so the next sample starts fresh
+        self._last_point[session_id] = (None if click_type is not None
+                                        else (now, x_position, y_position, speed))
+        if self.models is not None:
+            self._score_mouse(session_id, state, now, x_position, y_position, click_type)
+        return self._update(session_id, state, now)
+
+    def _score_keystroke(self, session_id, state, now, press_duration, inter_key_interval):
+        """Refresh the keystroke model score once a new window is complete"""
+        model = self.models.get(self._session_users[session_id], 'keystroke')
+        if model is None:
+            return
+        extractor = model.extractor
+        entry = self._key_rings.get(session_id)
+        if entry is None:
+            entry = self._key_rings[session_id] = [np.zeros(extractor.window, KEYSTROKE_DTYPE), 0]
+        ring, seen = entry
+        ring[seen % extractor.window] = (
+            session_id, now, 0, 0, press_duration,
+            np.nan if inter_key_interval is None else inter_key_interval)
+        entry[1] = seen = seen + 1
+        if seen >= extractor.window and (seen - extractor.window) % extractor.step == 0:
+            features, _ = extractor.extract(np.roll(ring, -(seen % extractor.window)))
+            if len(features):
+                state.model_scores['keystroke'] = float(model.confidence(features)[-1])
+
+    def _score_mouse(self, session_id, state, now, x_position, y_position, click_type):
+        """Score the previous stroke with the mouse model once it has ended"""
+        model = self.models.get(self._session_users[session_id], 'mouse')
+        if model is None:
+            return
+        stroke = self._strokes.get(session_id)
+        if stroke is None:
+            stroke = self._strokes[session_id] = deque(maxlen=self.max_stroke_points)
+        if stroke and (now - stroke[-1][1] > model.extractor.pause_threshold
+                       or stroke[-1][6]):
+            points = np.array(list(stroke), dtype=MOUSE_DTYPE)
+            features, _ = model.extractor.extract(points)
+            if len(features):
+                state.model_scores['mouse'] = float(model.confidence(features)[-1])
+            stroke.clear()
+        stroke.append((session_id, now, x_position, y_position, np.nan, np.nan,
+                       1 if click_type is not None else 0))
+
+    def _observe(self, state, name, value):
+        baseline = state.baseline[name]
+        if baseline.count < self.enroll_events:
+            baseline.add(value)
+        window = state.windows[name]
+        window.add(value)
+
+        z_squared = None
+        if (baseline.count >= self.enroll_events and window.count >= self.min_samples
+                and baseline.std > 0):
+            z = (window.mean - baseline.mean) / baseline.std
+            z_squared = z * z
+        state.z_sum -= state.z_squared.pop(name, 0.0)
+        if z_squared is not None:
+            state.z_squared[name] = z_squared
+            state.z_sum += z_squared
+
+    def _update(self, session_id, state, now):
+        self.events += 1
+        components = list(state.model_scores.values())
+        if state.z_squared:
+            components.append(math.exp(-0.5 * state.z_sum / len(state.z_squared)))
+        if not components:
+            return None
+        state.score = sum(components) / len(components)
+
+        changed = (state.reported_score is None
+                   or abs(state.score - state.reported_score) >= self.min_change)
+        due = state.reported_at is None or now - state.reported_at >= self.min_interval
+        if changed and due:
+            self._report(session_id, state, now)
+        return state.score
+
+    def _report(self, session_id, state, now):
+        pattern_data = json.dumps({
+            'user_id': self._session_users[session_id],
+            'window_means': {name: state.windows[name].mean for name in state.z_squared},
+            'z_scores': {name: math.sqrt(value) for name, value in state.z_squared.items()},
+            'model_scores': state.model_scores,
+        })
+        args = (session_id, PATTERN_TYPE, state.score, pattern_data)
+        if self.writer is not None:
+            self.writer.submit('add_behavioral_pattern', *args)
+        else:
+            self.db.add_behavioral_pattern(*args)
+        state.reported_score = state.score
+        state.reported_at = now
+        self.patterns_written += 1
+
+    def score(self, user_id):
+        """Latest confidence for a user, or None before it can be scored"""
+        state = self.users.get(user_id)
+        return state.score if state else None
+
+    def end_session(self, session_id):
+        """Forget per-session stroke and timing state"""
+        self._last_key.pop(session_id, None)
+        self._last_point.pop(session_id, None)
+        self._key_rings.pop(session_id, None)
+        self._strokes.pop(session_id, None)
+        self._session_users.pop(session_id, None)
+
+    def stats(self):
+        """Return event and write counters"""
+        return {
+            'events': self.events,
+            'users': len(self.users),
+            'patterns_written': self.patterns_written,
+        }
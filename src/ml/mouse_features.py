@@ -0,0 +1,170 @@
+import numpy as np
+
+def stroke_starts(points, pause_threshold=0.1):
+    """Row offsets where a new stroke begins
+
+    A stroke ends at a pause longer than `pause_threshold` seconds, at a
+    session change, and right after a click.
+    """
+    if not len(points):
+        return np.empty(0, dtype=np.intp)
+    boundary = np.empty(len(points), dtype=bool)
+    boundary[0] = True
+    boundary[1:] = ((np.diff(points['timestamp']) > pause_threshold)
+                    | (points['session_id'][1:] != points['session_id'][:-1])
+                    | (points['click_type'][:-1] != 0))
+    return np.flatnonzero(boundary)
+
+def kinematics(points, starts):
+    """Per-point velocity, acceleration, jerk, angle change and curvature
+
+    Each quantity at row i is derived from rows up to i of the same stroke
+    and is NaN where there are not enough earlier points in the stroke.
+    Returns a dict of float arrays aligned with `points`.
+    """
+    n = len(points)
+    x = points['x_position'].astype(np.float64)
+    y = points['y_position'].astype(np.float64)
+    t = points['timestamp']
+
+    # Number of earlier points in the same stroke, used to mask differences
+    stroke_index = np.zeros(n, dtype=np.intp)
+    stroke_index[starts] = 1
+    stroke_index = np.cumsum(stroke_index) - 1
+    position = np.arange(n) - starts[stroke_index]
+
+    def diff(values, min_position):
+        out = np.full(n, np.nan)
+        out[1:] = np.diff(values)
+        out[position < min_position] = np.nan
+        return out
+
+    dt = diff(t, 1)
+    dt[dt <= 0] = np.nan
+    dx, dy = diff(x, 1), diff(y, 1)
+    step = np.hypot(dx, dy)
+    speed = step / dt
+    acceleration = diff(speed, 2) / dt
+    jerk = diff(acceleration, 3) / dt
+    heading = np.where(step > 0, np.arctan2(dy, dx), np.nan)
+    angle_change = diff(heading, 2)
+    angle_change = (angle_change + np.pi) % (2 * np.pi) - np.pi
+    with np.errstate(divide='ignore', invalid='ignore'):
+        curvature = np.where(step > 0, angle_change / step, np.nan)
+
+    return {
+        'dt': dt,
+        'step': step,
+        'vx': dx / dt,
+        'vy': dy / dt,
+        'speed': speed,
+        'acceleration': acceleration,
+        'jerk': jerk,
+        'angle_change': angle_change,
+        'curvature': curvature,
+    }
+
+def fill_speed_acceleration(points, pause_threshold=0.1):
+    """Return a copy of `points` with movement_speed and acceleration computed in batch"""
+    motion = kinematics(points, stroke_starts(points, pause_threshold))
+    filled = points.copy()
+    filled['movement_speed'] = motion['speed']
+    filled['acceleration'] = motion['acceleration']
+    return filled
+
+def _segment_mean(values, starts):
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def _segment_std(values, starts, mean):
+    lengths = np.diff(np.append(starts, len(values)))
+    centred = values - np.repeat(mean, lengths)
+    return np.sqrt(_segment_mean(centred * centred, starts))
+
+def _segment_max(values, starts):
+    # fmax ignores NaN unless every value in the segment is NaN
+    return np.fmax.reduceat(values, starts)
+
+class MouseFeatureExtractor:
+    """Segment pointer paths into strokes and describe each with kinematic features
+
+    Input is a structured array in core.arrays.MOUSE_DTYPE layout, sorted by
+    session and time. Everything is computed with array operations over the
+    whole batch: kinematics per point, then per-stroke reductions with
+    ufunc.reduceat, so there is no Python loop per sample or per stroke.
+    """
+
+    FEATURE_NAMES = (
+        'duration', 'point_count', 'path_length', 'displacement', 'straightness',
+        'direction', 'mean_speed', 'std_speed', 'max_speed', 'mean_acceleration',
+        'std_acceleration', 'mean_abs_jerk', 'mean_abs_angle_change',
+        'mean_abs_curvature', 'ends_with_click',
+    )
+
+    def __init__(self, pause_threshold=0.1, min_points=3):
+        self.pause_threshold = pause_threshold
+        self.min_points = min_points
+
+    @property
+    def n_features(self):
+        return len(self.FEATURE_NAMES)
+
+    def extract(self, points):
+        """Return (feature matrix, stroke end timestamps) with one row per stroke"""
+        if not len(points):
+            return np.empty((0, self.n_features)), np.empty(0)
+        starts = stroke_starts(points, self.pause_threshold)
+        ends = np.append(starts[1:], len(points)) - 1
+        motion = kinematics(points, starts)
+
+        x = points['x_position'].astype(np.float64)
+        y = points['y_position'].astype(np.float64)
+        t = points['timestamp']
+        step = np.where(np.isnan(motion['step']), 0.0, motion['step'])
+        path_length = np.add.reduceat(step, starts)
+        dx, dy = x[ends] - x[starts], y[ends] - y[starts]
+        displacement = np.hypot(dx, dy)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            straightness = np.where(path_length > 0, displacement / path_length, np.nan)
+
+        mean_speed = _segment_mean(motion['speed'], starts)
+        mean_acceleration = _segment_mean(motion['acceleration'], starts)
+        features = np.column_stack([
+            t[ends] - t[starts],
+            ends - starts + 1,
+            path_length,
+            displacement,
+            straightness,
+            np.arctan2(dy, dx),
+            mean_speed,
+            _segment_std(motion['speed'], starts, mean_speed),
+            _segment_max(motion['speed'], starts),
+            mean_acceleration,
+            _segment_std(motion['acceleration'], starts, mean_acceleration),
+            _segment_mean(np.abs(motion['jerk']), starts),
+            _segment_mean(np.abs(motion['angle_change']), starts),
+            _segment_mean(np.abs(motion['curvature']), starts),
+            points['click_type'][ends] != 0,
+        ])
+
+        keep = (ends - starts + 1) >= self.min_points
+        return features[keep], t[ends][keep]
+
+    def extract_chunks(self, chunks):
+        """Yield (features, end timestamps) per chunk of a chunked mouse stream
+
+        The last stroke of each chunk may continue in the next one, so it is
+        held back until it is known to be complete.
+        """
+        buffer = None
+        for chunk in chunks:
+            buffer = chunk if buffer is None else np.concatenate([buffer, chunk])
+            starts = stroke_starts(buffer, self.pause_threshold)
+            if len(starts) > 1:
+                yield self.extract(buffer[:starts[-1]])
+                buffer = buffer[starts[-1]:]
+        if buffer is not None and len(buffer):
+            yield self.extract(buffer)
@@ -0,0 +1,142 @@
+"""
+Batch rescoring of recorded sessions for forensic replay
+
+Streams the keystroke and mouse events of many sessions through the
+cached per-user models, scores every window and stroke across a process
+pool and bulk-writes the results to behavioral_patterns. Run from the src
+directory, selecting sessions by ID or by a time range they overlap:
+
+    python -m ml.replay --models ../data/models --since 2024-01-01 --until 2024-02-01
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from core.compact import from_epoch_us
+from core.database import DatabaseManager
+from .trainer import ModelCache, default_extractors, feature_schema_hash
+
+PATTERN_TYPES = {'keystroke': 'replay_keystroke', 'mouse': 'replay_mouse'}
+
+def _counted(chunks, counter):
+    for chunk in chunks:
+        counter[0] += len(chunk)
+        yield chunk
+
+def score_session(db_path, cache_dir, session_id, schemas, chunk_size):
+    """Score one session with its user's cached models; runs inside a worker process
+
+    Returns the behavioral_patterns rows plus event counts, leaving the
+    write to the parent so SQLite keeps a single writer. Events are read in
+    `chunk_size` blocks, but the rows (one per scored window or stroke) are
+    collected for the whole session.
+    """
+    cache = ModelCache(cache_dir)
+    rows = []
+    events = [0]
+    with DatabaseManager(db_path=db_path) as db:
+        user_id = db.get_session_user(session_id) or f'session-{session_id}'
+        sources = (('keystroke', db.iter_keystroke_arrays), ('mouse', db.iter_mouse_arrays))
+        scored = []
+        for modality, iter_arrays in sources:
+            model = cache.load(user_id, modality, schemas[modality])
+            if model is None:
+                continue
+            scored.append(modality)
+            pattern_data = json.dumps({'user_id': user_id, 'model_schema': model.schema,
+                                       'model_trained_at': model.trained_at})
+            chunks = _counted(iter_arrays(session_id, chunk_size), events)
+            for features, end_times in model.extractor.extract_chunks(chunks):
+                confidences = model.confidence(features)
+                rows.extend((session_id, from_epoch_us(round(end_time * 1e6)),
+                             PATTERN_TYPES[modality], float(confidence), pattern_data)
+                            for end_time, confidence in zip(end_times, confidences))
+    return {'session_id': session_id, 'user_id': user_id, 'scored': scored,
+            'events': events[0], 'rows': rows}
+
+class ReplayScorer:
+    """Rescore many sessions in parallel and bulk-write the results
+
+    Sessions are scored by `workers` processes (in-process when workers is
+    1), each streaming events in `chunk_size` blocks. Memory is bounded per
+    session rather than flat: a session's result rows are kept until the
+    parent writes them, so they grow with the number of scored windows
+    (far fewer than raw events). Each finished session is written in one
+    transaction that also replaces its earlier replay rows, so rerunning
+    after a model update leaves one set of results.
+    """
+
+    def __init__(self, db, cache_dir, workers=None, extractors=None, chunk_size=65536):
+        self.db = db
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.schemas = {modality: feature_schema_hash(extractor)
+                        for modality, extractor in (extractors or default_extractors()).items()}
+
+    def select_sessions(self, session_ids=None, since=None, until=None):
+        """Sessions given explicitly, or every session overlapping [since, until]"""
+        if session_ids is not None:
+            return sorted(set(session_ids))
+        return self.db.get_sessions_between(since or datetime.min, until or datetime.max)
+
+    def _results(self, session_ids):
+        jobs = [(str(self.db.db_path), str(self.cache_dir), session_id, self.schemas,
+                 self.chunk_size) for session_id in session_ids]
+        if self.workers == 1 or len(jobs) <= 1:
+            for job in jobs:
+                yield score_session(*job)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for future in as_completed([pool.submit(score_session, *job) for job in jobs]):
+                yield future.result()
+
+    def run(self, session_ids=None, since=None, until=None):
+        """Score the selected sessions; returns a throughput report"""
+        start = time.perf_counter()
+        session_ids = self.select_sessions(session_ids, since, until)
+        events = patterns = 0
+        unscored = []
+        for result in self._results(session_ids):
+            events += result['events']
+            patterns += self.db.add_behavioral_patterns_bulk(
+                result['rows'], replace_sessions=[result['session_id']],
+                replace_types=PATTERN_TYPES.values())
+            if not result['scored']:
+                unscored.append(result['session_id'])
+        seconds = time.perf_counter() - start
+        return {
+            'sessions': len(session_ids),
+            'unscored_sessions': sorted(unscored),
+            'events': events,
+            'patterns_written': patterns,
+            'seconds': seconds,
+            'events_per_second': events / seconds if seconds else None,
+            'sessions_per_second': len(session_ids) / seconds if seconds else None,
+        }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', help="database file (defaults to the application database)")
+    parser.add_argument('--models', required=True, help="model cache directory")
+    parser.add_argument('--sessions', type=int, nargs='+', help="session IDs to score")
+    parser.add_argument('--since', type=datetime.fromisoformat,
+                        help="score sessions overlapping this time or later")
+    parser.add_argument('--until', type=datetime.fromisoformat,
+                        help="score sessions overlapping this time or earlier")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=65536,
+                        help="events read per chunk")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    with DatabaseManager(db_path=args.db) as db:
+        scorer = ReplayScorer(db, args.models, workers=args.workers, chunk_size=args.chunk_size)
+        report = scorer.run(args.sessions, args.since, args.until)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,346 @@
- 
\ No newline at end of file
+import hashlib
+import json
+import os
+import pickle
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+from sklearn.linear_model import SGDOneClassSVM
+from sklearn.preprocessing import StandardScaler
+
+from core.database import DatabaseManager
+from .keystroke_features import KeystrokeFeatureExtractor
+from .mouse_features import MouseFeatureExtractor
+
+# Bump when BehaviorModel changes in a way that makes cached pickles unusable
+MODEL_VERSION = 2
+
+MODALITIES = ('keystroke', 'mouse')
+
+def feature_schema_hash(extractor):
+    """Short hash of an extractor's class, feature names and parameters"""
+    schema = {
+        'extractor': type(extractor).__name__,
+        'features': list(extractor.FEATURE_NAMES),
+        'parameters': sorted(vars(extractor).items()),
+        'model_version': MODEL_VERSION,
+    }
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:16]
+
+def default_extractors():
+    return {'keystroke': KeystrokeFeatureExtractor(), 'mouse': MouseFeatureExtractor()}
+
+def user_features(db, modality, extractor, session_ids, since=None):
+    """Feature matrix of the windows or strokes in the given sessions
+
+    `since` is a (session_id, end time) high-water mark: earlier sessions
+    are not read at all and, in the marked session itself, only windows
+    ending after the mark are kept. Returns (features, new high-water mark),
+    where the mark is `since` unchanged when nothing new was found.
+    """
+    iter_arrays = db.iter_keystroke_arrays if modality == 'keystroke' else db.iter_mouse_arrays
+    blocks = []
+    high_water = since
+    for session_id in session_ids:
+        if since is not None and session_id < since[0]:
+            continue
+        for features, end_times in extractor.extract_chunks(iter_arrays(session_id)):
+            if since is not None and session_id == since[0]:
+                features = features[end_times > since[1]]
+                end_times = end_times[end_times > since[1]]
+            if len(features):
+                blocks.append(features)
+                high_water = (session_id, float(end_times.max()))
+    if not blocks:
+        return np.empty((0, extractor.n_features)), high_water
+    return np.concatenate(blocks), high_water
+
+class BehaviorModel:
+    """One-class model of a single user's keystroke or mouse features
+
+    Features are standardised (missing values become the mean) and fed to
+    a linear one-class SVM trained with SGD. confidence() maps the decision
+    value to the fraction of the user's own training samples that scored
+    lower, so genuine input is spread over [0, 1] and outliers land near 0.
+
+    Both the scaler and the SVM support partial_fit, so new data can be
+    folded in without revisiting history. The training samples used to rank
+    confidences are a fixed-size reservoir sample of everything seen.
+    """
+
+    def __init__(self, modality, extractor, nu=0.1, random_state=0, reservoir_size=1000):
+        self.modality = modality
+        self.extractor = extractor
+        self.schema = feature_schema_hash(extractor)
+        self.version = MODEL_VERSION
+        self.scaler = StandardScaler()
+        self.detector = SGDOneClassSVM(nu=nu, random_state=random_state)
+        self.reference = np.empty(0)
+        self.reservoir_size = reservoir_size
+        self.reservoir = np.empty((0, extractor.n_features))
+        self._rng = np.random.default_rng(random_state)
+        self.n_samples = 0
+        self.partial_updates = 0
+        self.high_water = None
+        self.fingerprint = None
+        self.trained_at = None
+
+    def _transform(self, features):
+        scaled = self.scaler.transform(features)
+        return np.nan_to_num(scaled, nan=0.0, posinf=0.0, neginf=0.0)
+
+    def _refresh_reference(self):
+        self.reference = np.sort(self.detector.decision_function(
+            self._transform(self.reservoir)))
+        self.trained_at = time.time()
+
+    def fit(self, features):
+        """Fit from scratch on a feature matrix"""
+        self.scaler.fit(features)
+        self.detector.fit(self._transform(features))
+        self.partial_updates = 0
+        self.n_samples = len(features)
+        self.reservoir = features
+        if len(features) > self.reservoir_size:
+            self.reservoir = features[self._rng.choice(len(features), self.reservoir_size,
+                                                       replace=False)]
+        self._refresh_reference()
+        return self
+
+    def partial_fit(self, features):
+        """Fold new samples into the scaler, the SVM and the reference set"""
+        self.scaler.partial_fit(features)
+        self.detector.partial_fit(self._transform(features))
+        self.partial_updates += 1
+        # Reservoir sampling (Algorithm R) keeps a uniform sample of all rows seen
+        for row in features:
+            self.n_samples += 1
+            if len(self.reservoir) < self.reservoir_size:
+                self.reservoir = np.vstack([self.reservoir, row])
+            else:
+                slot = self._rng.integers(self.n_samples)
+                if slot < self.reservoir_size:
+                    self.reservoir[slot] = row
+        self._refresh_reference()
+        return self
+
+    def confidence(self, features):
+        """Per-row confidence in [0, 1] that the features came from this user"""
+        if not len(features):
+            return np.empty(0)
+        scores = self.detector.decision_function(self._transform(features))
+        return np.searchsorted(self.reference, scores, side='right') / len(self.reference)
+
+class ModelCache:
+    """Versioned on-disk store of fitted models
+
+    Models live at <directory>/v<MODEL_VERSION>/<user>/<modality>-<schema>.pkl
+    with a small JSON sidecar holding the data fingerprint they were trained
+    on, so staleness can be checked without unpickling. Files are written to
+    a temporary name and renamed, so readers never see a partial model.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory) / f'v{MODEL_VERSION}'
+
+    def _path(self, user_id, modality, schema, suffix):
+        return self.directory / quote(str(user_id), safe='') / f'{modality}-{schema}{suffix}'
+
+    def _write(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + f'.{os.getpid()}.tmp')
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+
+    def save(self, user_id, model):
+        self._write(self._path(user_id, model.modality, model.schema, '.pkl'),
+                    pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+        self.save_metadata(user_id, model.modality, model.schema, model.fingerprint,
+                           model.n_samples, model.trained_at)
+
+    def save_metadata(self, user_id, modality, schema, fingerprint, n_samples, trained_at=None):
+        """Record what data a modality was last trained on, with or without a model"""
+        self._write(self._path(user_id, modality, schema, '.json'),
+                    json.dumps({'fingerprint': fingerprint, 'n_samples': n_samples,
+                                'trained_at': trained_at}).encode())
+
+    def load(self, user_id, modality, schema):
+        """Return the cached model or None"""
+        path = self._path(user_id, modality, schema, '.pkl')
+        try:
+            return pickle.loads(path.read_bytes())
+        except FileNotFoundError:
+            return None
+
+    def metadata(self, user_id, modality, schema):
+        """Return the sidecar of a cached model or None"""
+        try:
+            return json.loads(self._path(user_id, modality, schema, '.json').read_text())
+        except FileNotFoundError:
+            return None
+
+class ModelStore:
+    """Lazy, LRU-bounded view of a ModelCache for the monitor
+
+    At most `capacity` models stay in memory; the least recently used one
+    is dropped when another is loaded. Missing models are remembered too,
+    so users without a profile do not cost a disk lookup per event.
+    """
+
+    def __init__(self, cache, schemas, capacity=32):
+        self.cache = cache
+        self.schemas = schemas
+        self.capacity = capacity
+        self._models = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, modality):
+        key = (user_id, modality)
+        if key in self._models:
+            self._models.move_to_end(key)
+            self.hits += 1
+            return self._models[key]
+        self.misses += 1
+        model = self.cache.load(user_id, modality, self.schemas[modality])
+        self._models[key] = model
+        if len(self._models) > self.capacity:
+            self._models.popitem(last=False)
+        return model
+
+    def invalidate(self, user_id=None):
+        """Drop loaded models of one user, or of everyone"""
+        for key in [key for key in self._models if user_id is None or key[0] == user_id]:
+            del self._models[key]
+
+    def __len__(self):
+        return len(self._models)
+
+def _update_model(db, cache, user_id, modality, extractor, session_ids, fingerprint,
+                  min_samples, force, drift_threshold):
+    """Bring one cached model up to date; returns (mode, new samples)"""
+    schema = feature_schema_hash(extractor)
+    model = None if force else cache.load(user_id, modality, schema)
+    if model is not None and model.version == MODEL_VERSION:
+        features, high_water = user_features(db, modality, extractor, session_ids,
+                                             since=model.high_water)
+        if not len(features):
+            cache.save_metadata(user_id, modality, schema, fingerprint, model.n_samples,
+                                model.trained_at)
+            return 'unchanged', 0
+        # New data the model no longer recognises means the profile has
+        # drifted too far for small steps, so start over
+        if model.confidence(features).mean() >= drift_threshold:
+            model.partial_fit(features)
+            model.high_water = high_water
+            model.fingerprint = fingerprint
+            cache.save(user_id, model)
+            return 'partial', len(features)
+        mode = 'drift'
+    else:
+        mode = 'full'
+
+    features, high_water = user_features(db, modality, extractor, session_ids)
+    if len(features) < min_samples:
+        # Remember the attempt so the user is not refitted until new data arrives
+        cache.save_metadata(user_id, modality, schema, fingerprint, len(features))
+        return 'insufficient_data', len(features)
+    model = BehaviorModel(modality, extractor).fit(features)
+    model.high_water = high_water
+    model.fingerprint = fingerprint
+    cache.save(user_id, model)
+    return mode, len(features)
+
+def fit_user(db_path, cache_dir, user_id, fingerprint, extractors, min_samples,
+             force=False, drift_threshold=0.05):
+    """Update and cache every modality of one user; runs inside a worker process
+
+    Cached models consume only the events past their high-water mark via
+    partial_fit. A full refit happens when there is no model for the
+    current feature schema, when `force` is set, or when the mean confidence
+    of the new samples falls below `drift_threshold`.
+    """
+    start = time.perf_counter()
+    cache = ModelCache(cache_dir)
+    result = {'user_id': user_id, 'models': {}}
+    with DatabaseManager(db_path=db_path) as db:
+        session_ids = db.get_user_sessions(user_id)
+        for modality, extractor in extractors.items():
+            mode, samples = _update_model(db, cache, user_id, modality, extractor,
+                                          session_ids, fingerprint, min_samples, force,
+                                          drift_threshold)
+            result['models'][modality] = {'mode': mode, 'samples': samples}
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+class Trainer:
+    """Fit one keystroke and one mouse model per enrolled user
+
+    Users are fitted in parallel across `workers` processes (in-process
+    when workers is 1). A user whose activity fingerprint (session and event
+    counts, latest event) matches the cached models for the current feature
+    schema is skipped, and the others only process events past each model's
+    high-water mark (see fit_user), so a retrain costs roughly the amount of
+    new data rather than the size of the history.
+    """
+
+    def __init__(self, db, cache_dir, workers=None, extractors=None, min_samples=20,
+                 drift_threshold=0.05):
+        self.db = db
+        self.cache = ModelCache(cache_dir)
+        self.cache_dir = Path(cache_dir)
+        self.workers = workers
+        self.extractors = extractors or default_extractors()
+        self.schemas = {modality: feature_schema_hash(extractor)
+                        for modality, extractor in self.extractors.items()}
+        self.min_samples = min_samples
+        self.drift_threshold = drift_threshold
+
+    def fingerprint(self, user_id):
+        activity = self.db.get_user_activity(user_id)
+        return [activity['session_count'], activity['keystroke_count'],
+                activity['mouse_count'], activity['last_event']]
+
+    def is_current(self, user_id, fingerprint):
+        """True when every modality has a cached model trained on this data"""
+        for modality, schema in self.schemas.items():
+            metadata = self.cache.metadata(user_id, modality, schema)
+            if metadata is None or metadata['fingerprint'] != fingerprint:
+                return False
+        return True
+
+    def model_store(self, capacity=32):
+        """ModelStore over this trainer's cache and feature schemas"""
+        return ModelStore(self.cache, self.schemas, capacity)
+
+    def train(self, user_ids=None, force=False):
+        """Update stale users; returns a report of trained and skipped users
+
+        `force` refits every user from scratch.
+        """
+        start = time.perf_counter()
+        user_ids = self.db.get_enrolled_users() if user_ids is None else list(user_ids)
+        jobs, skipped = [], []
+        for user_id in user_ids:
+            fingerprint = self.fingerprint(user_id)
+            if not force and self.is_current(user_id, fingerprint):
+                skipped.append(user_id)
+            else:
+                jobs.append((str(self.db.db_path), str(self.cache_dir), user_id, fingerprint,
+                             self.extractors, self.min_samples, force,
+                             self.drift_threshold))
+
+        if self.workers == 1 or len(jobs) <= 1:
+            results = [fit_user(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(fit_user, *zip(*jobs)))
+        return {
+            'trained': results,
+            'skipped': skipped,
+            'seconds': time.perf_counter() - start,
+        }
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+import numpy as np
+from core.arrays import KEYSTROKE_DTYPE, MOUSE_DTYPE
+from core.database import DatabaseManager
+
+START = datetime(2024, 3, 1, 9, 30)
+
+def fill_session(db):
+    session_id = db.create_session()
+    db.add_keystrokes_bulk(
+        (session_id, START + timedelta(milliseconds=10 * i), "ab"[i % 2], "ab"[i % 2],
+         0.1 + i / 1000, None if i == 0 else 0.05) for i in range(30))
+    db.add_mouse_movements_bulk(
+        (session_id, START + timedelta(microseconds=1500 * i), i, -i, float(i), None,
+         'left' if i == 7 else None) for i in range(50))
+    return session_id
+
+def check_arrays(db, session_id):
+    keys = db.load_keystroke_array(session_id)
+    assert keys.dtype == KEYSTROKE_DTYPE and len(keys) == 30
+    assert np.isnan(keys['inter_key_interval'][0])
+    assert np.all(np.diff(keys['timestamp']) > 0)
+    assert np.isclose(keys['timestamp'][1] - keys['timestamp'][0], 0.01)
+    assert keys['key_pressed'][0] != keys['key_pressed'][1]
+    assert keys['key_pressed'][0] == keys['key_pressed'][2]
+    
+    mouse = db.load_mouse_array(session_id)
+    assert mouse.dtype == MOUSE_DTYPE and len(mouse) == 50
+    assert np.count_nonzero(mouse['click_type']) == 1 and mouse['click_type'][7] != 0
+    assert np.isclose(mouse['timestamp'][-1] - mouse['timestamp'][0], 49 * 0.0015)
+    
+    chunks = list(db.iter_mouse_arrays(session_id, chunk_size=20))
+    assert [len(chunk) for chunk in chunks] == [20, 20, 10]
+    assert np.concatenate(chunks).tobytes() == mouse.tobytes()
+    
+    frame = db.load_keystroke_dataframe(session_id)
+    assert list(frame.columns) == list(KEYSTROKE_DTYPE.names)
+    assert len(frame) == 30
+
+def test_streaming_row_chunks(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'stream.db')
+    session_id = fill_session(db)
+    
+    chunks = list(db.iter_keystroke_data(session_id, chunk_size=8))
+    assert [len(chunk) for chunk in chunks] == [8, 8, 8, 6]
+    assert [row for chunk in chunks for row in chunk] == db.get_keystroke_data(session_id)
+    db.close()
+
+def test_structured_arrays_legacy_and_compact(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'arrays.db')
+    session_id = fill_session(db)
+    check_arrays(db, session_id)
+    db.close()
+    
+    # Mid-conversion the loaders merge compact and legacy rows
+    db = DatabaseManager(db_path=tmp_path / 'arrays.db', compact_storage=True)
+    db.migrations.backfills['compact_mouse'].batch_size = 20
+    db.run_backfills(time_budget=0)
+    check_arrays(db, session_id)
+    db.run_backfills()
+    check_arrays(db, session_id)
+    db.close()
+
+def test_loading_arrays_never_writes(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'readonly.db')
+    session_id = fill_session(db)
+    conn = db._get_connection()
+    changes = conn.total_changes
+    
+    check_arrays(db, session_id)
+    list(db.iter_keystroke_arrays(session_id, chunk_size=7))
+    assert conn.total_changes == changes
+    assert conn.execute('SELECT COUNT(*) FROM event_codes').fetchone()[0] == 0
+    assert not conn.in_transaction
+    db.close()
@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PyQt6.QtWidgets import QApplication
+from ui.async_query import AsyncQueryExecutor
+
+APP = []
+
+def qt_app():
+    """The shared QApplication, kept referenced so it outlives every test"""
+    if not APP:
+        APP.append(QApplication.instance() or QApplication([]))
+    return APP[0]
+
+def process_until(condition, timeout=5.0):
+    app = qt_app()
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        app.processEvents()
+        time.sleep(0.005)
+
+def test_superseded_queries_are_cancelled_or_discarded():
+    qt_app()
+    executor = AsyncQueryExecutor(workers=1)
+    delivered = []
+    executor.result_ready.connect(lambda key, result: delivered.append((key, result)))
+    release = threading.Event()
+    
+    def blocking(value):
+        release.wait(5)
+        return value
+    
+    running = executor.submit('stats', blocking, 'first')
+    queued = [executor.submit('stats', blocking, f'refresh {i}') for i in range(10)]
+    last = executor.submit('stats', blocking, 'last')
+    assert all(future.cancelled() for future in queued)
+    release.set()
+    
+    process_until(lambda: delivered)
+    assert running.result() == 'first' and last.result() == 'last'
+    process_until(lambda: executor.stats()['discarded'] == 1)
+    assert delivered == [('stats', 'last')]
+    assert executor.stats()['cancelled'] == 10
+    executor.shutdown(wait=True)
+
+def test_results_arrive_on_the_gui_thread_and_errors_are_reported():
+    qt_app()
+    executor = AsyncQueryExecutor()
+    threads, errors = [], []
+    executor.result_ready.connect(lambda key, result: threads.append(threading.current_thread()))
+    executor.query_failed.connect(lambda key, message: errors.append((key, message)))
+    
+    executor.submit('graphs', threading.current_thread)
+    executor.submit('stats', lambda: 1 / 0)
+    process_until(lambda: threads and errors)
+    assert threads == [threading.main_thread()]
+    assert errors == [('stats', 'division by zero')]
+    
+    future = executor.refresh('graphs')
+    assert future.result(5) is not threading.main_thread()
+    assert executor.refresh('unknown') is None
+    executor.shutdown(wait=True)
+
+def test_commands_are_never_superseded():
+    qt_app()
+    executor = AsyncQueryExecutor(workers=1)
+    delivered = []
+    executor.result_ready.connect(lambda key, result: delivered.append((key, result)))
+    release = threading.Event()
+    executor.run('import', release.wait, 5)
+    futures = [executor.run('import', str, name) for name in ('first.npz', 'second.npz')]
+    release.set()
+    
+    process_until(lambda: len(delivered) == 3)
+    assert delivered[1:] == [('import', 'first.npz'), ('import', 'second.npz')]
+    assert not any(future.cancelled() for future in futures)
+    assert executor.stats()['cancelled'] == 0
+    executor.shutdown(wait=True)
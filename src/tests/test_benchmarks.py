@@ -0,0 +1,20 @@
+import json
+from benchmarks import bench_database
+
+def test_benchmark_smoke_run(tmp_path, capsys):
+    output = tmp_path / 'bench.json'
+    bench_database.main([
+        '--minutes', '0.1', '--mouse-rate', '50', '--checkpoint-minutes', '0.05',
+        '--query-repeat', '2', '--single-rows', '10', '--output', str(output)])
+    assert capsys.readouterr().out == ''
+    results = json.loads(output.read_text())
+    assert results['parameters']['minutes'] == 0.1
+    assert 'output' not in results['parameters']
+    
+    for storage in ('legacy', 'compact'):
+        ingest = results['storage'][storage]['ingest']
+        assert ingest['rows'] == 6 * (50 + 5)
+        assert ingest['batch_latency']['count'] == 6
+        assert ingest['batch_latency']['p99_ms'] >= ingest['batch_latency']['p50_ms']
+        assert [point['simulated_seconds'] for point in ingest['checkpoints']] == [3, 6]
+        assert results['storage'][storage]['final_file_bytes'] > 0
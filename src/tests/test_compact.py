@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from core.compact import from_epoch_us, to_epoch_us
+from core.database import DatabaseManager
+
+def test_epoch_microsecond_round_trip():
+    moment = datetime(2024, 3, 1, 9, 30, 15, 123456)
+    assert from_epoch_us(to_epoch_us(moment)) == moment
+    assert to_epoch_us(str(moment)) == to_epoch_us(moment)
+
+def test_compact_storage_converts_and_keeps_read_shape(tmp_path):
+    db_path = tmp_path / 'compact.db'
+    start = datetime(2024, 3, 1, 9, 30)
+    db = DatabaseManager(db_path=db_path)
+    session_id = db.create_session()
+    db.add_keystrokes_bulk(
+        (session_id, start + timedelta(milliseconds=i), chr(97 + i % 26), chr(97 + i % 26),
+         0.1, 0.05) for i in range(40))
+    db.add_mouse_movements_bulk(
+        (session_id, start + timedelta(milliseconds=i), i, 2 * i, 1.5, 0.1,
+         'left' if i % 10 == 0 else None) for i in range(60))
+    legacy_keys = [row[1:] for row in db.get_keystroke_data(session_id)]
+    legacy_mouse = [row[1:] for row in db.get_mouse_movements(session_id)]
+    db.close()
+    
+    db = DatabaseManager(db_path=db_path, compact_storage=True)
+    assert db.compact_storage
+    
+    # Reads work mid-conversion, and again once the backfill has drained the legacy tables
+    db.run_backfills(time_budget=0)
+    assert [row[1:] for row in db.get_keystroke_data(session_id)] == legacy_keys
+    assert db.run_backfills() is True
+    assert [row[1:] for row in db.get_keystroke_data(session_id)] == legacy_keys
+    assert [row[1:] for row in db.get_mouse_movements(session_id)] == legacy_mouse
+    conn = db._get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM mouse_movements_legacy').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM mouse_events').fetchone()[0] == 60
+    
+    # New writes land in the compact tables; same-microsecond events stay distinct
+    db.add_keystroke_data(session_id, "z", "z", 0.2)
+    db.add_mouse_movements_bulk([(session_id, start, 5, 5, None, None, None)] * 3)
+    summary = db.get_session_summary(session_id)
+    assert summary['keystroke_count'] == 41
+    assert summary['mouse_count'] == 63
+    assert db.get_keystroke_data(session_id)[-1][3:5] == ("z", "z")
+    db.close()
+    
+    # Compact storage is remembered without asking for it again
+    assert DatabaseManager(db_path=db_path).compact_storage
+
+def test_out_of_order_rows_keep_their_timestamps(tmp_path):
+    start = datetime(2024, 3, 1, 12)
+    # B pressed at +50 ms and released first, then A (pressed at +0 ms) released
+    rows = [(start + timedelta(milliseconds=50), "b", "b", 0.05, None),
+            (start, "a", "a", 0.12, None)]
+    stored = {}
+    for compact in (False, True):
+        db = DatabaseManager(db_path=tmp_path / f'order-{compact}.db', compact_storage=compact)
+        session_id = db.create_session()
+        db.add_keystrokes_bulk([(session_id,) + row for row in rows])
+        stored[compact] = [(row[2], row[3]) for row in db.get_keystroke_data(session_id)]
+        
+        # A later row that really collides with a stored key is bumped by 1 µs
+        db.add_keystrokes_bulk([(session_id, start, "c", "c", 0.1, None)])
+        if compact:
+            assert [(row[2], row[3]) for row in db.get_keystroke_data(session_id)][:2] == [
+                (str(start), "a"), (str(start + timedelta(microseconds=1)), "c")]
+        db.close()
+    assert stored[True] == stored[False] == [
+        (str(start), "a"), (str(start + timedelta(milliseconds=50)), "b")]
@@ -1,4 +1,7 @@
+import sqlite3
+import threading
 from core.database import DatabaseManager
+from core.migrations import SCHEMA_VERSION
 from datetime import datetime, timedelta
 
 def test_database():
@@ -92,6 +95,82 @@ def test_database():
     # End session
     db.end_session(session_id)
     print("\nEnded session")
+ 
+def test_pooled_connection(tmp_path):
+    with DatabaseManager(db_path=tmp_path / 'pooled.db') as db:
+        session_id = db.create_session()
+        db.add_keystroke_data(session_id, "a", "a", 0.1)
+        
+        # The same thread keeps reusing one connection in WAL mode
+        conn = db._get_connection()
+        assert db._get_connection() is conn
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        
+        # Another thread gets its own connection and can read concurrently
+        counts = []
+        reader = threading.Thread(
+            target=lambda: counts.append(db.get_session_summary(session_id)['keystroke_count']))
+        reader.start()
+        reader.join()
+        assert counts == [1]
+        assert len(db._connections) == 2
+    
+    # Closing drops the pool; the manager reopens on demand
+    assert db._connections == []
+    assert db.get_session_summary(session_id)['keystroke_count'] == 1
+    db.close()
+
+def test_lookup_indexes_and_login_upsert(tmp_path):
+    db_path = tmp_path / 'indexes.db'
+    DatabaseManager(db_path=db_path).close()
+    
+    # Simulate a pre-index database holding duplicate login patterns
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('DROP INDEX idx_login_patterns_user')
+        for start_hour in (7, 9):
+            conn.execute('''
+                INSERT INTO login_patterns (
+                    user_id, normal_login_start_hour, normal_login_end_hour,
+                    normal_login_days, max_login_duration, created_at, updated_at
+                ) VALUES ('old_user', ?, 17, '0,1', 30, 0, 0)
+            ''', (start_hour,))
+        conn.execute('PRAGMA user_version = 0')
+    conn.close()
+    
+    db = DatabaseManager(db_path=db_path)
+    conn = db._get_connection()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    assert db.get_login_pattern('old_user')[2] == 9
+    
+    plan = conn.execute('''
+        EXPLAIN QUERY PLAN SELECT * FROM mouse_movements
+        WHERE session_id = ? ORDER BY timestamp
+    ''', (1,)).fetchall()
+    assert 'idx_mouse_session_time' in str(plan)
+    assert 'TEMP B-TREE' not in str(plan)
+    
+    # add_login_pattern is now a single upsert on the unique user_id
+    db.add_login_pattern('old_user', 8, 18, '0,1,2', 60)
+    db.add_login_pattern('new_user', 6, 14, '5,6', 45)
+    assert db.get_login_pattern('old_user')[2:6] == (8, 18, '0,1,2', 60)
+    assert conn.execute('SELECT COUNT(*) FROM login_patterns').fetchone()[0] == 2
+    db.close()
 
 if __name__ == "__main__":
-    test_database() 
\ No newline at end of file
+    test_database() 
+
+def test_bulk_inserts(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'bulk.db')
+    session_id = db.create_session()
+    now = datetime.now()
+    
+    written = db.add_keystrokes_bulk(
+        (session_id, now, "a", "a", 0.1, None) for _ in range(50))
+    written += db.add_mouse_movements_bulk(
+        (session_id, now, x, x, None, None, None) for x in range(100))
+    
+    assert written == 150
+    summary = db.get_session_summary(session_id)
+    assert summary['keystroke_count'] == 50
+    assert summary['mouse_count'] == 100
+    db.close()
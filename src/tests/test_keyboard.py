@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from collectors.keyboard import KeyboardCollector, key_name
+from core.database import DatabaseManager
+from core.writer import BackgroundWriter
+
+class FakeClock:
+    def __init__(self):
+        self.ns = 10 ** 12
+
+    def __call__(self):
+        return self.ns
+
+    def advance(self, seconds):
+        self.ns += int(seconds * 1e9)
+
+def char(c):
+    return SimpleNamespace(char=c, vk=ord(c))
+
+def test_key_names():
+    assert key_name(char('a')) == 'a'
+    assert key_name(SimpleNamespace(name='shift', char=None)) == 'Key.shift'
+    assert key_name(SimpleNamespace(char=None, vk=65)) == '<65>'
+
+def test_press_release_pairing_and_batching():
+    clock = FakeClock()
+    batches = []
+    collector = KeyboardCollector(batches.append, session_id=7, batch_size=2, clock=clock)
+
+    collector.on_press(char('h'))
+    clock.advance(0.05)
+    collector.on_press(char('h'))  # auto-repeat keeps the first press time
+    clock.advance(0.05)
+    collector.on_press(char('i'))  # rollover: pressed before h is released
+    clock.advance(0.02)
+    collector.on_release(char('h'))
+    clock.advance(0.08)
+    collector.on_release(char('i'))
+    collector.on_release(char('x'))
+
+    assert len(batches) == 1
+    (h, i), = batches
+    assert h[0] == 7 and h[2] == h[3] == 'h'
+    assert abs(h[4] - 0.12) < 1e-9 and h[5] is None
+    assert abs(i[4] - 0.10) < 1e-9 and abs(i[5] - -0.02) < 1e-9
+    assert abs((i[1] - h[1]).total_seconds() - 0.10) < 1e-6
+    assert abs(h[1] - datetime.now()) < timedelta(seconds=5)
+
+    stats = collector.stats()
+    assert stats['keystrokes'] == 2 and stats['unmatched_releases'] == 1
+    assert stats['callbacks'] == 6 and stats['over_budget'] == 0
+
+def test_collector_feeds_background_writer(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'keys.db')
+    session_id = db.create_session()
+    with BackgroundWriter(db) as writer:
+        collector = KeyboardCollector(writer.add_keystrokes, session_id)
+        for c in 'hello world':
+            collector.on_press(char(c))
+            collector.on_release(char(c))
+        collector.stop()
+        writer.flush()
+    assert [row[3] for row in db.get_keystroke_data(session_id)] == list('hello world')
+    assert collector.stats()['max_callback_us'] > 0
+    db.close()
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from core.arrays import KEYSTROKE_DTYPE
+from ml.keystroke_features import KeystrokeFeatureExtractor, window_stats
+
+def synthetic_keys(n, sessions=1, seed=0):
+    rng = np.random.default_rng(seed)
+    keys = np.zeros(n, dtype=KEYSTROKE_DTYPE)
+    keys['session_id'] = np.repeat(np.arange(1, sessions + 1), -(-n // sessions))[:n]
+    gaps = rng.uniform(0.1, 0.3, n)
+    gaps[::97] = 5.0  # occasional pauses
+    keys['timestamp'] = 1.7e9 + np.cumsum(gaps)
+    keys['key_pressed'] = keys['key_released'] = rng.integers(1, 30, n)
+    keys['press_duration'] = rng.uniform(0.05, 0.15, n)
+    keys['inter_key_interval'] = gaps - 0.1
+    return keys
+
+def test_window_stats_matches_numpy():
+    values = np.array([[1.0, 2.0, np.nan, 4.0], [np.nan] * 4])
+    stats = window_stats(values)
+    assert stats[0, 0] == pytest.approx(np.nanmean(values[0]))
+    assert stats[0, 1] == pytest.approx(np.nanstd(values[0]))
+    assert stats[0, 3] == 2.0
+    assert np.isnan(stats[1]).all()
+
+def test_feature_matrix_shape_and_values():
+    extractor = KeystrokeFeatureExtractor(window=20, step=5, pause_threshold=2.0)
+    keys = synthetic_keys(200)
+    features, times = extractor.extract(keys)
+    
+    assert features.shape == (37, extractor.n_features)
+    assert len(extractor.FEATURE_NAMES) == extractor.n_features
+    assert np.array_equal(times, keys['timestamp'][19::5])
+    
+    column = dict(zip(extractor.FEATURE_NAMES, features.T))
+    assert np.all((column['dwell_mean'] > 0.05) & (column['dwell_mean'] < 0.15))
+    # Pauses are excluded from the rhythm statistics but counted separately
+    assert np.nanmax(column['digraph_p90']) < 2.0
+    assert column['pause_fraction'].max() > 0
+
+def test_windows_do_not_span_sessions():
+    extractor = KeystrokeFeatureExtractor(window=10, step=1)
+    keys = synthetic_keys(40, sessions=2)
+    _, times = extractor.extract(keys)
+    assert len(times) == 2 * (20 - 10 + 1)
+
+def test_chunked_extraction_matches_whole_array():
+    extractor = KeystrokeFeatureExtractor(window=25, step=7)
+    keys = synthetic_keys(500, sessions=3)
+    expected, expected_times = extractor.extract(keys)
+    
+    chunks = [keys[i:i + 64] for i in range(0, len(keys), 64)]
+    parts = list(extractor.extract_chunks(chunks))
+    features = np.concatenate([part[0] for part in parts])
+    times = np.concatenate([part[1] for part in parts])
+    
+    assert np.array_equal(times, expected_times)
+    np.testing.assert_allclose(features, expected, equal_nan=True)
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from test_async_query import qt_app
+from core.database import DatabaseManager
+from ui.dashboard import PANELS, DashboardWidget, SessionSeriesWidget
+from ui.main_window import MainWindow
+from ui.live_stats import LiveAggregator, SeriesRing, decimate
+
+START = datetime(2024, 3, 1, 9, 30)
+
+class FixedMonitor:
+    def add_keystroke(self, *args, **kwargs):
+        return 0.75
+
+    def add_mouse_movement(self, *args, **kwargs):
+        return None
+
+def test_decimate_keeps_extremes_within_the_point_budget():
+    times = np.arange(100000, dtype=float)
+    values = np.sin(times / 50)
+    values[31337] = 10.0
+    out_times, out_values = decimate(times, values, 1000, 99999, 200)
+    assert len(out_times) <= 400 and out_times[0] >= 1000
+    assert np.all(np.diff(out_times) >= 0)
+    assert out_values.max() == 10.0 and out_values.min() == pytest.approx(-1, abs=1e-3)
+    short_times, _ = decimate(times[:50], values[:50], 0, 49, 200)
+    assert len(short_times) == 50
+
+def test_series_ring_keeps_the_newest_points_in_order():
+    ring = SeriesRing(4)
+    for i in range(10):
+        ring.append(i, i * 2)
+    times, values = ring.arrays()
+    assert list(times) == [6, 7, 8, 9] and list(values) == [12, 14, 16, 18]
+    assert ring.last() == (9, 18)
+
+def test_aggregator_buckets_events_and_falls_idle():
+    aggregator = LiveAggregator(monitor=FixedMonitor(), capacity=60)
+    aggregator.add_keystrokes([(1, START + timedelta(seconds=i / 4), 'k', 'k', 0.1, None)
+                               for i in range(8)])
+    aggregator.add_mouse_movements([(1, START + timedelta(seconds=1.5), 0, 0, 200.0, None, None),
+                                    (1, START + timedelta(seconds=1.6), 5, 0, 400.0, None, None)])
+    aggregator.tick(START + timedelta(seconds=2))
+    current = aggregator.current()
+    assert current['typing_rate'] == 240 and current['dwell'] == pytest.approx(100)
+    assert current['mouse_speed'] == 300 and current['confidence'] == 0.75
+    
+    aggregator.tick(START + timedelta(seconds=3))
+    assert aggregator.current()['typing_rate'] == 0
+    assert len(aggregator.snapshot()['typing_rate'][0]) == 3
+    
+    for second in range(200):
+        aggregator.tick(START + timedelta(seconds=4 + second))
+    assert len(aggregator.snapshot()['typing_rate'][0]) == 60
+
+def test_dashboard_frame_cost_is_bounded_by_width():
+    qt_app()
+    aggregator = LiveAggregator(resolution=0.01, capacity=100000)
+    end = datetime.now()
+    aggregator.add_mouse_movements([(1, end - timedelta(seconds=300 - i / 100), 0, 0,
+                                     float(i % 500), None, None) for i in range(30000)])
+    dashboard = DashboardWidget(aggregator, span=300)
+    dashboard.resize(400, 300)
+    dashboard.grab()
+    assert dashboard.frames == 1
+    assert 0 < dashboard.points_drawn <= len(PANELS) * 2 * 400
+
+def test_graphs_plot_the_session_series(tmp_path):
+    qt_app()
+    db = DatabaseManager(db_path=tmp_path / 'graphs.db')
+    session_id = db.create_session()
+    db.add_keystrokes_bulk((session_id, START + timedelta(seconds=i), "a", "a", 0.1,
+                            0.2) for i in range(50))
+    db.add_mouse_movements_bulk((session_id, START + timedelta(seconds=i / 2), i, 0, float(i),
+                                 None, None) for i in range(100))
+    
+    window = MainWindow()
+    window.db = db
+    window.last_session_id = session_id
+    window.show_query_result('graphs', window.load_graphs())
+    plot = window.session_plot
+    assert plot.isVisibleTo(window)
+    assert np.isclose(plot.series['keystrokes'][1][0], 100.0)  # press duration in ms
+    plot.resize(400, 200)
+    plot.grab()
+    assert 0 < plot.points_drawn <= 50 + 100
+    window.close()
+    db.close()
+    
+    empty = SessionSeriesWidget()
+    empty.set_series({'start': None, 'bucket_seconds': None, 'keystrokes': [], 'mouse': []})
+    empty.grab()
+    assert empty.points_drawn == 0
@@ -0,0 +1,45 @@
+from datetime import datetime
+from core.database import DatabaseManager
+from core.login_policy import LoginPolicy, hour_mask
+
+MONDAY = datetime(2024, 1, 1)
+
+def at(day, hour):
+    return MONDAY.replace(day=1 + day, hour=hour)
+
+def test_hour_mask_wraps_past_midnight():
+    assert [h for h in range(24) if hour_mask(9, 17) >> h & 1] == list(range(9, 18))
+    assert [h for h in range(24) if hour_mask(22, 2) >> h & 1] == [0, 1, 2, 22, 23]
+
+def test_policy_evaluation():
+    office = LoginPolicy('alice', 9, 17, '0,1,2,3,4', 30)
+    assert office.evaluate(at(0, 10), 5) == (False, None)
+    assert office.evaluate(at(0, 20), 5) == (True, "Login outside normal hours")
+    assert office.evaluate(at(5, 10), 5) == (True, "Login on non-allowed day")
+    assert office.evaluate(at(0, 10), 31) == (True, "Login duration exceeds maximum")
+
+    # A Friday night shift runs into Saturday morning
+    night = LoginPolicy('bob', 22, 2, '4', 30)
+    assert night.evaluate(at(4, 23), 5) == (False, None)
+    assert night.evaluate(at(5, 1), 5) == (False, None)
+    assert night.evaluate(at(4, 1), 5) == (True, "Login on non-allowed day")
+
+def test_policies_are_cached_and_invalidated(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'login.db')
+    db.add_login_pattern('alice', 9, 17, '0,1,2,3,4', 30)
+    assert db.check_login_suspicious('alice', at(0, 10), 5) == (False, None)
+    assert db.check_login_suspicious('nobody', at(0, 10), 5) == (True, "No login pattern established")
+    policy = db.get_login_policy('alice')
+    assert db.get_login_policy('alice') is policy
+
+    db.add_login_pattern('alice', 18, 23, '0', 30)
+    assert db.check_login_suspicious('alice', at(0, 10), 5) == (True, "Login outside normal hours")
+
+    results = db.check_logins_suspicious([
+        ('alice', at(0, 20), 5),
+        ('alice', at(1, 20), 5),
+        ('nobody', at(0, 20), 5),
+    ])
+    assert results == [(False, None), (True, "Login on non-allowed day"),
+                       (True, "No login pattern established")]
+    db.close()
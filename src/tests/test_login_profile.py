@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+from collectors.login import LoginCollector
+from core.database import DatabaseManager
+from core.login_profile import HOURS_PER_WEEK, LoginProfile, duration_bin, hour_of_week
+
+MONDAY = datetime(2024, 1, 1)
+
+def test_profile_slots_and_probabilities():
+    assert hour_of_week(MONDAY.replace(hour=9)) == 9
+    assert hour_of_week(MONDAY + timedelta(days=6, hours=23)) == HOURS_PER_WEEK - 1
+    assert duration_bin(0.1) == 0 and duration_bin(3.0) == 4
+
+    profile = LoginProfile('alice', min_attempts=10)
+    assert profile.evaluate(MONDAY, 3.0) == (False, None)
+    for day in range(20):
+        profile.add(MONDAY + timedelta(days=day % 5, hours=9), 3.0)
+    assert profile.total == 20
+    assert profile.time_probability(MONDAY.replace(hour=9)) > 0.1
+    assert profile.evaluate(MONDAY.replace(hour=9), 3.5) == (False, None)
+    assert profile.evaluate(MONDAY.replace(hour=3), 3.0) == (True, "Login at an unusual time of week")
+    assert profile.evaluate(MONDAY.replace(hour=9), 600.0) == (True, "Unusual login duration")
+
+def test_profiles_learn_from_recorded_attempts(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'login.db')
+    collector = LoginCollector(db)
+    morning = MONDAY.replace(hour=9)
+    assert collector.record_attempt('alice', True, 3.0, attempt_time=morning) == \
+        (True, "No login pattern established")
+
+    for week in range(5):
+        for day in range(5):
+            collector.record_attempt('alice', True, 3.0,
+                                     attempt_time=morning + timedelta(weeks=week, days=day))
+    # Failed attempts are not learned
+    db.add_login_attempt('alice', False, 3.0, attempt_time=morning.replace(hour=3))
+    profile = db.get_login_profile('alice')
+    assert profile.total == 26
+
+    assert collector.assess('alice', morning + timedelta(weeks=6), 3.0) == (False, None)
+    assert collector.assess('alice', morning.replace(hour=3), 3.0)[0]
+
+    # A fresh manager rebuilds the same profile from the database
+    db.close()
+    reopened = DatabaseManager(db_path=tmp_path / 'login.db')
+    assert reopened.get_login_profile('alice').counts == profile.counts
+    reopened.close()
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from collectors.login import LoginCollector
+from core.compact import to_epoch_us
+from core.database import DatabaseManager
+from core.login_rate import LoginRateTracker, SlidingWindowCounters
+
+def test_counters_slide_and_stay_bounded():
+    counters = SlidingWindowCounters(window=60, bucket_seconds=10, max_keys=3)
+    for second in range(0, 60, 5):
+        counters.add('alice', 1000 + second, failed=True)
+    assert counters.counts('alice', 1059) == (12, 12)
+    # Buckets older than the window fall away
+    assert counters.counts('alice', 1089) == (6, 6)
+    assert counters.counts('alice', 1200) == (0, 0)
+
+    for key in 'abcde':
+        counters.add(key, 1300, failed=False)
+    assert len(counters) == 3 and counters.counts('a', 1300) == (0, 0)
+
+def test_tracker_flags_bursts_per_user_and_address():
+    tracker = LoginRateTracker(window=60, max_user_failures=3, max_ip_failures=5)
+    start = datetime(2024, 1, 1, 9)
+    for i in range(3):
+        assert tracker.evaluate('alice', '10.0.0.1', False, start) == (False, None)
+        tracker.add('alice', '10.0.0.1', False, start + timedelta(seconds=i))
+    assert tracker.evaluate('alice', '10.0.0.1', False, start + timedelta(seconds=5)) == \
+        (True, "Too many failed logins for this user")
+    assert tracker.evaluate('alice', '10.0.0.1', True, start + timedelta(seconds=5)) == (False, None)
+    assert tracker.evaluate('alice', '10.0.0.1', False, start + timedelta(minutes=2)) == (False, None)
+
+    # Spraying many accounts from one address
+    for i in range(5):
+        tracker.add(f'user{i}', '10.0.0.2', False, start)
+    assert tracker.evaluate('bob', '10.0.0.2', False, start) == \
+        (True, "Too many failed logins from this address")
+
+def test_rates_rebuild_from_recent_attempts(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'login.db')
+    now = datetime.now()
+    db.add_login_attempt('alice', False, 2.0, '10.0.0.1', attempt_time=now - timedelta(hours=1))
+    for i in range(5):
+        db.add_login_attempt('alice', False, 2.0, '10.0.0.1',
+                             attempt_time=now - timedelta(seconds=30 - i))
+    db.close()
+
+    db = DatabaseManager(db_path=tmp_path / 'login.db')
+    collector = LoginCollector(db)
+    assert collector.record_attempt('alice', False, 2.0, '10.0.0.1', attempt_time=now) == \
+        (True, "Too many failed logins for this user")
+    # The recorded attempt feeds the live counters too, and the old one is outside the window
+    assert db.get_login_rates().users.counts('alice', to_epoch_us(now) / 1e6) == (6, 6)
+    db.close()
@@ -0,0 +1,89 @@
+import sqlite3
+import pytest
+from core.database import DatabaseManager
+from core.migrations import Backfill, Migration, MigrationRunner, SCHEMA_VERSION
+
+def test_schema_steps_are_timed_and_transactional(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'migrations.db')
+    conn = db._get_connection()
+    assert db.migrations.current_version(conn) == SCHEMA_VERSION
+    assert [step[0] for step in db.migrations.timings] == list(range(1, SCHEMA_VERSION + 1))
+    
+    def broken_upgrade(conn):
+        conn.execute('CREATE TABLE half_done (x INTEGER)')
+        raise RuntimeError("upgrade failed")
+    
+    runner = MigrationRunner(db, [Migration(SCHEMA_VERSION + 1, "Broken", broken_upgrade)])
+    with pytest.raises(RuntimeError):
+        runner.run()
+    
+    # The failed step left neither its table nor a version bump behind
+    assert runner.current_version(conn) == SCHEMA_VERSION
+    assert conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name = 'half_done'").fetchone()[0] == 0
+    db.close()
+
+def test_backfill_runs_in_resumable_batches(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'backfill.db')
+    session_id = db.create_session()
+    db.add_mouse_movements_bulk(
+        (session_id, 0, x, x, None, None, None) for x in range(25))
+    
+    def double_speed(conn, lower, upper):
+        conn.execute('''
+            UPDATE mouse_movements SET movement_speed = x_position * 2
+            WHERE movement_id > ? AND movement_id <= ?
+        ''', (lower, upper))
+    
+    backfill = Backfill('double_speed', 'mouse_movements', 'movement_id',
+                        double_speed, batch_size=10)
+    runner = MigrationRunner(db, [
+        Migration(SCHEMA_VERSION + 1, "Mouse speed backfill", lambda conn: None, [backfill]),
+    ])
+    runner.run()
+    conn = db._get_connection()
+    
+    # A zero budget still advances by exactly one batch per call
+    assert runner.run_backfills(time_budget=0) is False
+    assert conn.execute('''
+        SELECT last_key FROM migration_backfills WHERE name = 'double_speed'
+    ''').fetchone()[0] == 10
+    assert runner.run_backfills() is True
+    assert runner.pending_backfills(conn) == []
+    assert runner.backfill_timings['double_speed'][0] == 4
+    
+    speeds = conn.execute('SELECT x_position, movement_speed FROM mouse_movements').fetchall()
+    assert all(speed == x * 2 for x, speed in speeds)
+    db.close()
+
+def test_backfill_thread_records_errors_and_retries(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'retry.db')
+    session_id = db.create_session()
+    db.add_mouse_movements_bulk(
+        (session_id, 0, x, x, None, None, None) for x in range(25))
+    failures = [2]
+    
+    def flaky(conn, lower, upper):
+        if failures[0]:
+            failures[0] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        conn.execute('''
+            UPDATE mouse_movements SET movement_speed = 1.0
+            WHERE movement_id > ? AND movement_id <= ?
+        ''', (lower, upper))
+    
+    runner = MigrationRunner(db, [
+        Migration(SCHEMA_VERSION + 1, "Flaky backfill", lambda conn: None,
+                  [Backfill('flaky', 'mouse_movements', 'movement_id', flaky, batch_size=10)]),
+    ])
+    runner.run()
+    thread = runner.start_backfills(pause=0, retry=0.01)
+    thread.join(5)
+    
+    assert not thread.is_alive()
+    assert isinstance(runner.last_error, sqlite3.OperationalError)
+    conn = db._get_connection()
+    assert runner.pending_backfills(conn) == []
+    assert conn.execute(
+        'SELECT COUNT(*) FROM mouse_movements WHERE movement_speed IS NULL').fetchone()[0] == 0
+    db.close()
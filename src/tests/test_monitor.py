@@ -0,0 +1,72 @@
+import json
+import random
+from core.database import DatabaseManager
+from ml.monitor import ContinuousMonitor, RollingWindow
+
+def test_rolling_window_matches_recent_values():
+    window = RollingWindow(5)
+    values = [float(v) for v in range(1, 13)]
+    for value in values:
+        window.add(value)
+    recent = values[-5:]
+    mean = sum(recent) / 5
+    assert window.count == 5
+    assert abs(window.mean - mean) < 1e-9
+    assert abs(window.std ** 2 - sum((v - mean) ** 2 for v in recent) / 5) < 1e-9
+
+def type_keys(monitor, session_id, count, dwell, start=0.0, rng=None):
+    rng = rng or random.Random(0)
+    t = start
+    score = None
+    for _ in range(count):
+        t += rng.uniform(0.15, 0.25)
+        score = monitor.add_keystroke(session_id, 'a', 'a', dwell + rng.uniform(-0.01, 0.01),
+                                      rng.uniform(0.05, 0.1), timestamp=t)
+    return score, t
+
+def test_monitor_scores_and_writes_only_on_change(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'monitor.db')
+    session_id = db.create_session(user_id='alice')
+    assert db.get_session_user(session_id) == 'alice'
+    assert db.get_user_sessions('alice') == [session_id]
+
+    monitor = ContinuousMonitor(db, window=20, enroll_events=200, min_samples=20,
+                                min_change=0.2, min_interval=0.0)
+    score, t = type_keys(monitor, session_id, 300, dwell=0.1)
+    assert score > 0.8
+    writes = monitor.patterns_written
+    assert writes >= 1
+
+    # Steady typing keeps the score put, so nothing more is written
+    score, t = type_keys(monitor, session_id, 300, dwell=0.1, start=t)
+    assert monitor.patterns_written == writes
+
+    # A different typist holds keys far longer and the confidence collapses
+    score, t = type_keys(monitor, session_id, 50, dwell=0.3, start=t)
+    assert score < 0.2
+    assert monitor.score('alice') == score
+    assert monitor.patterns_written > writes
+
+    with db._get_connection() as conn:
+        rows = conn.execute('''
+            SELECT pattern_type, confidence_score, pattern_data
+            FROM behavioral_patterns WHERE session_id = ?
+        ''', (session_id,)).fetchall()
+    assert len(rows) == monitor.patterns_written
+    assert {row[0] for row in rows} == {'continuous_auth'}
+    assert json.loads(rows[-1][2])['user_id'] == 'alice'
+    db.close()
+
+def test_monitor_uses_installed_baseline_for_mouse(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'monitor.db')
+    session_id = db.create_session()
+    monitor = ContinuousMonitor(db, window=10, min_samples=10, min_interval=0.0)
+    user_id = f'session-{session_id}'
+    monitor.set_baseline(user_id, {'speed': (100.0, 10.0, 1000)})
+
+    score = None
+    for i in range(30):
+        score = monitor.add_mouse_movement(session_id, i, 0, timestamp=i * 0.01)
+    assert score > 0.99
+    assert monitor.stats()['events'] == 30
+    db.close()
@@ -0,0 +1,78 @@
+import math
+from types import SimpleNamespace
+import numpy as np
+from collectors.mouse import MouseCollector
+from core.arrays import MOUSE_DTYPE
+from core.compact import to_epoch_us
+from ml.mouse_features import MouseFeatureExtractor, fill_speed_acceleration
+
+class FakeClock:
+    def __init__(self):
+        self.ns = 10 ** 12
+
+    def __call__(self):
+        return self.ns
+
+def drive(collector, clock, path, rate=1000):
+    """Feed (x, y) points at `rate` Hz; returns the raw samples as an array"""
+    raw = []
+    for x, y in path:
+        clock.ns += 10 ** 9 // rate
+        collector.on_move(x, y)
+        raw.append((1, clock.ns / 1e9, x, y, np.nan, np.nan, 0))
+    return raw
+
+def to_array(rows):
+    points = np.array(rows, dtype=MOUSE_DTYPE)
+    return fill_speed_acceleration(points)
+
+def test_path_simplification_keeps_stroke_shape():
+    clock = FakeClock()
+    rows = []
+    collector = MouseCollector(rows.extend, session_id=1, clock=clock)
+
+    # An arc followed by a straight run, then a click after the stroke ends
+    arc = [(round(200 + 150 * math.cos(a)), round(200 + 150 * math.sin(a)))
+           for a in np.linspace(0, math.pi, 600)]
+    line = [(50 - i // 2, 200) for i in range(1, 401)]
+    raw = drive(collector, clock, arc + line)
+    collector.on_click(line[-1][0], line[-1][1], SimpleNamespace(name='left'), True)
+    collector.stop()
+    raw.append((1, clock.ns / 1e9, line[-1][0], line[-1][1], np.nan, np.nan, 1))
+
+    stats = collector.stats()[1]
+    assert stats['raw_events'] == len(raw) and stats['rows'] == len(rows)
+    assert 5 <= stats['reduction_ratio'] <= 40
+
+    # First point, last move and click are kept exactly
+    assert (rows[0][2], rows[0][3]) == arc[0]
+    assert (rows[-2][2], rows[-2][3]) == line[-1] and rows[-1][6] == 'left'
+
+    kept = [(1, to_epoch_us(row[1]) / 1e6, row[2], row[3], np.nan, np.nan,
+             1 if row[6] else 0) for row in rows]
+    extractor = MouseFeatureExtractor()
+    full, _ = extractor.extract(to_array(raw))
+    thin, _ = extractor.extract(to_array(kept))
+    assert full.shape == thin.shape == (1, extractor.n_features)
+    names = extractor.FEATURE_NAMES
+    for name in ('duration', 'displacement', 'direction', 'mean_speed'):
+        i = names.index(name)
+        assert abs(thin[0, i] - full[0, i]) <= 0.05 * abs(full[0, i]), name
+    # Raw pixel staircases overstate the length; the thinned path is close to the true one
+    true_length = math.pi * 150 + 200
+    assert abs(thin[0, names.index('path_length')] - true_length) <= 0.02 * true_length
+
+def test_pauses_split_strokes_and_keep_their_ends():
+    clock = FakeClock()
+    rows = []
+    collector = MouseCollector(rows.extend, session_id=1, batch_size=1, clock=clock)
+    drive(collector, clock, [(i, 0) for i in range(100)])
+    clock.ns += 10 ** 9  # a one second pause
+    drive(collector, clock, [(100, i) for i in range(100)])
+    collector.stop()
+
+    positions = [(row[2], row[3]) for row in rows]
+    assert (99, 0) in positions and (100, 0) in positions and positions[-1] == (100, 99)
+    stroke_start = positions.index((100, 0))
+    assert rows[stroke_start][4] is None
+    assert all(row[4] is not None for row in rows[stroke_start + 1:])
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from core.arrays import MOUSE_DTYPE
+from ml.mouse_features import (MouseFeatureExtractor, fill_speed_acceleration,
+                               kinematics, stroke_starts)
+
+def straight_stroke(n, start_time, speed=100.0, dt=0.01, session_id=1):
+    points = np.zeros(n, dtype=MOUSE_DTYPE)
+    points['session_id'] = session_id
+    points['timestamp'] = start_time + dt * np.arange(n)
+    points['x_position'] = np.round(speed * dt * np.arange(n))
+    points['movement_speed'] = np.nan
+    points['acceleration'] = np.nan
+    return points
+
+def three_strokes():
+    first = straight_stroke(20, 0.0)
+    first['click_type'][-1] = 1
+    second = straight_stroke(30, 0.21)  # starts straight after the click
+    third = straight_stroke(10, 5.0, session_id=2)
+    return np.concatenate([first, second, third])
+
+def test_stroke_segmentation():
+    points = three_strokes()
+    assert list(stroke_starts(points)) == [0, 20, 50]
+
+def test_kinematics_of_constant_velocity():
+    points = straight_stroke(50, 0.0)
+    motion = kinematics(points, stroke_starts(points))
+    assert np.isnan(motion['speed'][0]) and np.isnan(motion['acceleration'][1])
+    np.testing.assert_allclose(motion['speed'][1:], 100.0)
+    np.testing.assert_allclose(motion['acceleration'][2:], 0.0, atol=1e-6)
+    np.testing.assert_allclose(motion['angle_change'][2:], 0.0)
+    
+    filled = fill_speed_acceleration(points)
+    np.testing.assert_allclose(filled['movement_speed'][1:], 100.0)
+
+def test_stroke_features():
+    extractor = MouseFeatureExtractor()
+    features, ends = extractor.extract(three_strokes())
+    assert features.shape == (3, extractor.n_features)
+    column = dict(zip(extractor.FEATURE_NAMES, features.T))
+    
+    assert list(column['point_count']) == [20, 30, 10]
+    assert list(column['ends_with_click']) == [1, 0, 0]
+    assert column['straightness'] == pytest.approx([1.0, 1.0, 1.0])
+    assert column['mean_speed'] == pytest.approx([100.0] * 3)
+    assert column['path_length'][1] == pytest.approx(29.0)
+    assert ends[0] == pytest.approx(0.19)
+
+def test_chunked_extraction_matches_whole_array():
+    extractor = MouseFeatureExtractor()
+    points = three_strokes()
+    expected, expected_ends = extractor.extract(points)
+    
+    parts = list(extractor.extract_chunks(points[i:i + 7] for i in range(0, len(points), 7)))
+    features = np.concatenate([part[0] for part in parts])
+    np.testing.assert_allclose(features, expected, equal_nan=True)
+    np.testing.assert_allclose(np.concatenate([part[1] for part in parts]), expected_ends)
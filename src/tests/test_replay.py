@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+from core.database import DatabaseManager
+from ml.replay import PATTERN_TYPES, ReplayScorer
+from ml.trainer import Trainer
+from test_trainer import record_session
+
+def replay_rows(db, session_id):
+    return [row for row in db.get_behavioral_patterns(session_id)
+            if row[3] in PATTERN_TYPES.values()]
+
+def test_replay_scores_sessions_in_parallel_and_replaces_results(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'replay.db')
+    alice = record_session(db, 'alice', 1)
+    bob = record_session(db, 'bob', 2, dwell=0.2)
+    stranger = record_session(db, None, 3)
+    Trainer(db, tmp_path / 'models', workers=1).train()
+
+    scorer = ReplayScorer(db, tmp_path / 'models', workers=2, chunk_size=100)
+    now = datetime.now()
+    report = scorer.run(since=now - timedelta(hours=1), until=now + timedelta(hours=1))
+    assert report['sessions'] == 3
+    assert report['unscored_sessions'] == [stranger]
+    assert report['events'] == 2 * (400 + 40 * 20)
+    assert report['events_per_second'] > 0
+
+    rows = replay_rows(db, alice)
+    assert rows and all(0.0 <= row[4] <= 1.0 for row in rows)
+    assert {row[3] for row in rows} == set(PATTERN_TYPES.values())
+    assert report['patterns_written'] == len(rows) + len(replay_rows(db, bob))
+
+    # Rescoring one session replaces its rows instead of adding to them
+    again = ReplayScorer(db, tmp_path / 'models', workers=1).run(session_ids=[alice])
+    assert again['sessions'] == 1
+    assert len(replay_rows(db, alice)) == len(rows)
+    db.close()
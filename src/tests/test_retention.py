@@ -0,0 +1,138 @@
+import csv
+import gzip
+import threading
+import time
+from datetime import datetime, timedelta
+from core.database import DatabaseManager
+from core.migrations import rebuild_session_rollups
+from core.retention import RetentionEngine, RetentionPolicy
+
+def old_session(db, days_ago):
+    start = datetime.now() - timedelta(days=days_ago)
+    session_id = db.create_session()
+    db.add_keystrokes_bulk(
+        (session_id, start + timedelta(seconds=i), "ab"[i % 2], "ab"[i % 2], 0.1, 0.2)
+        for i in range(9))
+    db.add_mouse_movements_bulk(
+        (session_id, start + timedelta(seconds=i / 4), i, 0, float(i), None,
+         'left' if i == 5 else None) for i in range(40))
+    db.end_session(session_id)
+    with db._get_connection() as conn:
+        conn.execute('UPDATE sessions SET end_time = ? WHERE session_id = ?',
+                     (start + timedelta(hours=1), session_id))
+    return session_id
+
+def run_retention(db, tmp_path):
+    expired = old_session(db, days_ago=40)
+    recent = old_session(db, days_ago=1)
+    active = db.create_session()
+    db.add_mouse_movement(active, 1, 1)
+    
+    engine = RetentionEngine(db, RetentionPolicy(
+        raw_days=30, mouse_interval=2.0, archive_dir=tmp_path / 'archive', batch_size=15))
+    assert engine.run() is True
+    
+    assert db.get_session_summary(expired)['mouse_count'] == 0
+    assert db.get_session_summary(expired)['keystroke_count'] == 0
+    assert db.get_session_summary(recent)['mouse_count'] == 40
+    assert db.get_session_summary(active)['mouse_count'] == 1
+    assert engine.deleted_rows == 49
+    
+    conn = db._get_connection()
+    buckets = conn.execute('''
+        SELECT sample_count, click_count FROM mouse_aggregates
+        WHERE session_id = ? ORDER BY bucket_start
+    ''', (expired,)).fetchall()
+    assert sum(count for count, _ in buckets) == 40
+    assert sum(clicks for _, clicks in buckets) == 1
+    digraphs = dict(((first, second), count) for first, second, count in conn.execute('''
+        SELECT first_key, second_key, sample_count FROM digraph_stats WHERE session_id = ?
+    ''', (expired,)))
+    assert digraphs == {("a", "b"): 4, ("b", "a"): 4}
+    
+    with gzip.open(tmp_path / 'archive' / f'session_{expired}_mouse.csv.gz', 'rt') as archive:
+        rows = list(csv.reader(archive))
+    assert len(rows) == 41 and rows[0][2] == 'timestamp'
+    
+    # Rollups survive the purge, even if the rollup backfill runs again
+    assert db.get_session_rollup(expired)['mouse_count'] == 40
+    with conn:
+        rebuild_session_rollups(conn, 0, active)
+    assert db.get_session_rollup(expired)['mouse_count'] == 40
+    assert db.get_session_rollup(recent)['mouse_count'] == 40
+    assert engine.step() is False
+
+def test_retention_legacy_storage(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'retention.db')
+    assert db._get_connection().execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    run_retention(db, tmp_path)
+    db.close()
+
+def test_purge_returns_pages_to_the_filesystem(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'shrink.db')
+    expired = old_session(db, days_ago=40)
+    start = datetime.now() - timedelta(days=40)
+    db.add_mouse_movements_bulk(
+        (expired, start + timedelta(milliseconds=i), i, i, float(i), 1.0, None)
+        for i in range(50000))
+    conn = db._get_connection()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    pages = conn.execute('PRAGMA page_count').fetchone()[0]
+    
+    engine = RetentionEngine(db, RetentionPolicy(raw_days=30, batch_size=5000,
+                                                 vacuum_pages=100000))
+    assert engine.run() is True
+    assert conn.execute('PRAGMA freelist_count').fetchone()[0] < 10
+    assert conn.execute('PRAGMA page_count').fetchone()[0] < pages / 2
+    assert engine.vacuumed_pages > 0
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    assert (tmp_path / 'shrink.db').stat().st_size < pages * conn.execute(
+        'PRAGMA page_size').fetchone()[0] / 2
+    db.close()
+
+def test_vacuum_frees_at_most_vacuum_pages_per_step(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'steps.db')
+    session_id = db.create_session()
+    db.add_mouse_movements_bulk((session_id, datetime.now(), i, i, None, None, None)
+                                for i in range(20000))
+    conn = db._get_connection()
+    with conn:
+        conn.execute('DELETE FROM mouse_movements')
+    free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    assert free > 50
+    
+    engine = RetentionEngine(db, RetentionPolicy(vacuum_pages=20))
+    freed = engine.vacuum(conn)
+    assert conn.execute('PRAGMA freelist_count').fetchone()[0] == free - 20
+    assert freed == 20
+    db.close()
+
+def test_retention_compact_storage(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'retention.db', compact_storage=True)
+    run_retention(db, tmp_path)
+    db.close()
+
+def test_retention_thread_runs_in_slices(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'retention.db')
+    expired = old_session(db, days_ago=40)
+    engine = RetentionEngine(db, RetentionPolicy(raw_days=30, batch_size=10))
+    idle = threading.Event()
+    thread = engine.start(interval=0.01, time_slice=0.01, pause=0.001, idle=idle.is_set,
+                          idle_poll=0.01)
+    
+    # Nothing happens while the writer is busy
+    time.sleep(0.2)
+    assert engine.archived_sessions == engine.downsampled_sessions == engine.deleted_rows == 0
+    idle.set()
+    conn = db._get_connection()
+    purged = 'SELECT purged_at IS NOT NULL FROM session_retention WHERE session_id = ?'
+    deadline = time.monotonic() + 10
+    while (conn.execute(purged, (expired,)).fetchone() or (0,))[0] == 0 \
+            and time.monotonic() < deadline:
+        time.sleep(0.01)
+    engine.stop()
+    thread.join(5)
+    assert not thread.is_alive() and engine.last_error is None
+    assert engine.deleted_rows == 49
+    assert engine.step() is False
+    db.close()
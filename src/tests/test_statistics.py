@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import pytest
+from core.database import DatabaseManager
+
+START = datetime(2024, 3, 1, 9, 30)
+
+def ingest(db, session_id, offset=0):
+    db.add_keystrokes_bulk(
+        (session_id, START + timedelta(seconds=offset + i), "k", "k",
+         0.1 * (i + 1), None if i == 0 else 0.5) for i in range(10))
+    db.add_mouse_movements_bulk(
+        (session_id, START + timedelta(seconds=offset + i / 2), i, i, float(i), None,
+         'left' if i == 3 else None) for i in range(40))
+
+def test_statistics_in_one_query(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'stats.db')
+    first, second, empty = db.create_session(), db.create_session(), db.create_session()
+    ingest(db, first)
+    ingest(db, second, offset=100)
+    
+    stats = db.get_session_statistics([first, second, empty])
+    assert stats[first]['keystroke_count'] == 10
+    assert stats[first]['mouse_count'] == 40
+    assert stats[first]['click_count'] == 1
+    assert stats[first]['time_span'] == 19.5
+    assert stats[first]['mean_press_duration'] == pytest.approx(0.55)
+    assert stats[first]['p50_press_duration'] == pytest.approx(0.5)
+    assert stats[first]['p90_press_duration'] == pytest.approx(0.9)
+    assert stats[first]['mean_inter_key_interval'] == pytest.approx(0.5)
+    assert stats[first]['p90_mouse_speed'] == 35.0
+    assert stats[second]['first_event'] == str(START + timedelta(seconds=100))
+    assert stats[empty]['keystroke_count'] == 0 and stats[empty]['time_span'] is None
+    db.close()
+
+def test_rollups_track_ingest_and_rebuild(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'rollups.db')
+    session_id = db.create_session()
+    ingest(db, session_id)
+    db.add_keystroke_data(session_id, "k", "k", 1.1, 0.5)
+    
+    rollup = db.get_session_rollup(session_id)
+    exact = db.get_session_statistics([session_id])[session_id]
+    assert rollup['keystroke_count'] == exact['keystroke_count'] == 11
+    assert rollup['mouse_count'] == exact['mouse_count'] == 40
+    assert rollup['mean_press_duration'] == pytest.approx(exact['mean_press_duration'])
+    assert rollup['mean_inter_key_interval'] == pytest.approx(0.5)
+    assert rollup['max_mouse_speed'] == 39.0
+    assert rollup['first_event'] == exact['first_event']
+    
+    # The migration backfill recomputes rollups from raw events
+    conn = db._get_connection()
+    with conn:
+        conn.execute('DELETE FROM session_rollups')
+        conn.execute("UPDATE migration_backfills SET last_key = 0, completed_at = NULL "
+                     "WHERE name = 'session_rollups'")
+    assert db.get_session_rollup(session_id) is None
+    assert db.run_backfills() is True
+    assert db.get_session_rollup(session_id) == rollup
+    db.close()
+
+def test_session_series_is_bucketed_in_sql(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'series.db')
+    session_id = db.create_session()
+    ingest(db, session_id)
+    
+    series = db.get_session_series(session_id, buckets=5)
+    assert series['start'] == str(START) and series['bucket_seconds'] == 3.9
+    assert len(series['keystrokes']) == 3 and len(series['mouse']) == 5
+    assert sum(count for _, _, count in series['mouse']) == 40
+    assert series['keystrokes'][0] == (0.0, pytest.approx(0.25), 4)
+    assert db.get_session_series(db.create_session())['keystrokes'] == []
+    db.close()
@@ -0,0 +1,145 @@
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from collectors.supervisor import RECORD, CollectorSupervisor, SharedRing
+from core.database import DatabaseManager
+from core.writer import BackgroundWriter
+from ml.monitor import ContinuousMonitor
+from test_async_query import process_until, qt_app
+from ui.main_window import MainWindow
+
+def fake_source(keyboard, mouse, stop_event, attempt):
+    """Type a word, move the pointer and click, then stay alive until stopped"""
+    for c in 'hi':
+        key = SimpleNamespace(char=c, vk=ord(c))
+        keyboard.on_press(key)
+        keyboard.on_release(key)
+    for i in range(50):
+        mouse.on_move(i * 5, 0)
+    mouse.on_click(250, 0, SimpleNamespace(name='left'), True)
+    thread = threading.Thread(target=stop_event.wait, daemon=True)
+    thread.start()
+    return [thread]
+
+def crashing_source(keyboard, mouse, stop_event, attempt):
+    if attempt == 0:
+        raise RuntimeError("simulated hook failure")
+    return fake_source(keyboard, mouse, stop_event, attempt)
+
+def wait_for(condition, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+def test_shared_ring_round_trip_and_overflow():
+    ring = SharedRing(capacity=4)
+    try:
+        now = datetime(2024, 1, 1, 9)
+        ring.push_keystrokes([(1, now, 'a', 'a', 0.1, None)] * 3)
+        ring.push_mouse_movements([(1, now, 10, -20, None, None, 'right')] * 3)
+        assert len(ring) == 4 and ring.dropped == 2
+        records = ring.pop()
+        assert len(records) == 4 and len(ring) == 0
+        assert records[0][0] == 0 and records[0][7].rstrip(b'\0') == b'a'
+        assert records[3][:4] == (1, 2, 10, -20)
+        assert RECORD.size == 68
+        
+        names = ['Key.media_volume_down', 'Key.media_volume_mute', 'Key.media_play_pause',
+                 'é' * 20]
+        ring.push_keystrokes([(1, now, name, name, 0.1, None) for name in names])
+        keys = [record[7].rstrip(b'\0').decode() for record in ring.pop()]
+        assert keys[:3] == names[:3] and keys[3] == 'é' * 16
+    finally:
+        ring.close()
+        ring.unlink()
+
+def test_supervisor_relays_events_and_restarts_after_crash():
+    keystrokes, mouse = [], []
+    supervisor = CollectorSupervisor(keystrokes.extend, mouse.extend, source=crashing_source,
+                                     restart_delay=0.05)
+    supervisor.start(session_id=42)
+    try:
+        wait_for(lambda: keystrokes and any(row[6] == 'left' for row in mouse))
+        health = supervisor.health()
+        assert health['running'] and health['alive'] and health['restarts'] == 1
+        assert health['heartbeat_age'] is not None and health['heartbeat_age'] < 5
+        assert 'exited with code' in health['last_error']
+    finally:
+        supervisor.stop()
+    assert [row[2] for row in keystrokes] == ['h', 'i']
+    assert all(row[0] == 42 for row in keystrokes + mouse)
+    assert keystrokes[1][5] is not None and mouse[0][4] is None
+    assert not supervisor.health()['running']
+
+def failing_source(keyboard, mouse, stop_event, attempt):
+    raise RuntimeError("no input hooks")
+
+def backend_window(tmp_path, source):
+    window = MainWindow()
+    window.db = DatabaseManager(db_path=tmp_path / 'ui.db')
+    window.writer = BackgroundWriter(window.db)
+    window.aggregator.monitor = ContinuousMonitor(window.db, window.writer)
+    window.supervisor = CollectorSupervisor(window.relay_keystrokes, window.relay_mouse_movements,
+                                            source=source, max_restarts=0)
+    return window
+
+def test_start_tracking_does_not_wait_for_the_writer(tmp_path):
+    qt_app()
+    window = backend_window(tmp_path, fake_source)
+    release = threading.Event()
+    window.db.wait_for_test = release.wait
+    window.writer.submit('wait_for_test', 5)
+    
+    # The writer is busy, yet start_tracking returns at once
+    started = time.perf_counter()
+    window.start_tracking()
+    assert time.perf_counter() - started < 0.5
+    assert window.starting is not None and window.session_id is None
+    window.start_tracking()  # ignored while starting
+    release.set()
+    process_until(lambda: window.session_id is not None)
+    assert window.supervisor.is_running() and window.starting is None
+    window.stop_tracking()
+    
+    # Stopping before the session exists ends it as soon as it is created
+    release.clear()
+    window.writer.submit('wait_for_test', 5)
+    window.start_tracking()
+    window.stop_tracking()
+    release.set()
+    process_until(lambda: window.queries.delivered == 2)
+    window.writer.flush(timeout=5)
+    statuses = window.db._get_connection().execute(
+        'SELECT status FROM sessions ORDER BY session_id').fetchall()
+    assert statuses == [('completed',), ('completed',)]
+    assert window.session_id is None and not window.supervisor.is_running()
+    
+    # Closing while starting also ends the session
+    release.clear()
+    window.writer.submit('wait_for_test', 5)
+    window.start_tracking()
+    threading.Timer(0.1, release.set).start()
+    window.close()
+    statuses = window.db._get_connection().execute(
+        'SELECT status FROM sessions ORDER BY session_id').fetchall()
+    assert statuses == [('completed',)] * 3
+    window.db.close()
+
+def test_main_window_cleans_up_after_a_failed_collector(tmp_path):
+    qt_app()
+    window = backend_window(tmp_path, failing_source)
+    window.start_tracking()
+    process_until(lambda: window.session_id is not None)
+    session_id = window.session_id
+    wait_for(lambda: window.supervisor.health()['failed'])
+    window.update_tracking_health()
+    
+    assert window.tracking_status.text() == "Tracking Status: Failed"
+    assert window.session_id is None and window.supervisor._ring is None
+    window.writer.flush(timeout=5)
+    assert window.db.get_session_summary(session_id)['session_info'][2] == 'completed'
+    window.close()
+    window.db.close()
@@ -0,0 +1,91 @@
+import random
+from datetime import datetime, timedelta
+from core.database import DatabaseManager
+from ml.monitor import ContinuousMonitor
+from ml.trainer import ModelStore, Trainer
+
+START = datetime(2024, 1, 1, 9, 0)
+
+def record_session(db, user_id, seed, dwell=0.1, keystrokes=400, strokes=40):
+    rng = random.Random(seed)
+    session_id = db.create_session(user_id=user_id)
+    t = START
+    keys = []
+    for _ in range(keystrokes):
+        t += timedelta(seconds=rng.uniform(0.15, 0.25))
+        keys.append((session_id, t, 'a', 'a', dwell + rng.uniform(-0.02, 0.02),
+                     rng.uniform(0.05, 0.1)))
+    mouse = []
+    for _ in range(strokes):
+        t += timedelta(seconds=1)
+        x = y = 0
+        for i in range(20):
+            x += rng.randint(3, 6)
+            y += rng.randint(0, 2)
+            mouse.append((session_id, t + timedelta(milliseconds=10 * i), x, y, None, None,
+                          'left' if i == 19 else None))
+    db.add_keystrokes_bulk(keys)
+    db.add_mouse_movements_bulk(mouse)
+    db.end_session(session_id)
+    return session_id
+
+def test_trainer_fits_in_parallel_and_skips_unchanged_users(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'train.db')
+    record_session(db, 'alice', 1)
+    record_session(db, 'bob', 2, dwell=0.2)
+    trainer = Trainer(db, tmp_path / 'models', workers=2)
+
+    report = trainer.train()
+    assert sorted(result['user_id'] for result in report['trained']) == ['alice', 'bob']
+    assert all(model == {'mode': 'full', 'samples': model['samples']} and model['samples'] > 0
+               for result in report['trained'] for model in result['models'].values())
+
+    report = trainer.train()
+    assert report['trained'] == [] and sorted(report['skipped']) == ['alice', 'bob']
+
+    record_session(db, 'bob', 3, dwell=0.2)
+    report = trainer.train()
+    assert [result['user_id'] for result in report['trained']] == ['bob']
+    assert report['skipped'] == ['alice']
+    db.close()
+
+def test_retrain_folds_in_only_new_events(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'train.db')
+    record_session(db, 'alice', 1)
+    trainer = Trainer(db, tmp_path / 'models', workers=1)
+    first = trainer.train()['trained'][0]['models']['keystroke']
+
+    record_session(db, 'alice', 2, keystrokes=200)
+    update = trainer.train()['trained'][0]['models']['keystroke']
+    assert update['mode'] == 'partial'
+    assert 0 < update['samples'] < first['samples']
+    model = trainer.model_store().get('alice', 'keystroke')
+    assert model.partial_updates == 1
+    assert model.n_samples == first['samples'] + update['samples']
+
+    # Typing that looks nothing like the profile triggers a full refit
+    record_session(db, 'alice', 3, dwell=5.0)
+    assert trainer.train()['trained'][0]['models']['keystroke']['mode'] == 'drift'
+    assert trainer.train(force=True)['trained'][0]['models']['keystroke']['mode'] == 'full'
+    db.close()
+
+def test_model_store_is_lazy_and_bounded(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'train.db')
+    session_id = record_session(db, 'alice', 1)
+    trainer = Trainer(db, tmp_path / 'models', workers=1)
+    trainer.train()
+
+    store = trainer.model_store(capacity=1)
+    assert isinstance(store, ModelStore) and len(store) == 0
+    model = store.get('alice', 'keystroke')
+    assert model is not None and store.get('alice', 'keystroke') is model
+    assert store.get('nobody', 'keystroke') is None
+    assert len(store) == 1 and store.hits == 1 and store.misses == 2
+
+    # Genuine input replayed through the monitor gets a model score
+    monitor = ContinuousMonitor(db, models=store, enroll_events=10000)
+    for row in db.get_keystroke_data(session_id)[:120]:
+        monitor.add_keystroke(session_id, row[3], row[4], row[5], row[6],
+                              timestamp=datetime.fromisoformat(row[2]))
+    assert 0.0 <= monitor.users['alice'].model_scores['keystroke'] <= 1.0
+    db.close()
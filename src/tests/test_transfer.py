@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from core.database import DatabaseManager
+from core.writer import BackgroundWriter
+
+START = datetime(2024, 3, 1, 9, 30, 0, 123456)
+
+def record(db, user_id, keystrokes, moves):
+    session_id = db.create_session(notes='exported', user_id=user_id)
+    db.add_keystrokes_bulk(
+        (session_id, START + timedelta(milliseconds=150 * i), chr(97 + i % 26), chr(97 + i % 26),
+         0.08 + (i % 7) / 100, None if i == 0 else 0.15) for i in range(keystrokes))
+    db.add_mouse_movements_bulk(
+        (session_id, START + timedelta(milliseconds=10 * i), i, -i, None if i == 0 else 120.5,
+         None, 'left' if i % 50 == 49 else None) for i in range(moves))
+    db.end_session(session_id)
+    return session_id
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_export_import_round_trip_in_chunks(tmp_path, compact):
+    source = DatabaseManager(db_path=tmp_path / 'source.db')
+    first = record(source, 'alice', 1000, 2500)
+    second = record(source, None, 3, 0)
+    path = tmp_path / 'export.npz'
+    
+    totals = source.export_sessions(path, chunk_size=256)
+    assert totals == {'sessions': 2, 'keystroke': 1003, 'mouse': 2500}
+    with np.load(path) as archive:
+        assert 'keystroke/1/000003' in archive.files
+        assert len(archive['mouse/1/000009']) == 2500 - 9 * 256
+    
+    target = DatabaseManager(db_path=tmp_path / 'target.db', compact_storage=compact)
+    target.create_session()
+    imported = target.import_sessions(path)
+    assert imported['keystroke'] == 1003 and imported['mouse'] == 2500
+    new_first = imported['session_ids'][first]
+    assert new_first != first and target.get_session_user(new_first) == 'alice'
+    
+    for old, new in imported['session_ids'].items():
+        assert [row[2:] for row in target.get_keystroke_data(new)] \
+            == [row[2:] for row in source.get_keystroke_data(old)]
+        assert [row[2:] for row in target.get_mouse_movements(new)] \
+            == [row[2:] for row in source.get_mouse_movements(old)]
+    assert target.get_session_rollup(new_first)['keystroke_count'] == 1000
+    source.close()
+    target.close()
+
+def test_export_selected_sessions(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'select.db')
+    record(db, 'alice', 5, 5)
+    wanted = record(db, 'bob', 7, 2)
+    totals = db.export_sessions(tmp_path / 'one.npz', session_ids=[wanted])
+    assert totals == {'sessions': 1, 'keystroke': 7, 'mouse': 2}
+    db.close()
+
+def test_import_through_the_background_writer(tmp_path):
+    source = DatabaseManager(db_path=tmp_path / 'source.db')
+    old = record(source, 'carol', 30, 70)
+    source.export_sessions(tmp_path / 'export.npz', chunk_size=16)
+    
+    target = DatabaseManager(db_path=tmp_path / 'target.db')
+    writer = BackgroundWriter(target)
+    imported = target.import_sessions(tmp_path / 'export.npz', writer=writer, batch_size=8)
+    new = imported['session_ids'][old]
+    assert writer.stats()['enqueued'] == 0  # every write was a submitted call
+    assert target.get_session_summary(new)['keystroke_count'] == 30
+    assert target.get_session_rollup(new)['mouse_count'] == 70
+    assert target.get_session_summary(new)['session_info'][2] == 'completed'
+    writer.shutdown()
+    source.close()
+    target.close()
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import deque
+from core.database import DatabaseManager
+from core.writer import CALL, BackgroundWriter
+
+def test_writer_preserves_order_and_drains_on_shutdown(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'writer.db')
+    writer = BackgroundWriter(db, batch_size=7, flush_interval=60)
+    
+    session_id = writer.submit('create_session', notes="writer").result(timeout=5)
+    for x in range(20):
+        assert writer.add_mouse_movement(session_id, x, x)
+    writer.add_keystroke(session_id, "a", "a", 0.1)
+    ended = writer.end_session(session_id)
+    writer.shutdown()
+    
+    assert ended.done()
+    summary = db.get_session_summary(session_id)
+    assert summary['mouse_count'] == 20
+    assert summary['keystroke_count'] == 1
+    assert summary['session_info'][2] == 'completed'
+    stats = writer.stats()
+    assert stats['enqueued'] == stats['written'] == 21
+    assert stats['dropped'] == 0 and stats['pending'] == 0
+    db.close()
+
+def test_writer_overflow_policies(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'overflow.db')
+    session_id = db.create_session()
+    
+    for overflow in ('drop_newest', 'drop_oldest', 'coalesce'):
+        writer = BackgroundWriter(db, capacity=5, overflow=overflow,
+                                  batch_size=1000, flush_interval=60)
+        for x in range(10):
+            writer.add_mouse_movement(session_id, x, x)
+        
+        queued = [item[1][2] for item in writer._queue]
+        if overflow == 'drop_newest':
+            assert queued == [0, 1, 2, 3, 4]
+            assert writer.dropped == 5
+        elif overflow == 'drop_oldest':
+            assert queued == [5, 6, 7, 8, 9]
+            assert writer.dropped == 5
+        else:
+            assert queued == [0, 1, 2, 3, 9]
+            assert writer.coalesced == 5
+        writer.shutdown(drain=False)
+    db.close()
+
+def test_drop_oldest_never_drops_submitted_calls(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'calls.db')
+    session_id = db.create_session()
+    writer = BackgroundWriter(db, capacity=3, overflow='drop_oldest',
+                              batch_size=1000, flush_interval=60)
+    ended = writer.end_session(session_id)
+    for x in range(5):
+        writer.add_mouse_movement(session_id, x, x)
+    
+    assert writer._queue[0][0] == CALL
+    writer.shutdown()
+    assert ended.result(timeout=5) is None
+    assert db.get_session_summary(session_id)['session_info'][2] == 'completed'
+    db.close()
+
+def test_writer_survives_unexpected_errors(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'errors.db')
+    session_id = db.create_session()
+    writer = BackgroundWriter(db, flush_interval=60)
+    
+    # A bad duration gets past SQLite but breaks the rollup arithmetic
+    writer.add_keystroke(session_id, "a", "a", "not a number")
+    writer.flush(timeout=5)
+    assert isinstance(writer.last_error, TypeError)
+    assert writer.stats()['dropped'] == 1
+    
+    writer.add_keystroke(session_id, "b", "b", 0.1)
+    assert writer.end_session(session_id).result(timeout=5) is None
+    assert db.get_session_summary(session_id)['keystroke_count'] == 1
+    writer.shutdown()
+    db.close()
+
+def test_writer_reports_idle_after_a_quiet_period(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'idle.db')
+    session_id = db.create_session()
+    writer = BackgroundWriter(db, flush_interval=60)
+    
+    writer.add_mouse_movement(session_id, 1, 1)
+    assert not writer.is_idle(quiet=0)
+    writer.flush(timeout=5)
+    assert writer.is_idle(quiet=0)
+    assert not writer.is_idle(quiet=60)
+    time.sleep(0.05)
+    assert writer.is_idle(quiet=0.05)
+    writer.shutdown()
+    db.close()
+
+class RacingQueue(deque):
+    """Holds the next submitted call until the writer thread has exited"""
+    
+    def __init__(self, writer):
+        super().__init__(writer._queue)
+        self.writer = writer
+        self.hold = True
+    
+    def append(self, item):
+        if item[0] == CALL and self.hold:
+            self.hold = False
+            self.writer._thread.join(0.5)
+        super().append(item)
+
+def test_calls_submitted_during_shutdown_never_hang(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'race.db')
+    session_id = db.create_session()
+    writer = BackgroundWriter(db, flush_interval=0.01)
+    writer._queue = RacingQueue(writer)
+    futures = []
+    
+    def submit():
+        try:
+            futures.append(writer.submit('get_session_summary', session_id))
+        except RuntimeError:
+            pass
+    
+    # The submit passes the stop check, then shutdown() runs before it appends
+    thread = threading.Thread(target=submit)
+    thread.start()
+    time.sleep(0.05)
+    writer.shutdown()
+    thread.join()
+    assert len(futures) == 1 and futures[0].done()
+    assert writer.stats()['pending'] == 0
+    db.close()
+
+def test_writer_flushes_on_batch_size_and_shutdown(tmp_path):
+    db = DatabaseManager(db_path=tmp_path / 'buffer.db')
+    session_id = db.create_session()
+    writer = BackgroundWriter(db, batch_size=10, flush_interval=60)
+    
+    for x in range(25):
+        assert writer.add_mouse_movement(session_id, x, x)
+    writer.add_keystroke(session_id, "a", "a", 0.1)
+    
+    # The batch size wakes the writer thread without waiting for the interval
+    deadline = time.time() + 5
+    while db.get_session_summary(session_id)['mouse_count'] < 10 and time.time() < deadline:
+        time.sleep(0.01)
+    assert db.get_session_summary(session_id)['mouse_count'] >= 10
+    
+    writer.end_session(session_id).result(timeout=5)
+    summary = db.get_session_summary(session_id)
+    assert summary['mouse_count'] == 25
+    assert summary['keystroke_count'] == 1
+    assert summary['session_info'][2] == 'completed'
+    
+    writer.shutdown()
+    stats = writer.stats()
+    assert stats['pending'] == 0
+    assert stats['written'] == 26
+    assert stats['max_batch_latency'] >= stats['last_batch_latency'] > 0
+    db.close()
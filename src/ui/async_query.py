@@ -0,0 +1,122 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+
+class AsyncQueryExecutor(QObject):
+    """Run database queries on worker threads and hand results to the GUI thread
+
+    Every query is submitted under a key such as 'statistics'. submit()
+    returns a concurrent.futures.Future at once; when the query finishes the
+    result arrives on the GUI thread through the `result_ready(key, result)`
+    or `query_failed(key, message)` signal.
+
+    Only the latest query per key matters. Submitting a new one cancels its
+    predecessor if that has not started yet, so a burst of refreshes during
+    heavy ingest collapses into at most one running and one queued query. A
+    predecessor that is already running cannot be interrupted; its result
+    is discarded instead of being delivered. refresh(key) re-runs the last
+    query submitted under a key.
+
+    Commands such as imports and exports go through run() instead: each one
+    is delivered under its key and is never superseded or coalesced.
+    """
+
+    result_ready = pyqtSignal(str, object)
+    query_failed = pyqtSignal(str, str)
+    # Emitted from worker threads; Qt queues it to this object's thread
+    _finished = pyqtSignal(str, int, object)
+
+    def __init__(self, workers=2, parent=None):
+        super().__init__(parent)
+        self._pool = ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix='bbiometrics-query')
+        self._latest = {}  # key -> (generation, future, fn, args, kwargs)
+        self._commands = {}  # generation -> future of a run() command
+        self._generation = 0
+        self._finished.connect(self._deliver)
+
+        # Statistics
+        self.submitted = 0
+        self.cancelled = 0
+        self.discarded = 0
+        self.delivered = 0
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on a worker, superseding earlier queries for `key`"""
+        previous = self._latest.get(key)
+        if previous is not None and previous[1].cancel():
+            self.cancelled += 1
+
+        self._generation += 1
+        generation = self._generation
+        future = Future()
+        self._latest[key] = (generation, future, fn, args, kwargs)
+        self.submitted += 1
+        self._pool.submit(self._execute, key, generation, future, fn, args, kwargs)
+        return future
+
+    def run(self, key, fn, *args, **kwargs):
+        """Run a one-off command on a worker; it is never cancelled by later calls"""
+        self._generation += 1
+        generation = self._generation
+        future = Future()
+        self._commands[generation] = future
+        self.submitted += 1
+        self._pool.submit(self._execute, key, generation, future, fn, args, kwargs)
+        return future
+
+    def refresh(self, key):
+        """Re-run the last query submitted under `key`; returns its future or None"""
+        latest = self._latest.get(key)
+        if latest is None:
+            return None
+        _, _, fn, args, kwargs = latest
+        return self.submit(key, fn, *args, **kwargs)
+
+    def is_pending(self, key):
+        latest = self._latest.get(key)
+        return latest is not None and not latest[1].done()
+
+    def _execute(self, key, generation, future, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        self._finished.emit(key, generation, future)
+
+    @pyqtSlot(str, int, object)
+    def _deliver(self, key, generation, future):
+        latest = self._latest.get(key)
+        if self._commands.pop(generation, None) is None and (
+                latest is None or latest[0] != generation):
+            self.discarded += 1
+            return
+        self.delivered += 1
+        error = future.exception()
+        if error is not None:
+            self.query_failed.emit(key, str(error))
+        else:
+            self.result_ready.emit(key, future.result())
+
+    def shutdown(self, wait=False):
+        """Cancel queued queries and commands and stop the worker threads"""
+        futures = [latest[1] for latest in self._latest.values()]
+        for future in futures + list(self._commands.values()):
+            if future.cancel():
+                self.cancelled += 1
+        self._latest.clear()
+        self._commands.clear()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self):
+        """Return submitted/cancelled/discarded/delivered counters"""
+        return {
+            'submitted': self.submitted,
+            'cancelled': self.cancelled,
+            'discarded': self.discarded,
+            'delivered': self.delivered,
+            'pending': (sum(not latest[1].done() for latest in self._latest.values())
+                        + sum(not future.done() for future in self._commands.values())),
+        }
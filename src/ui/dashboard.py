@@ -0,0 +1,159 @@
+from datetime import datetime
+
+import numpy as np
+from PyQt6.QtCore import QPointF, QRectF, Qt, QTimer
+from PyQt6.QtGui import QFont, QPainter, QPalette, QPen, QPolygonF
+from PyQt6.QtWidgets import QSizePolicy, QWidget
+
+from core.compact import to_epoch_us
+from .live_stats import decimate
+
+# Title, plotted series, unit and fixed y-range (None scales to the data)
+PANELS = (
+    ("Typing rhythm", 'typing_rate', "keys/min", None),
+    ("Mouse speed", 'mouse_speed', "px/s", None),
+    ("Confidence", 'confidence', "", (0.0, 1.0)),
+)
+
+# Panels of a recorded session: title, get_session_series key, unit and scale
+SESSION_PANELS = (
+    ("Press duration", 'keystrokes', "ms", 1000.0),
+    ("Mouse speed", 'mouse', "px/s", 1.0),
+)
+
+def _pens(widget):
+    """Text, frame and line pens from the widget's palette"""
+    palette = widget.palette()
+    return (QPen(palette.color(QPalette.ColorRole.WindowText)),
+            QPen(palette.color(QPalette.ColorRole.Mid)),
+            QPen(palette.color(QPalette.ColorRole.Highlight), 1.5))
+
+def draw_panel(painter, pens, panel, label, times, values, start, end, y_range=None):
+    """Draw one titled plot of (times, values) over [start, end]; returns points drawn
+
+    The series is min/max-decimated to one pair of points per pixel column.
+    """
+    text_pen, frame_pen, line_pen = pens
+    painter.setPen(text_pen)
+    painter.drawText(panel.adjusted(0, 0, 0, -panel.height() + 16),
+                     Qt.AlignmentFlag.AlignLeft, label)
+
+    plot = panel.adjusted(0, 18, 0, 0)
+    painter.setPen(frame_pen)
+    painter.drawRect(plot)
+    times, values = decimate(times, values, start, end, max(1, int(plot.width())))
+    if len(times) < 2:
+        return 0
+    low, high = y_range or (0.0, float(values.max()) * 1.1 or 1.0)
+    xs = plot.left() + (times - start) / (end - start) * plot.width()
+    ys = plot.bottom() - np.clip((values - low) / (high - low), 0, 1) * plot.height()
+    painter.setPen(line_pen)
+    painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in zip(xs, ys)]))
+    return len(times)
+
+class DashboardWidget(QWidget):
+    """Live plots of typing rhythm, mouse speed and confidence
+
+    Draws from a LiveAggregator's ring buffers; nothing is queried from the
+    database. A timer at `fps` advances the aggregator and schedules a
+    repaint only when a bucket has closed since the last frame. Each panel
+    shows the last `span` seconds, min/max-decimated to one pair of points
+    per pixel column, so the cost of a frame depends on the widget width
+    rather than on how long tracking has run.
+    """
+
+    def __init__(self, aggregator, span=300, fps=10, parent=None):
+        super().__init__(parent)
+        self.aggregator = aggregator
+        self.span = span
+        self._drawn_version = None
+        self.frames = 0
+        self.points_drawn = 0
+        self.setMinimumHeight(240)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / fps))
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+    def set_span(self, seconds):
+        self.span = seconds
+        self.update()
+
+    def refresh(self):
+        """Advance the aggregator and repaint if anything new has arrived"""
+        self.aggregator.tick()
+        if self.aggregator.version != self._drawn_version:
+            self.update()
+
+    def paintEvent(self, event):
+        self._drawn_version = self.aggregator.version
+        snapshot = self.aggregator.snapshot()
+        current = self.aggregator.current()
+        end = to_epoch_us(datetime.now()) / 1e6
+        start = end - self.span
+
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        pens = _pens(self)
+        painter.setFont(QFont("Arial", 9))
+
+        height = self.height() / len(PANELS)
+        self.points_drawn = 0
+        for index, (title, name, unit, y_range) in enumerate(PANELS):
+            panel = QRectF(0, index * height, self.width(), height).adjusted(4, 4, -4, -4)
+            value = current[name]
+            label = title if value is None else f"{title}: {value:.2f} {unit}".rstrip()
+            if name == 'typing_rate' and current['dwell'] is not None:
+                label += f", {current['dwell']:.0f} ms press"
+            self.points_drawn += draw_panel(painter, pens, panel, label, *snapshot[name],
+                                            start, end, y_range)
+        painter.end()
+        self.frames += 1
+
+class SessionSeriesWidget(QWidget):
+    """Plots of a recorded session's press duration and mouse speed over time
+
+    set_series() takes the result of DatabaseManager.get_session_series,
+    which is already bucketed in SQL, so drawing it costs the same however
+    long the session was.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.series = None
+        self.end = 1.0
+        self.points_drawn = 0
+        self.setMinimumHeight(160)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+
+    def set_series(self, series):
+        """Show `series`; the session's points are kept as arrays of (seconds, value)"""
+        self.series = {'session_id': series.get('session_id')}
+        for _, name, _, scale in SESSION_PANELS:
+            points = np.array([(seconds, mean) for seconds, mean, _ in series[name]],
+                              dtype=float).reshape(-1, 2)
+            self.series[name] = (points[:, 0], points[:, 1] * scale)
+        # Both panels share the session's time axis, at least one second wide
+        self.end = max([float(self.series[name][0].max()) + (series['bucket_seconds'] or 0)
+                        for _, name, _, _ in SESSION_PANELS if len(self.series[name][0])]
+                       + [1.0])
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        pens = _pens(self)
+        painter.setFont(QFont("Arial", 9))
+
+        height = self.height() / len(SESSION_PANELS)
+        self.points_drawn = 0
+        if self.series is not None:
+            for index, (title, name, unit, _) in enumerate(SESSION_PANELS):
+                panel = QRectF(0, index * height, self.width(), height).adjusted(4, 4, -4, -4)
+                label = (f"Session {self.series['session_id']}: {title} ({unit}) "
+                         f"over {self.end:.0f} s")
+                self.points_drawn += draw_panel(painter, pens, panel, label,
+                                                *self.series[name], 0.0, self.end)
+        painter.end()
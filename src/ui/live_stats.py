@@ -0,0 +1,172 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from core.compact import to_epoch_us
+
+SERIES = ('typing_rate', 'dwell', 'mouse_speed', 'confidence')
+
+def decimate(times, values, start, end, bins):
+    """Min/max decimation of a time-ordered series into at most 2 * bins points
+
+    Points outside [start, end] are dropped. Each bin keeps its lowest and
+    highest value, in time order, so spikes survive however many points fall
+    into one pixel column.
+    """
+    keep = (times >= start) & (times <= end)
+    times, values = times[keep], values[keep]
+    if len(times) <= 2 * bins or end <= start:
+        return times, values
+    index = np.minimum(((times - start) / (end - start) * bins).astype(np.int64), bins - 1)
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    lows = np.minimum.reduceat(values, starts)
+    highs = np.maximum.reduceat(values, starts)
+    ends = np.r_[starts[1:], len(times)]
+    out_times = np.column_stack([times[starts], times[ends - 1]]).ravel()
+    out_values = np.column_stack([lows, highs]).ravel()
+    return out_times, out_values
+
+class SeriesRing:
+    """Fixed-capacity ring of (time, value) points in NumPy arrays"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.values = np.zeros(capacity)
+        self.count = 0
+
+    def append(self, time, value):
+        slot = self.count % self.capacity
+        self.times[slot] = time
+        self.values[slot] = value
+        self.count += 1
+
+    def last(self):
+        if not self.count:
+            return None
+        slot = (self.count - 1) % self.capacity
+        return self.times[slot], self.values[slot]
+
+    def arrays(self):
+        """Return copies of the stored points, oldest first"""
+        if self.count <= self.capacity:
+            return self.times[:self.count].copy(), self.values[:self.count].copy()
+        split = self.count % self.capacity
+        return (np.concatenate([self.times[split:], self.times[:split]]),
+                np.concatenate([self.values[split:], self.values[:split]]))
+
+class LiveAggregator:
+    """Fold the live event stream into per-bucket aggregates for the dashboard
+
+    add_keystrokes(rows) and add_mouse_movements(rows) take the same rows
+    as BackgroundWriter, so the aggregator can sit next to it behind the
+    collector supervisor. Events are summed into `resolution`-second
+    buckets; when a bucket closes its typing rate (keys per minute), mean
+    press duration (ms), mean mouse speed (px/s) and the last confidence
+    score are appended to fixed-size SeriesRings holding `capacity`
+    buckets. tick() closes buckets on wall-clock time so idle periods show
+    up as zero typing rate. Memory and the cost of a snapshot are bounded by
+    `capacity`, not by how long tracking has run.
+
+    When a ContinuousMonitor is given every event is also scored with it
+    and the confidence series follows its score.
+    """
+
+    def __init__(self, monitor=None, resolution=1.0, capacity=3600):
+        self.monitor = monitor
+        self.resolution = resolution
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.series = {name: SeriesRing(self.capacity) for name in SERIES}
+            self._bucket = None
+            self._sums = [0, 0.0, 0, 0.0]  # keystrokes, dwell sum, speed count, speed sum
+            self._score = None
+            self.version = 0
+
+    def _advance(self, time):
+        """Close the open bucket when `time` falls into a later one"""
+        bucket = int(time // self.resolution)
+        if self._bucket is None:
+            self._bucket = bucket
+        elif bucket > self._bucket:
+            self._close()
+            self._bucket = bucket
+
+    def _close(self):
+        keystrokes, dwell_sum, speeds, speed_sum = self._sums
+        time = (self._bucket + 1) * self.resolution
+        self.series['typing_rate'].append(time, keystrokes * 60.0 / self.resolution)
+        if keystrokes:
+            self.series['dwell'].append(time, dwell_sum / keystrokes * 1000)
+        if speeds:
+            self.series['mouse_speed'].append(time, speed_sum / speeds)
+        if self._score is not None:
+            self.series['confidence'].append(time, self._score)
+        self._sums = [0, 0.0, 0, 0.0]
+        self.version += 1
+
+    def tick(self, now=None):
+        """Advance to wall-clock `now`, closing buckets even when input has stopped
+
+        Called by the dashboard on every frame, so typing rate falls to zero
+        while the user is idle.
+        """
+        now = datetime.now() if now is None else now
+        with self._lock:
+            if self._bucket is not None:
+                self._advance(to_epoch_us(now) / 1e6)
+
+    def _set_score(self, score):
+        if score is not None:
+            with self._lock:
+                self._score = score
+
+    def add_keystrokes(self, rows):
+        with self._lock:
+            for _, timestamp, _, _, press_duration, _ in rows:
+                self._advance(to_epoch_us(timestamp) / 1e6)
+                self._sums[0] += 1
+                self._sums[1] += press_duration
+        # Score outside the lock so snapshot() never waits on the models
+        if self.monitor is not None:
+            score = None
+            for session_id, timestamp, key_pressed, key_released, press_duration, \
+                    inter_key_interval in rows:
+                result = self.monitor.add_keystroke(session_id, key_pressed, key_released,
+                                                    press_duration, inter_key_interval,
+                                                    timestamp=timestamp)
+                score = score if result is None else result
+            self._set_score(score)
+        return len(rows)
+
+    def add_mouse_movements(self, rows):
+        with self._lock:
+            for _, timestamp, _, _, speed, _, _ in rows:
+                self._advance(to_epoch_us(timestamp) / 1e6)
+                if speed is not None:
+                    self._sums[2] += 1
+                    self._sums[3] += speed
+        if self.monitor is not None:
+            score = None
+            for session_id, timestamp, x, y, speed, acceleration, click_type in rows:
+                result = self.monitor.add_mouse_movement(session_id, x, y, speed, acceleration,
+                                                         click_type, timestamp=timestamp)
+                score = score if result is None else result
+            self._set_score(score)
+        return len(rows)
+
+    def snapshot(self):
+        """Return {series: (times, values)} copies that are safe to draw from"""
+        with self._lock:
+            return {name: ring.arrays() for name, ring in self.series.items()}
+
+    def current(self):
+        """Latest value of every series, None for series without data yet"""
+        with self._lock:
+            return {name: None if ring.last() is None else float(ring.last()[1])
+                    for name, ring in self.series.items()}
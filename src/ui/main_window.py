@@ -1,8 +1,17 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLabel, QPushButton, QStatusBar,
-                            QFrame)
-from PyQt6.QtCore import Qt
+                            QFrame, QFileDialog)
+from datetime import datetime
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QAction, QIcon, QFont
+from collectors.supervisor import CollectorSupervisor
+from core.database import DatabaseManager
+from core.retention import RetentionEngine, RetentionPolicy
+from core.writer import BackgroundWriter
+from ml.monitor import ContinuousMonitor
+from .async_query import AsyncQueryExecutor
+from .dashboard import DashboardWidget, SessionSeriesWidget
+from .live_stats import LiveAggregator
 from .theme_manager import ThemeManager
 
 class MainWindow(QMainWindow):
@@ -12,6 +21,28 @@ class MainWindow(QMainWindow):
         self.setMinimumSize(800, 600)
         self.is_dark_mode = False
         
+        # Storage and capture are created on first use
+        self.db = None
+        self.writer = None
+        self.retention = None
+        self.supervisor = None
+        self.session_id = None
+        self.last_session_id = None
+        self.starting = None  # Future of the session being created
+        
+        # Recent per-second aggregates of the live event stream
+        self.aggregator = LiveAggregator()
+        
+        # Queries run off the GUI thread and report back through signals
+        self.queries = AsyncQueryExecutor(parent=self)
+        self.queries.result_ready.connect(self.show_query_result)
+        self.queries.query_failed.connect(self.show_query_error)
+        
+        # Poll the collector process while tracking
+        self.health_timer = QTimer(self)
+        self.health_timer.setInterval(1000)
+        self.health_timer.timeout.connect(self.update_tracking_health)
+        
         # Create the main widget and layout
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -44,12 +75,16 @@ class MainWindow(QMainWindow):
         new_action = QAction("New Session", self)
         open_action = QAction("Open Data", self)
         save_action = QAction("Save Data", self)
+        open_action.triggered.connect(self.open_data)
+        save_action.triggered.connect(self.save_data)
         file_menu.addActions([new_action, open_action, save_action])
         
         # View menu
         view_menu = menubar.addMenu("View")
         stats_action = QAction("Statistics", self)
         graphs_action = QAction("Graphs", self)
+        stats_action.triggered.connect(self.show_statistics)
+        graphs_action.triggered.connect(self.show_graphs)
         view_menu.addActions([stats_action, graphs_action])
         
         # Settings menu
@@ -67,6 +102,9 @@ class MainWindow(QMainWindow):
         start_action = QAction("Start Tracking", self)
         stop_action = QAction("Stop Tracking", self)
         export_action = QAction("Export Data", self)
+        start_action.triggered.connect(self.start_tracking)
+        export_action.triggered.connect(self.export_data)
+        stop_action.triggered.connect(self.stop_tracking)
         
         toolbar.addActions([start_action, stop_action, export_action])
         
@@ -83,8 +121,8 @@ class MainWindow(QMainWindow):
         left_layout.setSpacing(10)
         
         # Add some example controls with modern styling
-        tracking_status = QLabel("Tracking Status: Stopped")
-        tracking_status.setFont(QFont("Arial", 10, QFont.Weight.Bold))
+        self.tracking_status = QLabel("Tracking Status: Stopped")
+        self.tracking_status.setFont(QFont("Arial", 10, QFont.Weight.Bold))
         
         start_button = QPushButton("Start Tracking")
         stop_button = QPushButton("Stop Tracking")
@@ -93,7 +131,7 @@ class MainWindow(QMainWindow):
         start_button.clicked.connect(self.start_tracking)
         stop_button.clicked.connect(self.stop_tracking)
         
-        left_layout.addWidget(tracking_status)
+        left_layout.addWidget(self.tracking_status)
         left_layout.addWidget(start_button)
         left_layout.addWidget(stop_button)
         left_layout.addStretch()
@@ -107,11 +145,16 @@ class MainWindow(QMainWindow):
         # Add some example labels with modern styling
         stats_label = QLabel("Statistics")
         stats_label.setFont(QFont("Arial", 12, QFont.Weight.Bold))
-        data_label = QLabel("Data Display Area")
+        self.dashboard = DashboardWidget(self.aggregator)
+        # Plots of a recorded session, shown by View > Graphs
+        self.session_plot = SessionSeriesWidget()
+        self.session_plot.hide()
+        self.summary_label = QLabel()
         
         right_layout.addWidget(stats_label)
-        right_layout.addWidget(data_label)
-        right_layout.addStretch()
+        right_layout.addWidget(self.dashboard, 1)
+        right_layout.addWidget(self.session_plot, 1)
+        right_layout.addWidget(self.summary_label)
         
         # Add panels to main layout
         content_layout.addWidget(left_panel, 1)
@@ -132,8 +175,197 @@ class MainWindow(QMainWindow):
         self.is_dark_mode = not self.is_dark_mode
         self.apply_theme()
         
+    def ensure_backend(self):
+        """Open the database, writer thread and collector supervisor once"""
+        if self.db is None:
+            self.db = DatabaseManager()
+            # Fill derived tables (e.g. session rollups) of older databases
+            self.db.start_backfills()
+            self.writer = BackgroundWriter(self.db)
+            # Archive and summarise expired sessions while nothing is being recorded
+            self.retention = RetentionEngine(
+                self.db, RetentionPolicy(archive_dir=self.db.data_dir / 'archive'))
+            self.retention.start(idle=self.writer.is_idle)
+            self.aggregator.monitor = ContinuousMonitor(self.db, self.writer)
+            self.supervisor = CollectorSupervisor(self.relay_keystrokes,
+                                                  self.relay_mouse_movements)
+        
+    def relay_keystrokes(self, rows):
+        """Collector sink: store the rows and feed the dashboard"""
+        self.writer.add_keystrokes(rows)
+        self.aggregator.add_keystrokes(rows)
+        
+    def relay_mouse_movements(self, rows):
+        self.writer.add_mouse_movements(rows)
+        self.aggregator.add_mouse_movements(rows)
+        
+    def create_session(self):
+        """Create a session behind the queued events; runs on a worker"""
+        return self.writer.submit('create_session').result()
+        
     def start_tracking(self):
+        self.ensure_backend()
+        if self.starting is not None or self.supervisor.is_running():
+            return
+        # The writer may have a full queue ahead of the call; wait off the GUI thread
+        self.starting = self.queries.run('start', self.create_session)
+        self.status_bar.showMessage("Starting tracking...")
+        
+    def begin_tracking(self, session_id):
+        """Start the collectors once the session exists"""
+        if self.starting is None:
+            # Stopped or closed while the session was being created
+            self.writer.end_session(session_id)
+            return
+        self.starting = None
+        self.session_id = session_id
+        self.last_session_id = self.session_id
+        self.aggregator.reset()
+        try:
+            self.supervisor.start(self.session_id)
+        except Exception as e:
+            self.writer.end_session(self.session_id)
+            self.session_id = None
+            self.status_bar.showMessage(f"Could not start tracking: {e}")
+            return
+        self.tracking_status.setText("Tracking Status: Running")
+        self.health_timer.start()
         self.status_bar.showMessage("Tracking started...")
         
     def stop_tracking(self):
-        self.status_bar.showMessage("Tracking stopped.") 
\ No newline at end of file
+        self.starting = None
+        self.health_timer.stop()
+        if self.supervisor is not None and self.session_id is not None:
+            self.supervisor.stop()
+            self.writer.end_session(self.session_id)
+            self.aggregator.monitor.end_session(self.session_id)
+            self.session_id = None
+        self.tracking_status.setText("Tracking Status: Stopped")
+        self.status_bar.showMessage("Tracking stopped.")
+        
+    def update_tracking_health(self):
+        health = self.supervisor.health()
+        if health['failed'] or not health['running']:
+            # End the session and release the ring before reporting the failure
+            self.stop_tracking()
+            self.tracking_status.setText("Tracking Status: Failed")
+            self.status_bar.showMessage(f"Tracking failed: {health['last_error']}")
+            return
+        state = "Running" if health['alive'] else "Restarting"
+        self.tracking_status.setText(f"Tracking Status: {state}")
+        self.status_bar.showMessage(
+            f"Tracking: {health['received']} events, {health['restarts']} restarts, "
+            f"{health['dropped']} dropped")
+        
+    def displayed_session(self):
+        """The session being tracked, else the last one recorded; runs on a worker"""
+        if self.last_session_id is not None:
+            return self.last_session_id
+        sessions = self.db.get_sessions_between(datetime.min, datetime.now())
+        return sessions[-1] if sessions else None
+        
+    def load_statistics(self):
+        session_id = self.displayed_session()
+        if session_id is None:
+            return None
+        return self.db.get_session_statistics([session_id]).get(session_id)
+        
+    def load_graphs(self):
+        session_id = self.displayed_session()
+        if session_id is None:
+            return None
+        return dict(self.db.get_session_series(session_id), session_id=session_id)
+        
+    def show_statistics(self):
+        self.ensure_backend()
+        self.queries.submit('statistics', self.load_statistics)
+        self.status_bar.showMessage("Loading statistics...")
+        
+    def show_graphs(self):
+        self.ensure_backend()
+        self.queries.submit('graphs', self.load_graphs)
+        self.status_bar.showMessage("Loading graphs...")
+        
+    def load_export(self, path, all_sessions):
+        self.writer.flush()
+        if all_sessions:
+            return self.db.export_sessions(path)
+        session_id = self.displayed_session()
+        if session_id is None:
+            return None
+        return self.db.export_sessions(path, session_ids=[session_id])
+        
+    def export_archive(self, caption, all_sessions):
+        path, _ = QFileDialog.getSaveFileName(self, caption, "bbiometrics.npz",
+                                              "NumPy archives (*.npz)")
+        if not path:
+            return
+        self.ensure_backend()
+        self.queries.run('export', self.load_export, path, all_sessions)
+        self.status_bar.showMessage(f"Exporting to {path}...")
+        
+    def export_data(self):
+        self.export_archive("Export All Sessions", all_sessions=True)
+        
+    def save_data(self):
+        self.export_archive("Save Session", all_sessions=False)
+        
+    def open_data(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Data", "",
+                                              "NumPy archives (*.npz)")
+        if not path:
+            return
+        self.ensure_backend()
+        self.queries.run('import', self.db.import_sessions, path, self.writer)
+        self.status_bar.showMessage(f"Importing {path}...")
+        
+    def show_query_result(self, key, result):
+        if key == 'start':
+            self.begin_tracking(result)
+            return
+        if result is None:
+            self.summary_label.setText("No session recorded yet")
+        elif key == 'statistics':
+            lines = [f"Session {result['session_id']}",
+                     f"Keystrokes: {result['keystroke_count']}",
+                     f"Mouse events: {result['mouse_count']} ({result['click_count']} clicks)"]
+            if result['time_span'] is not None:
+                lines.append(f"Duration: {result['time_span']:.0f} s")
+            if result['mean_press_duration'] is not None:
+                lines.append(f"Press duration: {result['mean_press_duration'] * 1000:.0f} ms mean, "
+                             f"{result['p90_press_duration'] * 1000:.0f} ms p90")
+            if result['mean_mouse_speed'] is not None:
+                lines.append(f"Mouse speed: {result['mean_mouse_speed']:.0f} px/s mean")
+            self.summary_label.setText("\n".join(lines))
+        elif key in ('export', 'import'):
+            verb = "Exported" if key == 'export' else "Imported"
+            self.summary_label.setText(
+                f"{verb} {result['sessions']} sessions: {result['keystroke']} keystrokes, "
+                f"{result['mouse']} mouse events")
+        elif key == 'graphs':
+            self.session_plot.set_series(result)
+            self.session_plot.show()
+        self.status_bar.showMessage("Ready")
+        
+    def show_query_error(self, key, message):
+        if key == 'start':
+            self.starting = None
+            self.status_bar.showMessage(f"Could not start tracking: {message}")
+            return
+        self.status_bar.showMessage(f"Could not load {key}: {message}")
+        
+    def closeEvent(self, event):
+        starting = self.starting
+        self.queries.shutdown()
+        self.stop_tracking()
+        if starting is not None and not starting.cancelled():
+            # The session is being created; end it rather than leave it active
+            try:
+                self.writer.end_session(starting.result(timeout=5))
+            except Exception:
+                pass
+        if self.retention is not None:
+            self.retention.stop()
+        if self.writer is not None:
+            self.writer.shutdown()
+        super().closeEvent(event) 
\ No newline at end of file